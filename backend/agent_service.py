@@ -1,26 +1,76 @@
 import asyncio
-from playwright.async_api import async_playwright
 import base64
-from repository import log_repo, agent_repo
-from models import LogSchema
+import hashlib
+import os
+import time
+from artifact_store import artifact_store
+from database import db
+from metrics import FIRST_FRAME_SECONDS, FRAME_CAPTURE_SECONDS, VIDEO_FRAMES
+from log_sink import log_sink
+from models import LogSchema, split_event
+from dom_extractor import EXTRACT_ELEMENTS_JS
+from network_profiles import NETWORK_PROFILE, NetworkInterceptor
+from pacing import PACING_MODE, Pacer
+from page_cache import FINGERPRINT_JS
+from politeness import host_limiter
+from recorder import RECORD_SESSIONS, RECORDING_FPS, recorder
+from site_cache import SITE_CACHE, origin_of, site_cache
+from startup import startup
 import json
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AgentService")
 
+# screencast: CDP Page.startScreencast (Chromium); poll: page.screenshot() loop
+VIDEO_STREAM_MODE = os.getenv("VIDEO_STREAM_MODE", "screencast")
+VIDEO_MAX_FPS = float(os.getenv("VIDEO_MAX_FPS", "10"))
+VIDEO_QUALITY = int(os.getenv("VIDEO_QUALITY", "60"))
+VIDEO_PROBE_INTERVAL = 0.5  # How often viewer count / backpressure are re-read
+# Pages one agent drives concurrently in its context; the video stream shows the first
+AGENT_TABS = int(os.getenv("AGENT_TABS", "1"))
+MAX_AGENT_TABS = 8
+
 class AgentService:
-    def __init__(self, agent_id: str = "default", event_callback=None):
+    def __init__(self, agent_id: str = "default", event_callback=None, browser_pool=None, viewer_probe=None,
+                 network_profile: str = NETWORK_PROFILE, allow_domains=None, politeness=host_limiter,
+                 pacing: str = PACING_MODE, record: bool = RECORD_SESSIONS, use_site_cache: bool = SITE_CACHE):
+        self.browser_pool = browser_pool  # Shared BrowserPool; launches a private browser when None
+        self.viewer_probe = viewer_probe  # () -> {"viewers": int, "pressure": 0..1} for adaptive streaming
+        self.network = NetworkInterceptor(network_profile, allow_domains)
+        self.politeness = politeness  # Per-host limit on concurrent page loads
+        self.pacer = Pacer(pacing)  # Pauses after actions: fixed sleeps or readiness signals
+        self.record = record  # Keep the video on disk for replay, see recorder.py
+        self.recording = None
+        self.use_site_cache = use_site_cache  # Warm start from the target origin's storage state and asset cache
+        self.cache_origin = None
+        self.cache_state = "off"  # off, cold or warm, for the first-load metric
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        self.tabs = []  # self.page plus any pages added by open_tabs()
         self.is_running = False
         self.agent_id = agent_id
         self.event_callback = event_callback
         self.stream_task = None
+        self.frames_sent = 0
+        self.created_at = time.monotonic()  # Time to first frame is measured from here
+        self.frames_deduplicated = 0
+        self.last_frame_digest = None
 
     async def _emit_event(self, event_type: str, data: dict):
+        if any(isinstance(value, bytes) for value in data.values()):
+            # Binary payloads go to the artifact store; logs and the UI only get their ids
+            data = dict(data)
+            for key, value in list(data.items()):
+                if isinstance(value, bytes):
+                    try:
+                        data[f"{key}_artifact_id"] = await artifact_store.put(value, agent_id=self.agent_id)
+                    except Exception as e:
+                        logger.warning(f"Could not store {key} artifact: {e}")
+                    del data[key]
+
         if self.event_callback:
             await self.event_callback(event_type, data)
         
@@ -32,23 +82,59 @@ class AgentService:
              try:
                  # Only save to DB if database is connected
                  if db.db is not None:
+                     detail, fields = split_event(data)
                      log_entry = LogSchema(
                          agent_id=self.agent_id,
                          type=event_type,
                          message=msg,
-                         detail=str(data)
+                         detail=detail,
+                         data=fields
                      )
-                     await log_repo.create_log(log_entry)
+                     # Buffered; written in batches by the background log sink
+                     log_sink.write(log_entry)
              except Exception as e:
-                 # Silently fail if database isn't available
-                 logger.debug(f"Could not persist log (DB may not be connected): {e}")
+                 logger.debug(f"Could not buffer log: {e}")
 
-    async def start(self, headless: bool = True):
+    async def start(self, headless: bool = True, target_url: str = None):
         await self._emit_event("INFO", {"message": "Starting browser service..."})
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=headless)
-        self.page = await self.browser.new_page()
+        context_options = {}
+        self.cache_origin = origin_of(target_url) if self.use_site_cache and target_url else None
+        if self.cache_origin:
+            state = await site_cache.load_storage_state(self.cache_origin)
+            if state:
+                context_options["storage_state"] = state
+            self.cache_state = "warm" if site_cache.is_warm(self.cache_origin) else "cold"
+        if self.browser_pool:
+            # Pooled mode: the browser is already warm, only a fresh context is created
+            new_context = self.browser_pool.new_context
+        else:
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=headless)
+            new_context = self.browser.new_context
+        try:
+            self.context = await new_context(**context_options)
+        except Exception as e:
+            if "storage_state" not in context_options:
+                raise
+            # Left on disk, a state Playwright rejects would fail every agent on this origin until it expires
+            logger.warning(f"Saved storage state for {self.cache_origin} was rejected, starting cold: {e}")
+            site_cache.discard_storage_state(self.cache_origin)
+            del context_options["storage_state"]
+            self.cache_state = "warm" if site_cache.is_warm(self.cache_origin) else "cold"
+            self.context = await new_context(**context_options)
+        self.page = await self.context.new_page()
+        if self.cache_origin:
+            # Registered first so the network profile's route runs first and falls back to it
+            await site_cache.attach(self.context, self.cache_origin)
+        await self.network.attach(self.context)
+        self.tabs = [self.page]
         self.is_running = True
+        if self.record:
+            try:
+                self.recording = recorder.open(self.agent_id)
+            except Exception as e:
+                logger.warning(f"Recording disabled: {e}")
         logger.info("Browser started")
         await self._emit_event("INFO", {"message": "Browser session initialized"})
         
@@ -65,22 +151,59 @@ class AgentService:
                 await self.stream_task
             except asyncio.CancelledError:
                 pass
+        if self.recording:
+            await recorder.close(self.agent_id)
+            self.recording = None
+        if self.cache_origin and self.context:
+            try:
+                await site_cache.save_storage_state(self.context, self.cache_origin)
+            except Exception as e:
+                logger.debug(f"Could not save storage state: {e}")
         
+        for page in self.tabs[1:]:
+            try:
+                await page.close()
+            except Exception:
+                pass
         if self.page:
             await self.page.close()
+        if self.context and self.browser_pool:
+            await self.browser_pool.release(self.context)
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        network = self.network.stats()
+        if network["requests_blocked"]:
+            await self._emit_event("INFO", {
+                "message": f"Network ({network['profile']}): {network['requests_blocked']} requests blocked, "
+                           f"{network['requests_allowed']} allowed, ~{network['bytes_saved_estimate'] // 1024} KB saved",
+                "network": network
+            })
         await self._emit_event("INFO", {"message": "Session ended"})
+        await log_sink.flush()
 
-    async def navigate(self, url: str):
+    async def open_tabs(self, count: int):
+        """Add pages to the same context (shared cookies and routes) until there are `count`"""
         if not self.page:
             raise Exception("Browser not started")
+        while len(self.tabs) < count:
+            self.tabs.append(await self.page.context.new_page())
+        return self.tabs
+
+    async def navigate(self, url: str, page=None):
+        page = page or self.page
+        if not page:
+            raise Exception("Browser not started")
         
-        await self._emit_event("NAVIGATE", {"message": f"Navigating to {url}"})
+        self.network.set_first_party(url)
+        await self._emit_event("NAVIGATE", {"message": f"Navigating to {url}", "url": url})
         try:
-            await self.page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            if self.politeness:
+                async with self.politeness.slot(url):
+                    await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            else:
+                await page.goto(url, timeout=30000, wait_until="domcontentloaded")
             await self._emit_event("INFO", {"message": "Page loaded successfully"})
             
             return True, "Navigation successful"
@@ -88,12 +211,46 @@ class AgentService:
             await self._emit_event("ERROR", {"message": "Navigation failed", "detail": str(e)})
             return False, str(e)
             
-    async def get_page_content(self):
-        if not self.page:
+    async def get_page_content(self, page=None):
+        page = page or self.page
+        if not page:
             return ""
-        return await self.page.content()
+        return await page.content()
+
+    async def extract_elements(self, page=None):
+        """Title, links, buttons and inputs in one round trip, without serializing the DOM"""
+        page = page or self.page
+        if not page:
+            return {"title": None, "links": [], "buttons": [], "inputs": []}
+        return await page.evaluate(EXTRACT_ELEMENTS_JS)
+
+    async def fingerprint(self, page=None):
+        """{"hash", "simhash", "tokens"} of the current DOM, computed in the page; None if unavailable"""
+        page = page or self.page
+        if not page:
+            return None
+        try:
+            return await page.evaluate(FINGERPRINT_JS)
+        except Exception as e:
+            logger.debug(f"Could not fingerprint page: {e}")
+            return None
 
-    async def execute_action(self, action: dict):
+    async def capture_screenshot(self, message: str = "Screenshot", page=None):
+        """Full-size JPEG of the page, kept in the artifact store and logged by id"""
+        page = page or self.page
+        if not page:
+            return
+        try:
+            image = await page.screenshot(type="jpeg", quality=VIDEO_QUALITY)
+        except Exception as e:
+            logger.debug(f"Could not take screenshot: {e}")
+            return
+        await self._emit_event("SCREENSHOT", {"message": message, "url": page.url, "image": image})
+
+    async def execute_action(self, action: dict, page=None) -> float:
+        """Run the action; returns seconds spent waiting for the page afterwards"""
+        page = page or self.page
+        waited = 0.0
         action_type = action.get("type")
         target = action.get("target")
         reason = action.get("reason")
@@ -105,69 +262,175 @@ class AgentService:
                 if target:
                     # Handle relative URLs
                     if target.startswith('/'):
-                        current_url = self.page.url
+                        current_url = page.url
                         from urllib.parse import urlparse
                         parsed = urlparse(current_url)
                         target = f"{parsed.scheme}://{parsed.netloc}{target}"
                     elif not target.startswith('http'):
                         # Skip invalid URLs
                         await self._emit_event("INFO", {"message": f"Skipping invalid URL: {target}"})
-                        return
+                        return waited
                     
-                    await self.navigate(target)
+                    await self.navigate(target, page)
                 else:
                     await self._emit_event("ERROR", {"message": "Navigation failed", "detail": "No target URL provided"})
             
             elif action_type == "CLICK":
                 if target:
                     await self._emit_event("INFO", {"message": f"Clicking element: {target}"})
-                    await self.page.click(target, timeout=5000)
-                    await asyncio.sleep(1)
+                    await page.click(target, timeout=5000)
+                    waited = await self.pacer.settle(page, "click")
                 
             elif action_type == "WAIT":
-                await asyncio.sleep(2)
+                waited = await self.pacer.settle(page, "wait")
                 
             else:
                  await self._emit_event("INFO", {"message": f"Unknown action: {action_type}"})
                  
         except Exception as e:
             await self._emit_event("ERROR", {"message": f"Action {action_type} failed", "detail": str(e)})
+        return waited
     
+    def _stream_settings(self):
+        """Pick (viewers, fps, jpeg quality) from subscriber count and socket backpressure"""
+        if not self.viewer_probe:
+            # Standalone use (scripts/tests): nobody to ask, stream at full rate
+            return 1, VIDEO_MAX_FPS, VIDEO_QUALITY
+        probe = self.viewer_probe()
+        viewers, pressure = probe.get("viewers", 0), probe.get("pressure", 0.0)
+        if viewers == 0 and self.recording:
+            # Only the recorder is watching: capture at its rate
+            return 1, min(RECORDING_FPS, VIDEO_MAX_FPS), VIDEO_QUALITY
+
+        if pressure >= 0.75:
+            fps, quality = 2, 35
+        elif pressure >= 0.4:
+            fps, quality = 5, 45
+        else:
+            fps, quality = VIDEO_MAX_FPS, VIDEO_QUALITY
+        # Every frame is fanned out to each viewer, so trade quality for bandwidth
+        if viewers > 10:
+            quality = max(30, quality - 15)
+        return viewers, min(fps, VIDEO_MAX_FPS), quality
+
+    def _is_duplicate_frame(self, data) -> bool:
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest == self.last_frame_digest:
+            self.frames_deduplicated += 1
+            VIDEO_FRAMES.inc(result="duplicate")
+            return True
+        self.last_frame_digest = digest
+        return False
+
+    async def _emit_frame(self, jpeg: bytes):
+        if self.frames_sent == 0:
+            first_frame = time.monotonic() - self.created_at
+            FIRST_FRAME_SECONDS.observe(first_frame)
+            startup.record_first_frame(first_frame)
+        if self.recording:
+            self.recording.write(jpeg)  # Queued; throttled and deduplicated by the recording
+        # Raw JPEG bytes; the WebSocket layer sends them as a binary message
+        if self.event_callback:
+            await self.event_callback("VIDEO_FRAME", {
+                "jpeg": jpeg,
+                "frame": self.frames_sent
+            })
+        self.frames_sent += 1
+        VIDEO_FRAMES.inc(result="sent")
+
     async def _video_stream_loop(self):
         """Continuously capture and stream video frames"""
-        logger.info("Starting video stream...")
-        frame_count = 0
-        
+        logger.info(f"Starting video stream ({VIDEO_STREAM_MODE})...")
+        try:
+            if VIDEO_STREAM_MODE == "screencast":
+                try:
+                    await self._screencast_loop()
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Non-Chromium browsers have no CDP; fall back to polling screenshots
+                    logger.warning(f"Screencast unavailable, polling screenshots instead: {e}")
+            await self._screenshot_loop()
+        except asyncio.CancelledError:
+            logger.info("Video stream cancelled")
+        finally:
+            logger.info(f"Video stream stopped. Frames sent: {self.frames_sent}, "
+                        f"duplicates skipped: {self.frames_deduplicated}")
+
+    async def _screencast_loop(self):
+        """Push-based capture via Page.startScreencast.
+
+        Chromium only produces a frame when the page repaints, and waits for
+        the ack before sending the next one, so delaying the ack caps the
+        capture rate at the target FPS instead of discarding encoded frames.
+        """
+        cdp = await self.page.context.new_cdp_session(self.page)
+        casting_quality = None
+        frame_interval = 1 / VIDEO_MAX_FPS
+
+        async def on_frame(params):
+            started = time.monotonic()
+            try:
+                jpeg = base64.b64decode(params["data"])
+                if not self._is_duplicate_frame(jpeg):
+                    await self._emit_frame(jpeg)
+                await asyncio.sleep(max(0.0, frame_interval - (time.monotonic() - started)))
+            finally:
+                try:
+                    await cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                except Exception:
+                    pass  # Session closed while the frame was in flight
+
+        cdp.on("Page.screencastFrame", on_frame)
+        try:
+            while self.is_running:
+                viewers, fps, quality = self._stream_settings()
+                frame_interval = 1 / fps
+                if viewers == 0:
+                    # Nobody is watching this agent: stop encoding frames entirely
+                    if casting_quality is not None:
+                        await cdp.send("Page.stopScreencast")
+                        casting_quality = None
+                        self.last_frame_digest = None
+                elif quality != casting_quality:
+                    if casting_quality is not None:
+                        await cdp.send("Page.stopScreencast")
+                    await cdp.send("Page.startScreencast", {"format": "jpeg", "quality": quality})
+                    casting_quality = quality
+                await asyncio.sleep(VIDEO_PROBE_INTERVAL)
+        finally:
+            try:
+                if casting_quality is not None:
+                    await cdp.send("Page.stopScreencast")
+                await cdp.detach()
+            except Exception:
+                pass
+
+    async def _screenshot_loop(self):
+        """Polling fallback: periodic page.screenshot() with the same dedup and pacing"""
         while self.is_running:
             try:
                 if not self.page:
                     await asyncio.sleep(0.5)
                     continue
-                
+
+                viewers, fps, quality = self._stream_settings()
+                if viewers == 0:
+                    await asyncio.sleep(VIDEO_PROBE_INTERVAL)
+                    continue
+
+                started = time.monotonic()
                 # Capture frame as JPEG for better compression
-                screenshot = await self.page.screenshot(
-                    type="jpeg",
-                    quality=60
-                )
-                b64_img = base64.b64encode(screenshot).decode('utf-8')
-                
-                # Emit video frame
-                if self.event_callback:
-                    await self.event_callback("VIDEO_FRAME", {
-                        "message": b64_img,
-                        "frame": frame_count
-                    })
-                
-                frame_count += 1
-                
-                # 10 FPS = 100ms between frames
-                await asyncio.sleep(0.1)
-                
+                with FRAME_CAPTURE_SECONDS.time():
+                    screenshot = await self.page.screenshot(type="jpeg", quality=quality)
+                if not self._is_duplicate_frame(screenshot):
+                    await self._emit_frame(screenshot)
+
+                await asyncio.sleep(max(0.0, 1 / fps - (time.monotonic() - started)))
+
             except asyncio.CancelledError:
-                logger.info("Video stream cancelled")
-                break
+                raise
             except Exception as e:
                 logger.error(f"Frame capture error: {e}")
                 await asyncio.sleep(0.5)
-        
-        logger.info(f"Video stream stopped. Total frames: {frame_count}")
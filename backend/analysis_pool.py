@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from dom_extractor import extract_elements
+
+logger = logging.getLogger("AnalysisPool")
+
+# Processes parsing HTML off the event loop; 0 parses inline (blocks the loop while it runs)
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+
+
+class AnalysisPool:
+    """Runs dom_extractor.extract_elements in worker processes.
+
+    The HTML goes to the worker and only the compact extracted form (title,
+    links, buttons, inputs) comes back, so the parse never holds the event
+    loop or the GIL of the API/agent process. Workers are spawned lazily
+    with the "spawn" start method: forking a process that runs an event
+    loop and Playwright threads is not safe.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS):
+        self.workers = max(0, workers)
+        self._executor = None
+        self.submitted = 0
+        self.inline = 0
+        self.restarts = 0
+        self.failed = 0  # Pages lost with a broken pool
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def extract(self, html_content: str, backend: str = "bs4") -> Optional[dict]:
+        """Extracted elements of the page, None if the worker parsing it died"""
+        if not self.enabled:
+            self.inline += 1
+            return extract_elements(html_content, backend)
+        loop = asyncio.get_running_loop()
+        try:
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, extract_elements, html_content, backend)
+        except (OSError, RuntimeError) as e:
+            # Can't start processes here (resource limits, unguarded __main__ script); stay inline
+            logger.warning(f"Analysis pool unavailable, parsing inline ({type(e).__name__})")
+            self.close()
+            self.workers = 0
+            self.inline += 1
+            return extract_elements(html_content, backend)
+        try:
+            self.submitted += 1
+            return await future
+        except BrokenProcessPool:
+            # A worker died (OOM on a huge page, killed). This page may be the cause, so it is not parsed
+            # again: inline it could take this process down. Every pending parse fails with the pool;
+            # only the first replaces it, the others must not drop the fresh one
+            if self._executor is executor:
+                logger.warning("Analysis worker died, restarting the pool")
+                self.restarts += 1
+                self._executor = None
+                executor.shutdown(wait=False)
+            self.failed += 1
+            return None
+
+    async def warm(self):
+        """Spawn the workers (and import the parser in each) now rather than on the first page"""
+        if not self.enabled:
+            extract_elements("")
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, extract_elements, "") for _ in range(self.workers)))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "inline": self.inline,
+            "restarts": self.restarts,
+            "failed": self.failed,
+        }
+
+
+analysis_pool = AnalysisPool()
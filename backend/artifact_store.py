@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import uuid4
+
+from database import db
+
+logger = logging.getLogger("ArtifactStore")
+
+# Screenshots and other binary payloads live here instead of in log documents
+ARTIFACT_STORES = ("filesystem", "gridfs")
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "filesystem")
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "artifacts")
+ARTIFACT_RETENTION_DAYS = float(os.getenv("ARTIFACT_RETENTION_DAYS", "7"))
+ARTIFACT_PRUNE_INTERVAL = 3600
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "application/octet-stream": ".bin"}
+CONTENT_TYPES = {ext: content_type for content_type, ext in EXTENSIONS.items()}
+# filesystem ids: <day>-<uuid hex><ext>, stored as <ARTIFACT_DIR>/<day>/<uuid hex><ext>
+FILE_ID = re.compile(r"^(\d{8})-([0-9a-f]{32})(\.[a-z]{3})$")
+
+
+class ArtifactStore:
+    """Write-once binary blobs referenced from logs by id, expired after a retention period.
+
+    The filesystem backend keeps one directory per day, so pruning removes
+    whole directories instead of scanning files; GridFS uses the
+    "artifacts" bucket in the application database.
+    """
+
+    def __init__(self, backend: str = ARTIFACT_STORE, root: str = ARTIFACT_DIR,
+                 retention_days: float = ARTIFACT_RETENTION_DAYS):
+        if backend not in ARTIFACT_STORES:
+            raise ValueError(f"Unknown artifact store: {backend}")
+        self.backend = backend
+        self.root = root
+        self.retention_days = retention_days
+        self.stored = 0
+        self.bytes_stored = 0
+        self.pruned = 0
+        self._task = None
+
+    def _bucket(self):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        return AsyncIOMotorGridFSBucket(db.db, bucket_name="artifacts")
+
+    async def put(self, data: bytes, content_type: str = "image/jpeg", agent_id: Optional[str] = None) -> str:
+        ext = EXTENSIONS.get(content_type, ".bin")
+        if self.backend == "gridfs":
+            file_id = await self._bucket().upload_from_stream(
+                f"{agent_id or 'artifact'}{ext}", data,
+                metadata={"content_type": content_type, "agent_id": agent_id})
+            artifact_id = str(file_id)
+        else:
+            day = datetime.utcnow().strftime("%Y%m%d")
+            name = uuid4().hex + ext
+            await asyncio.to_thread(self._write_file, os.path.join(self.root, day), name, data)
+            artifact_id = f"{day}-{name}"
+        self.stored += 1
+        self.bytes_stored += len(data)
+        return artifact_id
+
+    @staticmethod
+    def _write_file(directory: str, name: str, data: bytes):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+
+    async def get(self, artifact_id: str) -> Optional[Tuple[bytes, str]]:
+        """(data, content type), or None for unknown or malformed ids"""
+        if self.backend == "gridfs":
+            from bson import ObjectId
+            from bson.errors import InvalidId
+            try:
+                stream = await self._bucket().open_download_stream(ObjectId(artifact_id))
+            except (InvalidId, TypeError):
+                return None
+            except Exception as e:
+                logger.debug(f"Artifact {artifact_id} not found: {e}")
+                return None
+            data = await stream.read()
+            return data, (stream.metadata or {}).get("content_type", "application/octet-stream")
+
+        match = FILE_ID.match(artifact_id)
+        if not match:
+            return None
+        day, name, ext = match.groups()
+        path = os.path.join(self.root, day, name + ext)
+        try:
+            data = await asyncio.to_thread(self._read_file, path)
+        except FileNotFoundError:
+            return None
+        return data, CONTENT_TYPES.get(ext, "application/octet-stream")
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def prune(self) -> int:
+        """Delete artifacts older than the retention period; returns how many were removed"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        removed = 0
+        if self.backend == "gridfs":
+            bucket = self._bucket()
+            async for grid_out in bucket.find({"uploadDate": {"$lt": cutoff}}):
+                await bucket.delete(grid_out._id)
+                removed += 1
+        else:
+            removed = await asyncio.to_thread(self._prune_days, cutoff.strftime("%Y%m%d"))
+        self.pruned += removed
+        return removed
+
+    def _prune_days(self, cutoff_day: str) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        for day in os.listdir(self.root):
+            if re.fullmatch(r"\d{8}", day) and day < cutoff_day:
+                directory = os.path.join(self.root, day)
+                removed += len(os.listdir(directory))
+                shutil.rmtree(directory, ignore_errors=True)
+        return removed
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                removed = await self.prune()
+                if removed:
+                    logger.info(f"Pruned {removed} artifacts older than {self.retention_days} days")
+            except Exception as e:
+                logger.warning(f"Artifact pruning failed: {e}")
+            await asyncio.sleep(ARTIFACT_PRUNE_INTERVAL)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "stored": self.stored,
+            "bytes_stored": self.bytes_stored,
+            "pruned": self.pruned,
+            "retention_days": self.retention_days,
+        }
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,124 @@
+"""Compare DecisionEngine analysis backends on a corpus of saved HTML pages.
+
+    python benchmarks/bench_analysis.py --corpus ./saved_pages
+    python benchmarks/bench_analysis.py --synthetic 20 --browser
+
+Without --corpus a synthetic corpus of heavy pages is generated. The
+"browser" backend needs Playwright's Chromium; it is timed as the agent
+loop pays for it (one page.evaluate) against page.content() + parse.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from decision_engine import DecisionEngine
+from dom_extractor import EXTRACT_ELEMENTS_JS, extract_elements
+
+
+def synthetic_page(i: int, links: int = 400, filler_kb: int = 200) -> str:
+    anchors = "\n".join(
+        f'<li><a href="/section/{i}/item-{j}?ref=nav">Item {j} <span>of section {i}</span></a></li>'
+        for j in range(links)
+    )
+    filler = "<p>" + ("lorem ipsum dolor sit amet " * 40) + "</p>"
+    filler = filler * max(1, (filler_kb * 1024) // len(filler))
+    return f"""<html><head><title>Synthetic page {i}</title>
+<script>var data = {json.dumps(list(range(500)))};</script></head>
+<body><nav><ul>{anchors}</ul></nav>
+<form><input name="q"><input id="email"><button>Search</button></form>
+<main>{filler}</main><footer><a href="https://external.example/">External link</a></footer></body></html>"""
+
+
+def load_corpus(path: str, synthetic: int):
+    if path:
+        files = sorted(glob.glob(os.path.join(path, "*.html")) + glob.glob(os.path.join(path, "*.htm")))
+        pages = []
+        for f in files:
+            with open(f, encoding="utf-8", errors="replace") as fh:
+                pages.append(fh.read())
+        return pages
+    return [synthetic_page(i) for i in range(synthetic)]
+
+
+def time_parser(pages, backend: str, repeat: int):
+    engine = DecisionEngine(analysis_backend=backend)
+    engine.set_current_url("https://example.com/")
+    samples = []
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            engine.analyze_elements(extract_elements(html, backend))
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_browser(pages, repeat: int):
+    from playwright.async_api import async_playwright
+
+    engine = DecisionEngine(analysis_backend="browser")
+    engine.set_current_url("https://example.com/")
+    old_path, new_path = [], []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        for html in pages:
+            await page.set_content(html)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                engine.analyze(await page.content())
+                old_path.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                engine.analyze_elements(await page.evaluate(EXTRACT_ELEMENTS_JS))
+                new_path.append(time.perf_counter() - start)
+        await browser.close()
+    return old_path, new_path
+
+
+def summarize(name: str, samples, total_bytes: int, pages: int):
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "backend": name,
+        "pages": len(samples),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        "mb_per_s": round(total_bytes * (len(samples) / pages) / total / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--synthetic", type=int, default=10, help="Synthetic pages when no corpus is given")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--browser", action="store_true", help="Also time the in-browser extraction")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.synthetic)
+    if not pages:
+        sys.exit("No pages found in corpus")
+    total_bytes = sum(len(p.encode("utf-8")) for p in pages)
+    print(f"Corpus: {len(pages)} pages, {total_bytes / 1e6:.1f} MB")
+
+    results = [summarize(b, time_parser(pages, b, args.repeat), total_bytes, len(pages)) for b in ("bs4", "lxml")]
+    if args.browser:
+        old_path, new_path = asyncio.run(time_browser(pages, args.repeat))
+        results.append(summarize("content+bs4", old_path, total_bytes, len(pages)))
+        results.append(summarize("browser", new_path, total_bytes, len(pages)))
+
+    for r in results:
+        print(f"{r['backend']:>12}: mean {r['mean_ms']:>9.3f} ms  p50 {r['p50_ms']:>9.3f} ms  "
+              f"p95 {r['p95_ms']:>9.3f} ms  {r['mb_per_s']:>7.2f} MB/s")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Unique pages reached per step: frontier planner vs the old random link choice.
+
+Drives DecisionEngine exactly like run_agent_loop (set_current_url ->
+analyze -> decide_next_action -> navigate), fetching pages over HTTP from
+a local fixture site instead of a browser.
+
+    python benchmarks/bench_frontier.py --pages 300 --steps 20 50 100
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fixture_site import FixtureSite
+from crawl_frontier import normalize_url
+from decision_engine import DecisionEngine
+
+
+def fetch(url: str):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.geturl(), response.read().decode("utf-8", errors="replace")
+
+
+def crawl(start_url: str, strategy: str, steps: int, seed: int):
+    import random
+    random.seed(seed)
+    engine = DecisionEngine(strategy=strategy)
+    unique = set()
+    curve = []
+    url = start_url
+    for _ in range(steps):
+        final_url, html = fetch(url)
+        unique.add(normalize_url(final_url))
+        curve.append(len(unique))
+        engine.set_current_url(final_url)
+        action = engine.decide_next_action(engine.analyze(html))
+        if action["type"] == "NAVIGATE":
+            url = action["target"]
+    return curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--links", type=int, default=8)
+    parser.add_argument("--steps", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--runs", type=int, default=5, help="Random seeds averaged per strategy")
+    args = parser.parse_args()
+
+    site = FixtureSite(pages=args.pages, links_per_page=args.links, page_kb=2)
+    start_url = site.start()
+    try:
+        max_steps = max(args.steps)
+        results = {}
+        for strategy in ("random", "frontier"):
+            curves = [crawl(start_url, strategy, max_steps, seed) for seed in range(args.runs)]
+            results[strategy] = {
+                str(n): round(sum(c[n - 1] for c in curves) / len(curves), 1) for n in args.steps
+            }
+    finally:
+        site.stop()
+
+    print(f"Fixture site: {args.pages} pages, {args.links} content links per page")
+    for n in args.steps:
+        r, f = results["random"][str(n)], results["frontier"][str(n)]
+        print(f"{n:>5} steps: random {r:>6.1f} unique pages ({r / n:.0%})  frontier {f:>6.1f} ({f / n:.0%})")
+    print(json.dumps({"pages": args.pages, "unique_pages_reached": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Event loop lag while N simulated agents parse pages, inline vs in the analysis pool.
+
+Each simulated agent loops over synthetic heavy pages: a short await
+(standing in for the browser round trip), then the same extract +
+analyze_elements the agent loop runs. A LoopLagMonitor samples how late
+the loop wakes a sleeping task, the delay video streams and WebSocket
+fan-out would see. No browser needed:
+
+    python benchmarks/bench_loop_lag.py --agents 1 2 4 8 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from analysis_pool import AnalysisPool
+from benchmarks.bench_analysis import synthetic_page
+from decision_engine import DecisionEngine
+from metrics import LoopLagMonitor
+
+
+async def simulate(pool: AnalysisPool, agents: int, pages: list, duration: float, backend: str) -> dict:
+    monitor = LoopLagMonitor(interval=0.01, window=100_000)
+    parsed = 0
+    deadline = time.perf_counter() + duration
+
+    async def agent(index: int):
+        nonlocal parsed
+        engine = DecisionEngine(analysis_backend=backend)
+        i = index
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)  # Browser round trip
+            engine.set_current_url(f"https://example.com/page/{i}")
+            elements = await pool.extract(pages[i % len(pages)], backend)
+            engine.analyze_elements(elements)
+            parsed += 1
+            i += agents
+
+    # Warm the pool up so process start-up isn't counted as lag
+    await asyncio.gather(*(pool.extract(pages[0], backend) for _ in range(max(1, pool.workers))))
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(agent(i) for i in range(agents)))
+    elapsed = time.perf_counter() - started
+    await monitor.close()
+    return {
+        "agents": agents,
+        "pages_per_second": round(parsed / elapsed, 2),
+        "loop_lag_ms": {k: v for k, v in monitor.stats().items() if k != "samples"},
+    }
+
+
+async def run(args) -> dict:
+    pages = [synthetic_page(i, links=args.links, filler_kb=args.page_kb) for i in range(8)]
+    report = {"config": {"page_kb": args.page_kb, "links": args.links, "backend": args.backend,
+                         "workers": args.workers, "duration": args.duration}}
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        pool = AnalysisPool(workers)
+        try:
+            report[mode] = [await simulate(pool, n, pages, args.duration, args.backend) for n in args.agents]
+        finally:
+            pool.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Analysis pool processes")
+    parser.add_argument("--page-kb", type=int, default=300)
+    parser.add_argument("--links", type=int, default=800)
+    parser.add_argument("--backend", choices=("bs4", "lxml"), default="bs4")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per configuration")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
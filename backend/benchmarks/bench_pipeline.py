@@ -0,0 +1,227 @@
+"""End-to-end agent benchmark against a local fixture site, with no network or MongoDB.
+
+Runs the real run_agent_loop -> AgentService (Playwright/Chromium) ->
+DecisionEngine pipeline for N concurrent agents on a generated site, with
+database.db pointed at an in-memory stand-in and one simulated dashboard
+client watching every agent's video. Prints a JSON report so runs can be
+diffed across commits:
+
+    python benchmarks/bench_pipeline.py --agents 4 --pages 200 --page-kb 50 > before.json
+
+Needs `playwright install chromium`.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fixture_site import FixtureSite
+from benchmarks.memory_mongo import MemoryDatabase
+
+
+class CountingSocket:
+    """Stands in for a dashboard WebSocket: accepts everything instantly and counts it"""
+
+    def __init__(self):
+        self.events = 0
+        self.frames = 0
+        self.frame_bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.events += 1
+
+    async def send_bytes(self, payload):
+        self.frames += 1
+        self.frame_bytes += len(payload)
+
+    async def close(self):
+        pass
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return round(values[index], 4)
+
+
+def browser_rss_bytes():
+    """Resident memory of this process's descendants (the browsers), Linux only"""
+    try:
+        children = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append((int(pid), int(fields[21]) * os.sysconf("SC_PAGE_SIZE")))
+    except OSError:
+        return None
+    total, stack = 0, [os.getpid()]
+    while stack:
+        for pid, rss in children.get(stack.pop(), []):
+            total += rss
+            stack.append(pid)
+    return total
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args):
+    import database
+    memory_db = MemoryDatabase()
+    database.db.db = memory_db
+
+    import main
+    from connection_manager import manager
+    from log_sink import log_sink
+    from models import AgentSchema
+    from repository import agent_repo
+    from scheduler import scheduler
+    from stats_aggregator import stats_aggregator
+
+    site = FixtureSite(pages=args.pages, links_per_page=args.links, page_kb=args.page_kb)
+    base_url = site.start(args.port)
+
+    # Step latency: time between consecutive OBSERVATION events of the same agent and tab
+    last_observation, step_latencies = {}, []
+    first_loads = {}  # site cache state -> first page load times
+    broadcast = manager.broadcast
+
+    async def timed_broadcast(message):
+        data = message.get("data") or {}
+        if "first_load_seconds" in data:
+            first_loads.setdefault(data["site_cache"], []).append(data["first_load_seconds"])
+        if message.get("type") == "OBSERVATION":
+            now = time.perf_counter()
+            key = (message.get("agent_id"), message.get("message", "").split("]")[0])
+            if key in last_observation:
+                step_latencies.append(now - last_observation[key])
+            last_observation[key] = now
+        await broadcast(message)
+
+    manager.broadcast = timed_broadcast
+    viewer = CountingSocket()
+    await manager.connect(viewer)
+    manager.handle_control(viewer, json.dumps({"action": "set", "events": ["*", "video"]}))
+
+    log_sink.start()
+    stats_aggregator.start()
+    agent_ids = []
+    for _ in range(args.agents):
+        agent = AgentSchema(target_url=base_url, autonomy_level="passive", status="QUEUED")
+        await agent_repo.create_agent(agent)
+        agent_ids.append(agent.id)
+    ops_before = dict(memory_db.ops)
+
+    tracemalloc.start()
+    rss_before = browser_rss_bytes()
+    peak_browser_rss = 0
+
+    async def sample_browser_memory():
+        nonlocal peak_browser_rss
+        while True:
+            rss = browser_rss_bytes()
+            if rss is not None:
+                peak_browser_rss = max(peak_browser_rss, rss - (rss_before or 0))
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_browser_memory())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            main.run_agent_loop(base_url, agent_id, "passive", analysis_backend=args.backend,
+                                tabs=args.tabs, pacing=args.pacing, site_cache=args.site_cache)
+            for agent_id in agent_ids
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        sampler.cancel()
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await log_sink.close()
+        await stats_aggregator.close()
+        await scheduler.pool.close()
+        manager.disconnect(viewer)
+        site.stop()
+
+    # Only what the agents did: setup and the reads below are excluded
+    db_ops = {op: n - ops_before.get(op, 0) for op, n in sorted(memory_db.ops.items())
+              if n > ops_before.get(op, 0) and not op.endswith(".create_index")}
+    agents = [await agent_repo.get_agent(agent_id) for agent_id in agent_ids]
+    pages = sum((a.get("stats") or {}).get("pages_explored", 0) for a in agents)
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "agents": args.agents, "tabs": args.tabs, "pacing": args.pacing, "backend": args.backend,
+            "site_cache": args.site_cache,
+            "site_pages": args.pages, "links_per_page": args.links, "page_kb": args.page_kb,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_explored": pages,
+        "pages_per_second": round(pages / elapsed, 3) if elapsed else None,
+        "step_latency_seconds": {
+            "p50": percentile(step_latencies, 50),
+            "p95": percentile(step_latencies, 95),
+            "samples": len(step_latencies),
+        },
+        "first_page_load_seconds": {state: percentile(times, 50) for state, times in first_loads.items()},
+        "memory_per_agent_mb": {
+            "python_peak": round(python_peak / args.agents / 2**20, 2),
+            "browser_peak": round(peak_browser_rss / args.agents / 2**20, 2) if rss_before is not None else None,
+        },
+        "frames_per_second": round(viewer.frames / elapsed, 2) if elapsed else None,
+        "frame_kb_avg": round(viewer.frame_bytes / viewer.frames / 1024, 1) if viewer.frames else None,
+        "db_ops_total": sum(db_ops.values()),
+        "db_ops_per_step": round(sum(db_ops.values()) / pages, 3) if pages else None,
+        "db_ops": db_ops,
+        "statuses": sorted(a.get("status") for a in agents),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=2)
+    parser.add_argument("--tabs", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=200, help="Fixture site size")
+    parser.add_argument("--links", type=int, default=8, help="Content links per page")
+    parser.add_argument("--page-kb", type=int, default=20, help="Approximate HTML weight per page")
+    parser.add_argument("--pacing", choices=("fixed", "adaptive"), default="adaptive")
+    parser.add_argument("--backend", choices=("bs4", "lxml", "browser"), default="bs4")
+    parser.add_argument("--site-cache", action="store_true",
+                        help="Reuse storage state and cached assets; run twice to compare cold and warm first loads")
+    parser.add_argument("--port", type=int, default=0, help="Fixture site port (fix it so --site-cache runs share an origin)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # The agent loop prints progress; keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Cold start: cost of importing the app, and time from startup to the first agent's first video frame.
+
+Every measurement runs in a fresh interpreter. `import main` is timed as
+it is now (Playwright, BeautifulSoup, lxml and the MongoDB driver load on
+first use) and with those imported up front, as the app used to. Then
+the startup handler runs against an in-memory MongoDB stand-in with each
+PREWARM_BROWSERS value, one agent is started on a local fixture site
+--delay seconds later (a client arriving right after a deploy), and the
+time until its first video frame is reported:
+
+    python benchmarks/bench_startup.py --prewarm 0 1 --delay 1
+
+The first-frame part needs `playwright install chromium`; --imports-only skips it.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY_MODULES = ("playwright", "bs4", "lxml", "motor", "pymongo", "bson")
+EAGER_IMPORTS = ("playwright.async_api", "bs4", "motor.motor_asyncio")
+
+
+def child_import(eager: bool) -> dict:
+    import importlib
+    started = time.perf_counter()
+    if eager:
+        for name in EAGER_IMPORTS:
+            importlib.import_module(name)
+    import main  # noqa: F401
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "loaded": [name for name in HEAVY_MODULES if name in sys.modules]}
+
+
+async def child_start(args) -> dict:
+    import database
+    from benchmarks.bench_pipeline import CountingSocket
+    from benchmarks.fixture_site import FixtureSite
+    from benchmarks.memory_mongo import MemoryDatabase
+    database.db.db = MemoryDatabase()
+    database.db.connect = lambda: None  # Keep the in-memory stand-in
+
+    import main
+    from connection_manager import manager
+    from startup import startup
+
+    site = FixtureSite(pages=50, page_kb=args.page_kb)
+    base_url = site.start()
+    viewer = CountingSocket()
+    await manager.connect(viewer)
+    manager.handle_control(viewer, json.dumps({"action": "set", "events": ["*", "video"]}))
+    try:
+        await main.startup_db_client()
+        await asyncio.sleep(args.delay)
+        requested = time.perf_counter()
+        await main.start_agent(main.AgentStartRequest(url=base_url, max_pages=3))
+        deadline = requested + args.timeout
+        while startup.first_agent_frame_seconds is None and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        first_frame = time.perf_counter() - requested if startup.first_agent_frame_seconds is not None else None
+        return {
+            "prewarm_browsers": int(os.getenv("PREWARM_BROWSERS", "0")),
+            "request_to_first_frame_seconds": round(first_frame, 3) if first_frame is not None else None,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in startup.stats().items()},
+        }
+    finally:
+        await main.shutdown_db_client()
+        manager.disconnect(viewer)
+        site.stop()
+
+
+def run_child(flags: list, env: dict = None) -> dict:
+    result = subprocess.run([sys.executable, os.path.abspath(__file__)] + flags, capture_output=True, text=True,
+                            env={**os.environ, **(env or {})})
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}
+    return json.loads(result.stdout)
+
+
+def imports_report(repeat: int) -> dict:
+    report = {}
+    for mode in ("lazy", "eager"):
+        runs = [run_child(["--child-import", mode]) for _ in range(repeat)]
+        seconds = [run["seconds"] for run in runs if "seconds" in run]
+        report[mode] = {
+            "import_main_seconds": round(statistics.median(seconds), 3) if seconds else None,
+            "heavy_modules_loaded": runs[-1].get("loaded", runs[-1]),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per import measurement (median)")
+    parser.add_argument("--prewarm", type=int, nargs="+", default=[0, 1], help="PREWARM_BROWSERS values to compare")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds between startup and the first agent")
+    parser.add_argument("--page-kb", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--imports-only", action="store_true")
+    parser.add_argument("--child-import", choices=("lazy", "eager"), help=argparse.SUPPRESS)
+    parser.add_argument("--child-start", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_import or args.child_start:
+        # The app logs to stdout; keep it for the child's JSON result
+        with contextlib.redirect_stdout(sys.stderr):
+            result = child_import(args.child_import == "eager") if args.child_import else asyncio.run(child_start(args))
+        print(json.dumps(result))
+        return
+
+    report = {"config": {"repeat": args.repeat, "delay": args.delay}, "imports": imports_report(args.repeat)}
+    if not args.imports_only:
+        flags = ["--child-start", "--delay", str(args.delay), "--page-kb", str(args.page_kb),
+                 "--timeout", str(args.timeout)]
+        report["first_frame"] = [run_child(flags, {"PREWARM_BROWSERS": str(n)}) for n in args.prewarm]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Bytes per URL and lookup speed: a Python set of URL strings vs url_store.UrlSet.
+
+Adds N synthetic, realistic-length URLs to each store, then looks up
+hits and misses. Memory is accounted from object sizes by default;
+--trace measures the Python heap with tracemalloc instead (current and
+peak, much slower). Spilled ids live in memory-mapped files that the OS
+pages in and out, so they are reported separately from resident bytes:
+
+    python benchmarks/bench_url_store.py --urls 1000000 [--trace]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from url_store import UrlSet
+
+
+def synthetic_url(i: int) -> str:
+    return f"https://shop.example.com/category/{i % 1000}/product-{i}?page={i % 7}&ref=listing"
+
+
+def set_bytes(urls: set) -> int:
+    return sys.getsizeof(urls) + sum(sys.getsizeof(url) for url in urls)
+
+
+def measure(name: str, factory, count: int, lookups: int, trace: bool) -> dict:
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    store = factory()
+    for i in range(count):
+        store.add(synthetic_url(i))
+    build = time.perf_counter() - started
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    step = max(1, count // lookups)
+    started = time.perf_counter()
+    hits = sum(synthetic_url(i) in store for i in range(0, count, step))
+    hit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    misses = sum(synthetic_url(count + i) in store for i in range(lookups))
+    miss_seconds = time.perf_counter() - started
+
+    result = {
+        "store": name,
+        "urls": len(store),
+        "build_seconds": round(build, 2),
+        "hit_lookups_per_second": round(hits / hit_seconds),
+        "miss_lookups_per_second": round(lookups / miss_seconds),
+        "false_hits": misses,
+    }
+    if isinstance(store, UrlSet):
+        usage = store.memory_usage()
+        result["bytes_per_url"] = usage["bytes_per_url"]
+        result["spilled_bytes_per_url"] = round(usage["spilled_bytes"] / count, 2)
+        result["usage"] = usage
+        store.close()
+    else:
+        result["bytes_per_url"] = round(set_bytes(store) / count, 2)
+    if trace:
+        result["traced_bytes_per_url"] = round(current / count, 2)
+        result["traced_peak_bytes_per_url"] = round(peak / count, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--spill-mb", type=float, default=1.0, help="URL_STORE_SPILL_MB for the spilling store")
+    parser.add_argument("--trace", action="store_true", help="Measure the Python heap with tracemalloc")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        stores = [
+            ("set[str]", set),
+            ("UrlSet", lambda: UrlSet(spill_dir=None)),
+            ("UrlSet+spill", lambda: UrlSet(spill_dir=spill_dir, spill_mb=args.spill_mb)),
+        ]
+        results = [measure(name, factory, args.urls, args.lookups, args.trace) for name, factory in stores]
+    baseline = results[0]["bytes_per_url"]
+    for result in results[1:]:
+        result["reduction"] = round(baseline / max(result["bytes_per_url"], 1e-9), 1)
+    print(json.dumps({"config": {"urls": args.urls, "lookups": args.lookups, "avg_url_chars": len(synthetic_url(args.urls // 2))},
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
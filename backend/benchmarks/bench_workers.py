@@ -0,0 +1,143 @@
+"""Worker mode end to end on one machine: API-side queue and event relay, N worker processes.
+
+The processes share an in-memory MongoDB stand-in (no mongod needed) and
+crawl a local fixture site. --kill-after SIGKILLs one worker mid-run to
+show its jobs being reclaimed once their lease lapses:
+
+    python benchmarks/bench_workers.py --workers 3 --agents 6 --kill-after 10
+
+Needs `playwright install chromium`.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Before main is imported: the API half must only enqueue
+os.environ["EXECUTION_MODE"] = "worker"
+
+from benchmarks.fixture_site import FixtureSite
+from benchmarks.memory_mongo import RemoteMemoryDatabase, serve_memory_database
+from benchmarks.bench_pipeline import CountingSocket
+
+TERMINAL = {"COMPLETED", "FAILED"}
+
+
+def child_command(args, address, index):
+    return [sys.executable, os.path.abspath(__file__), "--child", f"{address[0]}:{address[1]}",
+            "--worker-id", f"worker-{index}"]
+
+
+async def run_child(address: str, worker_id: str):
+    import database
+    host, port = address.rsplit(":", 1)
+    database.db.db = RemoteMemoryDatabase((host, int(port)))
+
+    from log_sink import log_sink
+    from stats_aggregator import stats_aggregator
+    from worker import Worker
+
+    log_sink.start()
+    stats_aggregator.start()
+    worker = Worker(worker_id)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await log_sink.close()
+        await stats_aggregator.close()
+
+
+async def run(args):
+    server = serve_memory_database()
+    import database
+    database.db.db = RemoteMemoryDatabase(server.address)
+
+    import main
+    from connection_manager import manager
+    from event_relay import ensure_event_collection
+
+    site = FixtureSite(pages=args.pages, page_kb=args.page_kb)
+    base_url = site.start()
+    await ensure_event_collection()
+    main.event_relay.start()
+    viewer = CountingSocket()
+    await manager.connect(viewer)
+    manager.handle_control(viewer, json.dumps({"action": "set", "events": ["*", "video"]}))
+
+    agent_ids = []
+    for _ in range(args.agents):
+        started = await main.start_agent(main.AgentStartRequest(url=base_url))
+        agent_ids.append(started["agent_id"])
+
+    env = {**os.environ, "MAX_CONCURRENT_AGENTS": str(args.per_worker), "JOB_LEASE_SECONDS": str(args.lease),
+           "JOB_HEARTBEAT_INTERVAL": str(max(0.5, args.lease / 5))}
+    workers = [subprocess.Popen(child_command(args, server.address, i), env=env) for i in range(args.workers)]
+    killed = None
+    started = time.perf_counter()
+    try:
+        while True:
+            await asyncio.sleep(0.5)
+            elapsed = time.perf_counter() - started
+            if args.kill_after and killed is None and elapsed >= args.kill_after:
+                killed = workers[0]
+                killed.kill()
+            agents = [await main.agent_repo.get_agent(agent_id) for agent_id in agent_ids]
+            if all(a and a.get("status") in TERMINAL for a in agents) or elapsed > args.timeout:
+                break
+    finally:
+        for process in workers:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in workers:
+            process.wait()
+        await main.event_relay.close()
+        manager.disconnect(viewer)
+        site.stop()
+
+    jobs = [d async for d in database.db.db.jobs.find({}, {"_id": 0, "id": 1, "worker": 1, "status": 1, "attempts": 1})]
+    report = {
+        "config": {"workers": args.workers, "agents": args.agents, "per_worker": args.per_worker,
+                   "lease_seconds": args.lease, "kill_after": args.kill_after},
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+        "pages_explored": sum((a.get("stats") or {}).get("pages_explored", 0) for a in agents if a),
+        "agent_statuses": sorted(a.get("status") for a in agents if a),
+        "jobs_per_worker": {w: sum(1 for j in jobs if j.get("worker") == w) for w in sorted({j.get("worker") for j in jobs})},
+        "reclaimed_jobs": sum(1 for j in jobs if j.get("attempts", 0) > 1),
+        "events_relayed": viewer.events,
+        "frames_relayed": viewer.frames,
+    }
+    server.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--per-worker", type=int, default=2, help="MAX_CONCURRENT_AGENTS of each worker")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-kb", type=int, default=20)
+    parser.add_argument("--lease", type=float, default=5, help="JOB_LEASE_SECONDS for the workers")
+    parser.add_argument("--kill-after", type=float, help="SIGKILL the first worker after this many seconds")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args.child, args.worker_id))
+        return
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
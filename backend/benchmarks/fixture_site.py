@@ -0,0 +1,123 @@
+"""Deterministic synthetic website served from a local thread, for offline benchmarks.
+
+Pages form a tree: every page has a shared navigation bar (home + the first
+sections), links to its children, parent and siblings, and filler text to reach the requested page weight. Some
+links use equivalent spellings of the same URL (fragments, trailing
+slashes, reordered query strings) the way real templates do.
+"""
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class FixtureSite:
+    def __init__(self, pages: int = 200, links_per_page: int = 8, page_kb: int = 20,
+                 nav_links: int = 5, seed: int = 0):
+        self.pages = pages
+        self.links_per_page = links_per_page
+        self.page_kb = page_kb
+        self.nav_links = nav_links
+        self.seed = seed
+        self.server = None
+        self.thread = None
+        self.requests = 0
+        self._cache = {}
+
+    @staticmethod
+    def path_for(i: int) -> str:
+        return "/" if i == 0 else f"/page/{i}"
+
+    def _variant(self, rng: random.Random, i: int) -> str:
+        path = self.path_for(i)
+        roll = rng.random()
+        if roll < 0.15:
+            return path + "#content"
+        if roll < 0.25 and i:
+            return path + "/"
+        if roll < 0.35:
+            return path + "?b=2&a=1" if rng.random() < 0.5 else path + "?a=1&b=2"
+        return path
+
+    def outlinks(self, i: int):
+        """Pages form a tree (section -> articles); leaves link back to their parent and siblings"""
+        rng = random.Random(self.seed * 1_000_003 + i)
+        fanout = max(1, self.links_per_page // 2)
+        children = [c for c in range(i * fanout + 1, i * fanout + fanout + 1) if c < self.pages]
+        targets = list(children)
+        if i:
+            parent = (i - 1) // fanout
+            targets.append(parent)
+            targets += [s for s in range(parent * fanout + 1, parent * fanout + fanout + 1)
+                        if s != i and s < self.pages][:2]
+        # The odd "related article" link anywhere on the site
+        if rng.random() < 0.3:
+            targets.append(rng.randrange(self.pages))
+        return rng, targets
+
+    def page_html(self, i: int) -> bytes:
+        if i in self._cache:
+            return self._cache[i]
+        rng, targets = self.outlinks(i)
+        nav = "".join(
+            f'<li><a href="{self.path_for(j)}">Section {j} overview</a></li>'
+            for j in range(min(self.nav_links, self.pages))
+        )
+        content = "".join(
+            f'<li><a href="{self._variant(rng, j)}">Article number {j}</a></li>' for j in targets
+        )
+        filler_unit = "<p>" + ("The quick brown fox jumps over the lazy dog. " * 20) + "</p>"
+        filler = filler_unit * max(1, (self.page_kb * 1024) // len(filler_unit))
+        html = (
+            f"<html><head><title>Fixture page {i}</title></head><body>"
+            f"<nav><ul>{nav}</ul></nav><main><h1>Page {i}</h1><ul>{content}</ul>"
+            f"<form><input name=\"q\"><button>Search</button></form>{filler}</main>"
+            f"<footer><a href=\"mailto:team@example.com\">Contact us</a></footer></body></html>"
+        ).encode()
+        self._cache[i] = html
+        return html
+
+    def page_index(self, path: str):
+        path = urlsplit(path).path.rstrip("/") or "/"
+        if path == "/":
+            return 0
+        if path.startswith("/page/"):
+            try:
+                i = int(path[len("/page/"):])
+            except ValueError:
+                return None
+            return i if 0 < i < self.pages else None
+        return None
+
+    def start(self, port: int = 0) -> str:
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                i = site.page_index(self.path)
+                body = site.page_html(i) if i is not None else b"<html><body>Not found</body></html>"
+                self.send_response(200 if i is not None else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,169 @@
+"""Load test for ConnectionManager fan-out with hundreds of dashboard clients.
+
+In-process (default): simulated sockets with fast, slow and dead clients,
+driven by simulated agents producing video frames and log events. Reports
+how long the producer side is blocked per broadcast, and what each class of
+client received.
+
+    python benchmarks/load_test_ws.py --clients 500 --agents 8 --seconds 10
+
+Against a running server (uvicorn main:app), real WebSocket clients that
+just count what they receive; start some agents first to generate traffic:
+
+    python benchmarks/load_test_ws.py --url ws://localhost:8000/ws --clients 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from connection_manager import ConnectionManager, expand_topics
+
+
+class SimulatedSocket:
+    def __init__(self, kind: str, latency: float):
+        self.kind = kind
+        self.latency = latency
+        self.events = 0
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def _send(self, size: int):
+        if self.kind == "dead":
+            raise ConnectionResetError("peer gone")
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+        self.bytes += size
+
+    async def send_json(self, message):
+        await self._send(len(json.dumps(message)))
+        self.events += 1
+
+    async def send_bytes(self, payload):
+        await self._send(len(payload))
+        self.frames += 1
+
+    async def close(self):
+        pass
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+async def run_in_process(args):
+    manager = ConnectionManager()
+    sockets = []
+    for i in range(args.clients):
+        roll = random.random()
+        if roll < args.dead_ratio:
+            sock = SimulatedSocket("dead", 0)
+        elif roll < args.dead_ratio + args.slow_ratio:
+            sock = SimulatedSocket("slow", 0.25)
+        else:
+            sock = SimulatedSocket("fast", 0.002)
+        sockets.append(sock)
+        client = await manager.connect(sock)
+        # Each dashboard watches one agent's video plus everyone's logs
+        manager.subscribe(client, expand_topics([f"agent-{i % args.agents}"], ["video"]))
+
+    frame = os.urandom(args.frame_kb * 1024)
+    broadcast_latency = []
+    events_emitted = 0
+    deadline = time.monotonic() + args.seconds
+
+    async def agent(agent_id: str):
+        nonlocal events_emitted
+        tick = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            await manager.broadcast_frame(agent_id, frame)
+            if tick % 5 == 0:
+                await manager.broadcast({"type": "INFO", "message": f"step {tick}", "agent_id": agent_id})
+                events_emitted += 1
+            broadcast_latency.append(time.perf_counter() - start)
+            tick += 1
+            await asyncio.sleep(1 / args.fps)
+
+    await asyncio.gather(*(agent(f"agent-{i}") for i in range(args.agents)))
+    await asyncio.sleep(1)  # Let writers drain
+
+    report = {
+        "clients": args.clients,
+        "agents": args.agents,
+        "seconds": args.seconds,
+        "broadcast_p50_us": round(percentile(broadcast_latency, 0.5) * 1e6, 1),
+        "broadcast_p99_us": round(percentile(broadcast_latency, 0.99) * 1e6, 1),
+        "broadcast_max_us": round(max(broadcast_latency) * 1e6, 1),
+        "events_emitted_per_agent": events_emitted // args.agents,
+        "manager": manager.queue_stats(),
+    }
+    for kind in ("fast", "slow", "dead"):
+        group = [s for s in sockets if s.kind == kind]
+        if group:
+            report[kind] = {
+                "clients": len(group),
+                "still_connected": sum(1 for s in group if s in manager.clients),
+                "avg_frames": round(sum(s.frames for s in group) / len(group), 1),
+                "avg_events": round(sum(s.events for s in group) / len(group), 1),
+            }
+    for client in list(manager.clients.values()):
+        manager.disconnect(client.websocket)
+    return report
+
+
+async def run_against_server(args):
+    import websockets
+
+    counts = {"events": 0, "frames": 0, "bytes": 0, "errors": 0}
+    deadline = time.monotonic() + args.seconds
+
+    async def client(slow: bool):
+        try:
+            async with websockets.connect(args.url, max_size=None) as ws:
+                await ws.send(json.dumps({"action": "subscribe", "events": ["*", "video"]}))
+                while time.monotonic() < deadline:
+                    try:
+                        msg = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        break
+                    if isinstance(msg, bytes):
+                        counts["frames"] += 1
+                    else:
+                        counts["events"] += 1
+                    counts["bytes"] += len(msg)
+                    if slow:
+                        await asyncio.sleep(0.25)
+        except Exception:
+            counts["errors"] += 1
+
+    await asyncio.gather(*(client(random.random() < args.slow_ratio) for _ in range(args.clients)))
+    return {"clients": args.clients, "seconds": args.seconds, **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--frame-kb", type=int, default=40)
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--dead-ratio", type=float, default=0.05)
+    parser.add_argument("--url", help="ws:// URL of a running backend instead of the in-process simulation")
+    args = parser.parse_args()
+
+    runner = run_against_server if args.url else run_in_process
+    print(json.dumps(asyncio.run(runner(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
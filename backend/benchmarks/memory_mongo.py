@@ -0,0 +1,455 @@
+"""In-memory stand-in for the subset of Motor the backend uses, counting every operation.
+
+Enough for benchmarks: equality/comparison/$and/$or queries, sort, limit,
+simple projections, $set/$inc/$min/$currentDate/$setOnInsert updates with upsert,
+find_one_and_update, bulk_write of UpdateOne, and tailable cursors. Not a
+general MongoDB emulation.
+
+serve_memory_database()/RemoteMemoryDatabase share one instance between
+processes, so worker processes can be tested without a real MongoDB.
+"""
+import asyncio
+import copy
+import inspect
+import threading
+from collections import Counter
+from datetime import datetime
+from multiprocessing.managers import BaseManager
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+
+def _get(document, path):
+    for part in path.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return None
+        document = document[part]
+    return document
+
+
+def _set(document, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _matches(document, query):
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(_matches(document, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(document, q) for q in condition):
+                return False
+        elif isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            value = _get(document, key)
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand or op == "$nin" and value in operand:
+                    return False
+                if op == "$exists" and (value is not None) != bool(operand):
+                    return False
+                if value is None and op in ("$lt", "$lte", "$gt", "$gte"):
+                    return False
+                if (op == "$lt" and not value < operand or op == "$lte" and not value <= operand
+                        or op == "$gt" and not value > operand or op == "$gte" and not value >= operand
+                        or op == "$ne" and value == operand):
+                    return False
+        elif _get(document, key) != condition:
+            return False
+    return True
+
+
+def _project(document, projection):
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    include = [k for k, v in projection.items() if v and k != "_id"]
+    if include:
+        result = {}
+        for path in include:
+            value = _get(document, path)
+            if value is not None:
+                _set(result, path, value)
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    for path, value in projection.items():
+        if not value:
+            parts = path.split(".")
+            target = document
+            for part in parts[:-1]:
+                target = target.get(part, {}) if isinstance(target, dict) else {}
+            if isinstance(target, dict):
+                target.pop(parts[-1], None)
+    return document
+
+
+class MemoryCursor:
+    def __init__(self, documents, projection):
+        self.documents = documents
+        self.projection = projection
+        self._limit = None
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for field, order in reversed(keys):
+            self.documents.sort(key=lambda d: (_get(d, field) is not None, _get(d, field)), reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __aiter__(self):
+        documents = self.documents if self._limit is None else self.documents[:self._limit]
+        self._iter = iter([_project(d, self.projection) for d in documents])
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryTailCursor:
+    """Tailable-await cursor: yields matches as they are appended, ends a batch after a quiet moment"""
+
+    def __init__(self, collection, query, wait: float = 0.5):
+        self.collection = collection
+        self.query = query
+        self.wait = wait
+        self.position = 0
+        self.alive = True
+
+    async def close(self):
+        self.alive = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        waited = 0.0
+        while True:
+            documents = self.collection.documents
+            while self.position < len(documents):
+                document = documents[self.position]
+                self.position += 1
+                if _matches(document, self.query):
+                    return copy.deepcopy(document)
+            if waited >= self.wait:
+                raise StopAsyncIteration
+            await asyncio.sleep(0.02)
+            waited += 0.02
+
+
+class MemoryCollection:
+    def __init__(self, name, ops: Counter):
+        self.name = name
+        self.documents = []
+        self.ops = ops
+
+    def _count(self, op, n=1):
+        self.ops[f"{self.name}.{op}"] += n
+
+    async def create_index(self, keys, **options):
+        self._count("create_index")
+
+    async def index_information(self):
+        return {}  # Indexes aren't kept
+
+    @staticmethod
+    def _with_id(document):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        return document
+
+    async def insert_one(self, document):
+        self._count("insert_one")
+        self.documents.append(self._with_id(document))
+
+    async def insert_many(self, documents, ordered=True):
+        self._count("insert_many")
+        self.documents.extend(self._with_id(d) for d in documents)
+
+    def find(self, query=None, projection=None, cursor_type=None):
+        self._count("find")
+        if cursor_type is not None:
+            return MemoryTailCursor(self, query)
+        return MemoryCursor([d for d in self.documents if _matches(d, query)], projection)
+
+    async def count_documents(self, query):
+        self._count("count_documents")
+        return sum(1 for d in self.documents if _matches(d, query))
+
+    async def distinct(self, key, query=None):
+        self._count("distinct")
+        values = []
+        for document in self.documents:
+            value = _get(document, key)
+            if _matches(document, query) and value is not None and value not in values:
+                values.append(value)
+        return values
+
+    async def find_one(self, query=None, projection=None):
+        self._count("find_one")
+        for document in self.documents:
+            if _matches(document, query):
+                return _project(document, projection)
+        return None
+
+    def _apply(self, query, update, upsert):
+        document = next((d for d in self.documents if _matches(d, query)), None)
+        if document is None:
+            if not upsert:
+                return None
+            document = {k: v for k, v in query.items() if not k.startswith("$")}
+            document["_id"] = ObjectId()
+            self.documents.append(document)
+            for path, value in update.get("$setOnInsert", {}).items():
+                _set(document, path, value)
+        for path, value in update.get("$set", {}).items():
+            _set(document, path, value)
+        for path, value in update.get("$inc", {}).items():
+            _set(document, path, (_get(document, path) or 0) + value)
+        for path in update.get("$currentDate", {}):
+            _set(document, path, datetime.utcnow())
+        for path, value in update.get("$min", {}).items():
+            current = _get(document, path)
+            _set(document, path, value if current is None else min(current, value))
+        return document
+
+    async def update_one(self, query, update, upsert=False):
+        self._count("update_one")
+        self._apply(query, update, upsert)
+
+    async def update_many(self, query, update):
+        self._count("update_many")
+        for document in [d for d in self.documents if _matches(d, query)]:
+            self._apply({"_id": document["_id"]}, update, False)
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        self._count("find_one_and_update")
+        candidates = MemoryCursor([d for d in self.documents if _matches(d, query)], None)
+        if sort:
+            candidates.sort(sort)
+        if not candidates.documents:
+            document = self._apply(query, update, upsert)
+            return _project(document, projection) if document and return_document == ReturnDocument.AFTER else None
+        before = copy.deepcopy(candidates.documents[0])
+        document = self._apply({"_id": before["_id"]}, update, False)
+        return _project(document if return_document == ReturnDocument.AFTER else before, projection)
+
+    async def bulk_write(self, requests, ordered=True):
+        self._count("bulk_write")
+        for request in requests:
+            # pymongo.UpdateOne keeps its arguments in private attributes
+            self._apply(request._filter, request._doc, request._upsert)
+
+    async def delete_many(self, query):
+        self._count("delete_many")
+        self.documents = [d for d in self.documents if not _matches(d, query)]
+
+    def aggregate(self, pipeline, **options):
+        raise NotImplementedError("aggregate is not supported by the in-memory stand-in")
+
+
+class MemoryDatabase:
+    """Drop-in for database.db.db; collections are created on first access"""
+
+    def __init__(self):
+        self.ops = Counter()
+        self._collections = {}
+
+    async def list_collection_names(self):
+        return list(self._collections)
+
+    async def create_collection(self, name, **options):
+        self.ops[f"{name}.create_collection"] += 1
+        return getattr(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name, self.ops)
+        return self._collections[name]
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+# --- Sharing one MemoryDatabase between processes ---
+
+def _run_sync(coroutine):
+    """The in-memory methods never actually suspend, so drive them without an event loop"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("in-memory operation tried to suspend")
+
+
+class _MemoryServer:
+    """Runs in the manager process; every call is serialized on one lock"""
+
+    def __init__(self):
+        self.database = MemoryDatabase()
+        self.lock = threading.Lock()
+
+    def call(self, collection, method, args, kwargs):
+        with self.lock:
+            target = self.database if collection is None else self.database[collection]
+            result = getattr(target, method)(*args, **kwargs)
+            return _run_sync(result) if inspect.iscoroutine(result) else result
+
+    def find(self, collection, query, projection, sort, limit):
+        with self.lock:
+            cursor = self.database[collection].find(query, projection)
+            if sort:
+                cursor.sort(sort)
+            documents = cursor.documents if limit is None else cursor.documents[:limit]
+            return [_project(d, projection) for d in documents]
+
+    def tail(self, collection, query, position):
+        """Matches appended since `position`, and the position to continue from"""
+        with self.lock:
+            documents = self.database[collection].documents
+            return [copy.deepcopy(d) for d in documents[position:] if _matches(d, query)], len(documents)
+
+    def ops(self):
+        with self.lock:
+            return dict(self.database.ops)
+
+
+_server_instance = None
+
+
+def _server():
+    global _server_instance
+    if _server_instance is None:
+        _server_instance = _MemoryServer()
+    return _server_instance
+
+
+class _Manager(BaseManager):
+    pass
+
+
+_Manager.register("memory_server", callable=_server)
+
+
+def serve_memory_database(authkey: bytes = b"memory-mongo"):
+    """Start a process holding one MemoryDatabase; returns the manager (stop with .shutdown())"""
+    manager = _Manager(address=("127.0.0.1", 0), authkey=authkey)
+    manager.start()
+    return manager
+
+
+class RemoteCursor:
+    def __init__(self, remote, query, projection):
+        self.remote = remote
+        self.args = [query, projection]
+        self._sort = None
+        self._limit = None
+
+    def sort(self, keys, direction=None):
+        self._sort = [(keys, direction or 1)] if isinstance(keys, str) else list(keys)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def __aiter__(self):
+        self._documents = None
+        return self
+
+    async def __anext__(self):
+        if self._documents is None:
+            server, name = self.remote.server, self.remote.name
+            self._documents = iter(await asyncio.to_thread(server.find, name, *self.args, self._sort, self._limit))
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class RemoteTailCursor:
+    def __init__(self, remote, query, wait: float = 0.5):
+        self.remote = remote
+        self.query = query
+        self.wait = wait
+        self.position = 0
+        self.pending = []
+        self.alive = True
+
+    async def close(self):
+        self.alive = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        waited = 0.0
+        while not self.pending:
+            if waited >= self.wait:
+                raise StopAsyncIteration
+            documents, self.position = await asyncio.to_thread(
+                self.remote.server.tail, self.remote.name, self.query, self.position)
+            self.pending.extend(documents)
+            if not self.pending:
+                await asyncio.sleep(0.05)
+                waited += 0.05
+        return self.pending.pop(0)
+
+
+class RemoteCollection:
+    def __init__(self, server, name):
+        self.server = server
+        self.name = name
+
+    def find(self, query=None, projection=None, cursor_type=None):
+        if cursor_type is not None:
+            return RemoteTailCursor(self, query)
+        return RemoteCursor(self, query, projection)
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(self.server.call, self.name, method, args, kwargs)
+        return call
+
+
+class RemoteMemoryDatabase:
+    """Drop-in for database.db.db in another process, backed by serve_memory_database()"""
+
+    def __init__(self, address, authkey: bytes = b"memory-mongo"):
+        manager = _Manager(address=tuple(address), authkey=authkey)
+        manager.connect()
+        self.server = manager.memory_server()
+
+    @property
+    def ops(self):
+        return Counter(self.server.ops())
+
+    async def list_collection_names(self):
+        return await asyncio.to_thread(self.server.call, None, "list_collection_names", (), {})
+
+    async def create_collection(self, name, **options):
+        await asyncio.to_thread(self.server.call, None, "create_collection", (name,), options)
+        return self[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return RemoteCollection(self.server, name)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
@@ -0,0 +1,91 @@
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+# Defaults for each agent run; 0 disables a limit (pages: 0 means no page limit)
+AGENT_MAX_PAGES = int(os.getenv("AGENT_MAX_PAGES", "20"))
+AGENT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "0"))
+AGENT_MAX_BYTES = int(os.getenv("AGENT_MAX_BYTES", "0"))
+# Stop once the last AGENT_NOVELTY_WINDOW analyzed pages found fewer than AGENT_NOVELTY_MIN_NEW new URLs
+AGENT_NOVELTY_WINDOW = int(os.getenv("AGENT_NOVELTY_WINDOW", "0"))
+AGENT_NOVELTY_MIN_NEW = int(os.getenv("AGENT_NOVELTY_MIN_NEW", "1"))
+
+# Why a run ended, as stored in the agent document's stop_reason
+BUDGET_REASONS = ("max_pages", "max_seconds", "max_bytes", "novelty")
+STOP_REASONS = BUDGET_REASONS + ("frontier_exhausted", "stopped", "error")
+
+
+class Budget:
+    """Limits on one agent run; the first one exhausted ends the exploration loop.
+
+    Pages are reserved by take_step() before a page is analyzed, so tabs
+    sharing the budget never overshoot max_pages; refund_step() hands a step
+    back for pages that turned out not to need analysis.
+    """
+
+    def __init__(self, max_pages: int = AGENT_MAX_PAGES, max_seconds: float = AGENT_MAX_SECONDS,
+                 max_bytes: int = AGENT_MAX_BYTES, novelty_window: int = AGENT_NOVELTY_WINDOW,
+                 novelty_min_new: int = AGENT_NOVELTY_MIN_NEW, bytes_probe: Optional[Callable[[], int]] = None):
+        self.max_pages = max_pages
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.novelty_min_new = novelty_min_new
+        self.bytes_probe = bytes_probe  # Bytes downloaded so far, e.g. the network policy's counter
+        self.steps_taken = 0
+        self.recent_new = deque(maxlen=novelty_window) if novelty_window > 0 else None
+        self.started = time.monotonic()
+        self.stop_reason = None
+
+    def take_step(self):
+        self.steps_taken += 1
+
+    def refund_step(self):
+        self.steps_taken -= 1
+
+    def record_page(self, new_urls: int):
+        """New URLs discovered by an analyzed page, for the novelty window"""
+        if self.recent_new is not None:
+            self.recent_new.append(new_urls)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def bytes_downloaded(self) -> int:
+        return self.bytes_probe() if self.bytes_probe else 0
+
+    def exhausted(self) -> Optional[str]:
+        """Name of the first exhausted limit (see BUDGET_REASONS), None while the run may go on"""
+        reason = None
+        if self.max_pages and self.steps_taken >= self.max_pages:
+            reason = "max_pages"
+        elif self.max_seconds and self.elapsed >= self.max_seconds:
+            reason = "max_seconds"
+        elif self.max_bytes and self.bytes_downloaded >= self.max_bytes:
+            reason = "max_bytes"
+        elif (self.recent_new is not None and len(self.recent_new) == self.recent_new.maxlen
+              and sum(self.recent_new) < self.novelty_min_new):
+            reason = "novelty"
+        if reason:
+            self.stop_reason = reason
+        return reason
+
+    def describe(self) -> str:
+        limits = [f"{self.max_pages} pages" if self.max_pages else "no page limit"]
+        if self.max_seconds:
+            limits.append(f"{self.max_seconds:g}s")
+        if self.max_bytes:
+            limits.append(f"{self.max_bytes} bytes")
+        if self.recent_new is not None:
+            limits.append(f"< {self.novelty_min_new} new URLs in {self.recent_new.maxlen} pages")
+        return ", ".join(limits)
+
+    def stats(self) -> dict:
+        return {
+            "pages": self.steps_taken,
+            "seconds": round(self.elapsed, 1),
+            "bytes": self.bytes_downloaded,
+            "stop_reason": self.stop_reason,
+        }
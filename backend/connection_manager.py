@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from metrics import WS_MESSAGES_DROPPED, WS_MESSAGES_SENT
+
+logger = logging.getLogger("ConnectionManager")
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))  # Pending JSON events per client
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))  # Seconds before a stuck client is evicted
+
+
+WILDCARD = "*"
+VIDEO_EVENT = "VIDEO_FRAME"
+# Shorthands accepted in subscribe messages
+EVENT_ALIASES = {
+    "logs": ["INFO", "NAVIGATE", "ACTION", "ANALYSIS", "OBSERVATION", "ERROR", "SCREENSHOT"],
+    "video": [VIDEO_EVENT],
+}
+
+Topic = Tuple[str, str]  # (agent_id or "*", event type or "*"); "*" events never include video
+
+
+def expand_topics(agent_ids: Optional[Iterable[str]], events: Optional[Iterable[str]]) -> Set[Topic]:
+    agent_ids = list(agent_ids or [WILDCARD])
+    expanded = []
+    for event in events or [WILDCARD]:
+        expanded.extend(EVENT_ALIASES.get(event, [event]))
+    return {(agent_id, event) for agent_id in agent_ids for event in expanded}
+
+
+def encode_frame(agent_id: str, jpeg: bytes) -> bytes:
+    """Binary VIDEO_FRAME message: [1 byte id length][agent_id utf-8][JPEG bytes]"""
+    aid = agent_id.encode("utf-8")
+    return bytes((len(aid),)) + aid + jpeg
+
+
+class ClientConnection:
+    """One dashboard socket with its own bounded queue and writer task.
+
+    Log/status events are queued in order and never dropped; a client that
+    lets WS_QUEUE_SIZE of them pile up is evicted. Video frames keep only
+    the newest frame per agent, so a slow client just sees a lower FPS.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int = WS_QUEUE_SIZE):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.events = deque()
+        self.frames: Dict[str, bytes] = {}  # agent_id -> latest encoded frame
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.writer_task = None
+        self.topics: Set[Topic] = set()
+        self.frame_pressure = 0.0  # EWMA of "previous frame still unsent"
+        self.events_sent = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    @property
+    def pressure(self) -> float:
+        return max(self.frame_pressure, len(self.events) / self.max_queue)
+
+    def enqueue_event(self, message: dict) -> bool:
+        if self.closed or len(self.events) >= self.max_queue:
+            return False
+        self.events.append(message)
+        self.wakeup.set()
+        return True
+
+    def enqueue_frame(self, agent_id: str, payload: bytes):
+        if self.closed:
+            return
+        replaced = agent_id in self.frames
+        if replaced:
+            self.frames_dropped += 1
+            WS_MESSAGES_DROPPED.inc(kind="frame")
+        self.frame_pressure = 0.8 * self.frame_pressure + (0.2 if replaced else 0.0)
+        self.frames[agent_id] = payload
+        self.wakeup.set()
+
+    async def run(self, on_dead):
+        try:
+            while not self.closed:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                # Events first (small, must stay ordered), then one round of
+                # latest frames, so neither channel can starve the other
+                for _ in range(len(self.events)):
+                    await asyncio.wait_for(self.websocket.send_json(self.events.popleft()), WS_SEND_TIMEOUT)
+                    self.events_sent += 1
+                    WS_MESSAGES_SENT.inc(kind="event")
+                for agent_id in list(self.frames):
+                    payload = self.frames.pop(agent_id)
+                    await asyncio.wait_for(self.websocket.send_bytes(payload), WS_SEND_TIMEOUT)
+                    self.frames_sent += 1
+                    WS_MESSAGES_SENT.inc(kind="frame")
+                if self.events or self.frames:
+                    self.wakeup.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Evicting websocket client: {e!r}")
+            on_dead(self)
+
+
+class ConnectionManager:
+    """Fans agent events out to dashboard sockets through a topic index.
+
+    Clients start subscribed to ("*", "*"): every agent's events except
+    video, which must be asked for explicitly. Control messages:
+
+        {"action": "subscribe" | "unsubscribe" | "set",
+         "agent_ids": ["<id>", ...],          # omitted = all agents
+         "events": ["logs", "video", "ERROR"]} # omitted = all non-video events
+    """
+
+    def __init__(self):
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.topics: Dict[Topic, Set[ClientConnection]] = {}
+        self.evicted = 0
+        self._closing = set()  # close() tasks of evicted sockets
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientConnection(websocket)
+        self.clients[websocket] = client
+        self.subscribe(client, {(WILDCARD, WILDCARD)})
+        client.writer_task = asyncio.create_task(client.run(self._evict))
+        return client
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client:
+            self.unsubscribe(client, set(client.topics))
+            client.closed = True
+            client.wakeup.set()
+            if client.writer_task and client.writer_task is not asyncio.current_task():
+                client.writer_task.cancel()
+
+    def _evict(self, client: ClientConnection):
+        if client.websocket not in self.clients:
+            return
+        self.evicted += 1
+        WS_MESSAGES_DROPPED.inc(len(client.events), kind="event")
+        self.disconnect(client.websocket)
+        task = asyncio.create_task(self._close_quietly(client.websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_quietly(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(), 1)
+        except Exception:
+            pass
+
+    def subscribe(self, client: ClientConnection, topics: Set[Topic]):
+        for topic in topics:
+            self.topics.setdefault(topic, set()).add(client)
+        client.topics |= topics
+
+    def unsubscribe(self, client: ClientConnection, topics: Set[Topic]):
+        for topic in topics & client.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.topics[topic]
+        client.topics -= topics
+
+    def handle_control(self, websocket: WebSocket, raw: str):
+        """Apply a subscribe/unsubscribe/set message sent by a client"""
+        client = self.clients.get(websocket)
+        if not client:
+            return
+        try:
+            message = json.loads(raw)
+            action = message.get("action")
+            topics = expand_topics(message.get("agent_ids"), message.get("events"))
+        except (ValueError, AttributeError, TypeError):
+            client.enqueue_event({"type": "SUBSCRIPTION_ERROR", "message": "Expected a JSON object"})
+            return
+
+        if action == "subscribe":
+            self.subscribe(client, topics)
+        elif action == "unsubscribe":
+            self.unsubscribe(client, topics)
+        elif action == "set":
+            self.unsubscribe(client, set(client.topics))
+            self.subscribe(client, topics)
+        else:
+            client.enqueue_event({"type": "SUBSCRIPTION_ERROR", "message": f"Unknown action: {action}"})
+            return
+        client.enqueue_event({"type": "SUBSCRIBED", "topics": sorted(list(t) for t in client.topics)})
+
+    def _subscribers(self, agent_id: Optional[str], event_type: str) -> Set[ClientConnection]:
+        keys = [(agent_id, event_type), (WILDCARD, event_type)]
+        if event_type != VIDEO_EVENT:
+            keys += [(agent_id, WILDCARD), (WILDCARD, WILDCARD)]
+        recipients = set()
+        for key in keys:
+            subscribers = self.topics.get(key)
+            if subscribers:
+                recipients |= subscribers
+        return recipients
+
+    def viewer_stats(self, agent_id: str) -> dict:
+        """Viewers of an agent's video and how backed-up their sockets are (0..1)"""
+        clients = self._subscribers(agent_id, VIDEO_EVENT)
+        if not clients:
+            return {"viewers": 0, "pressure": 0.0}
+        return {
+            "viewers": len(clients),
+            "pressure": sum(c.pressure for c in clients) / len(clients),
+        }
+
+    def queue_stats(self) -> dict:
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "topics": len(self.topics),
+            "queued_events": sum(len(c.events) for c in clients),
+            "pending_frames": sum(len(c.frames) for c in clients),
+            "frames_sent": sum(c.frames_sent for c in clients),
+            "frames_dropped": sum(c.frames_dropped for c in clients),
+            "evicted": self.evicted,
+        }
+
+    async def broadcast(self, message: dict):
+        """Queue a JSON event for subscribed clients; never waits on a socket"""
+        for client in self._subscribers(message.get("agent_id"), message.get("type")):
+            if not client.enqueue_event(message):
+                # Too far behind to ever catch up on logs: drop the client, not the event stream
+                self._evict(client)
+
+    async def broadcast_frame(self, agent_id: str, jpeg: bytes):
+        """Queue a binary video frame, replacing any unsent frame of the same agent"""
+        clients = self._subscribers(agent_id, VIDEO_EVENT)
+        if not clients:
+            return
+        payload = encode_frame(agent_id, jpeg)
+        for client in clients:
+            client.enqueue_frame(agent_id, payload)
+
+
+manager = ConnectionManager()
@@ -0,0 +1,123 @@
+import heapq
+import itertools
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from url_store import UrlSet
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Canonical form used for visited checks: no fragment, sorted query, no trailing slash.
+
+    Returns None for anything that isn't an http(s) URL (mailto:, javascript:, ...).
+    """
+    if not url:
+        return None
+    if base:
+        url = urljoin(base, url.strip())
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def site_key(url: str) -> Optional[str]:
+    """scheme://host[:port] of a URL; crawl state is shared by every agent on the same site"""
+    normalized = normalize_url(url)
+    if not normalized:
+        return None
+    parts = urlsplit(normalized)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def default_score(url: str, depth: int, meta: dict) -> float:
+    """Shallow pages first (breadth-first), shorter paths break ties; meta["penalty"] demotes"""
+    return -depth - 0.01 * url.count("/") - meta.get("penalty", 0.0)
+
+
+class CrawlFrontier:
+    """Priority queue of discovered, not yet visited URLs for one agent.
+
+    URLs are stored normalized. Re-discovering a queued URL only matters if
+    it now scores higher; stale heap entries are skipped lazily on pop.
+    Visited URLs only live on as 64-bit ids in a UrlSet, plus their depth
+    until the next checkpoint has persisted them (clear_dirty).
+    """
+
+    def __init__(self, scorer: Callable[[str, int, dict], float] = default_score):
+        self.scorer = scorer
+        self.visited = UrlSet()
+        self.depth: Dict[str, int] = {}
+        self.best: Dict[str, float] = {}  # queued url -> best score seen
+        self.text: Dict[str, str] = {}  # queued url -> link text, for decision reasons
+        self._heap = []
+        self._seq = itertools.count()
+        self.dirty = set()  # URLs whose state changed since the last persisted checkpoint
+
+    def __len__(self):
+        return len(self.best)
+
+    def __contains__(self, url: str):
+        return url in self.best
+
+    def add(self, url: str, depth: int, text: str = "", meta: Optional[dict] = None) -> bool:
+        if url in self.visited:
+            return False
+        score = self.scorer(url, depth, meta or {})
+        if url in self.best and score <= self.best[url]:
+            return False
+        self.best[url] = score
+        self.depth[url] = min(depth, self.depth.get(url, depth))
+        if text:
+            self.text[url] = text
+        self.dirty.add(url)
+        heapq.heappush(self._heap, (-score, next(self._seq), url))
+        return True
+
+    def mark_visited(self, url: str, depth: Optional[int] = None):
+        self.visited.add(url)
+        self.dirty.add(url)
+        self.best.pop(url, None)
+        self.text.pop(url, None)
+        if depth is not None:
+            self.depth[url] = min(depth, self.depth.get(url, depth))
+
+    def clear_dirty(self):
+        """After a checkpoint: forget the depth of visited URLs, only their ids are needed from now on"""
+        for url in self.dirty:
+            if url not in self.best and url in self.visited:
+                self.depth.pop(url, None)
+        self.dirty.clear()
+
+    def mark_dirty(self, entries):
+        """Entries from a checkpoint that could not be written, to be exported again"""
+        for entry in entries:
+            self.dirty.add(entry["url"])
+            self.depth.setdefault(entry["url"], entry["depth"])
+
+    def pop(self) -> Optional[Tuple[str, int, str]]:
+        """Best unvisited URL as (url, depth, link text), or None when exhausted"""
+        while self._heap:
+            neg_score, _, url = heapq.heappop(self._heap)
+            if url in self.visited or self.best.get(url) != -neg_score:
+                continue  # Visited since, or superseded by a better-scored entry
+            depth = self.depth.get(url, 0)
+            text = self.text.get(url, "")
+            self.mark_visited(url)
+            return url, depth, text
+        return None
@@ -1,18 +1,108 @@
-import motor.motor_asyncio
 import os
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = "agent_os"
 
+# standard: plain collection (with a TTL index if LOG_TTL_DAYS is set); timeseries: MongoDB 5.0+
+# time-series collection bucketed by agent; capped: fixed-size ring buffer of LOG_CAPPED_MB
+LOG_STORAGE_MODES = ("standard", "timeseries", "capped")
+LOG_STORAGE_MODE = os.getenv("LOG_STORAGE_MODE", "standard")
+LOG_TTL_DAYS = float(os.getenv("LOG_TTL_DAYS", "0"))  # 0 keeps logs forever; ignored for capped
+LOG_CAPPED_MB = int(os.getenv("LOG_CAPPED_MB", "512"))
+
 class Database:
-    client: motor.motor_asyncio.AsyncIOMotorClient = None
+    client = None  # motor AsyncIOMotorClient; motor/pymongo are imported on connect, not with the app
     db = None
 
     def connect(self):
+        import motor.motor_asyncio
         self.client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
         self.db = self.client[DB_NAME]
         print(f"Connected to MongoDB at {MONGO_URL}")
 
+    async def ensure_log_collection(self):
+        """Create `logs` in LOG_STORAGE_MODE; an existing collection is kept (and its TTL synced)"""
+        if LOG_STORAGE_MODE not in LOG_STORAGE_MODES:
+            raise ValueError(f"LOG_STORAGE_MODE must be one of {LOG_STORAGE_MODES}")
+        ttl = int(LOG_TTL_DAYS * 86400)
+        options = await self.db.logs.options() if "logs" in await self.db.list_collection_names() else None
+
+        if options is None:
+            if LOG_STORAGE_MODE == "timeseries":
+                extra = {"expireAfterSeconds": ttl} if ttl else {}
+                await self.db.create_collection("logs", timeseries={
+                    "timeField": "timestamp", "metaField": "agent_id", "granularity": "seconds"}, **extra)
+            elif LOG_STORAGE_MODE == "capped":
+                await self.db.create_collection("logs", capped=True, size=LOG_CAPPED_MB * 2**20)
+            else:
+                await self.sync_log_ttl_index(ttl)
+            return
+
+        current = "timeseries" if "timeseries" in options else "capped" if options.get("capped") else "standard"
+        if current != LOG_STORAGE_MODE:
+            # Converting would mean copying every log; leave that to an explicit migration
+            print(f"logs is a {current} collection, LOG_STORAGE_MODE={LOG_STORAGE_MODE} ignored "
+                  f"(drop or rename it to switch)")
+        elif current == "timeseries" and ttl and options.get("expireAfterSeconds") != ttl:
+            await self.db.command({"collMod": "logs", "expireAfterSeconds": ttl})
+        elif current == "standard":
+            # Time-series collections expire by themselves, capped ones overwrite the oldest entries
+            await self.sync_log_ttl_index(ttl)
+
+    async def sync_log_ttl_index(self, ttl: int):
+        """TTL index of a standard `logs` collection, changed in place when LOG_TTL_DAYS changes.
+
+        create_index with another expireAfterSeconds fails (IndexOptionsConflict)
+        and leaves the old expiry in place, so an existing index is updated with
+        collMod instead, and dropped when the TTL is turned off.
+        """
+        existing = (await self.db.logs.index_information()).get("logs_ttl")
+        if not ttl:
+            if existing:
+                await self.db.logs.drop_index("logs_ttl")
+                print("Dropped the logs TTL index (LOG_TTL_DAYS=0)")
+        elif existing is None:
+            await self.db.logs.create_index([("timestamp", 1)], name="logs_ttl", expireAfterSeconds=ttl)
+        elif existing.get("expireAfterSeconds") != ttl:
+            await self.db.command({"collMod": "logs", "index": {"name": "logs_ttl", "expireAfterSeconds": ttl}})
+            print(f"Logs TTL changed from {existing.get('expireAfterSeconds')}s to {ttl}s")
+
+    async def ensure_indexes(self):
+        """Create the indexes the API queries rely on (no-op when they exist)"""
+        from pymongo.errors import ServerSelectionTimeoutError
+        try:
+            await self.ensure_log_collection()
+        except ServerSelectionTimeoutError as e:
+            print(f"MongoDB unreachable, skipping index creation: {e}")
+            return
+        except Exception as e:
+            print(f"Could not set up the logs collection ({LOG_STORAGE_MODE}): {e}")
+
+        indexes = [
+            # Dashboard stats: per-status counts and page sums are answered from this index alone
+            (self.db.agents, [("status", 1), ("stats.pages_explored", 1)], {"name": "status_pages"}),
+            (self.db.agents, [("id", 1)], {"unique": True}),
+            # Keyset pagination on (created_at, id) / (timestamp, id), newest first
+            (self.db.agents, [("created_at", -1), ("id", -1)], {}),
+            (self.db.logs, [("agent_id", 1), ("timestamp", -1), ("id", -1)], {}),
+            (self.db.logs, [("timestamp", -1), ("id", -1)], {}),
+            # Crawl state: loaded per site, upserted per URL
+            (self.db.crawl_urls, [("site", 1), ("url", 1)], {"unique": True}),
+            # Worker mode: claim order, and lookups by agent id
+            (self.db.jobs, [("status", 1), ("priority", 1), ("seq", 1)], {}),
+            (self.db.jobs, [("id", 1)], {"unique": True}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                await collection.create_index(keys, **options)
+            except ServerSelectionTimeoutError as e:
+                print(f"MongoDB unreachable, skipping index creation: {e}")
+                return
+            except Exception as e:
+                # Don't block startup; queries still work, just without index support
+                print(f"Could not create index {keys} on {collection.name}: {e}")
+        print("MongoDB indexes ensured")
+
     def close(self):
         if self.client:
             self.client.close()
@@ -1,12 +1,38 @@
-from bs4 import BeautifulSoup
+import os
 import random
-from urllib.parse import urlparse, urljoin
+from typing import Optional
+from urllib.parse import urlparse
+
+from crawl_frontier import CrawlFrontier, default_score, normalize_url
+from dom_extractor import ANALYSIS_BACKEND, ANALYSIS_BACKENDS, extract_elements
+from page_cache import page_cache
+from url_store import UrlSet
+
+# frontier: best unvisited URL anywhere on the site; random: random unvisited link on the current page
+PLANNER_STRATEGIES = ("frontier", "random")
+PLANNER_STRATEGY = os.getenv("PLANNER_STRATEGY", "frontier")
+# Frontier score penalty (in depth levels) for links found on a near-duplicate page
+NEAR_DUPLICATE_PENALTY = float(os.getenv("NEAR_DUPLICATE_PENALTY", "2"))
 
 class DecisionEngine:
-    def __init__(self):
-        self.visited_urls = set()
+    def __init__(self, analysis_backend: str = ANALYSIS_BACKEND, strategy: str = PLANNER_STRATEGY,
+                 scorer=default_score, cache=page_cache):
+        if analysis_backend not in ANALYSIS_BACKENDS:
+            raise ValueError(f"Unknown analysis backend: {analysis_backend}")
+        if strategy not in PLANNER_STRATEGIES:
+            raise ValueError(f"Unknown planner strategy: {strategy}")
+        self.analysis_backend = analysis_backend
+        self.strategy = strategy
+        self.cache = cache  # Parsed pages by URL + DOM fingerprint, shared across agents
+        self.frontier = CrawlFrontier(scorer)
+        self.visited_urls = self.frontier.visited  # Normalized URLs
+        self.fingerprints = {}  # Normalized URL -> last seen {"hash", "simhash"}
+        self.previous_fingerprints = {}  # Same, as persisted by an earlier crawl (resume / incremental)
+        self.pending_urls = {}  # URL -> depth, handed out by the frontier but not reached yet (still queued when saved)
+        self.seen_urls = UrlSet()  # Every URL visited or linked so far, to count new ones per page
         self.clicked_elements = set()
         self.current_url = None
+        self.current_depth = 0
         self.base_domain = None
     
     def set_current_url(self, url: str):
@@ -14,6 +40,14 @@ class DecisionEngine:
         self.current_url = url
         parsed = urlparse(url)
         self.base_domain = f"{parsed.scheme}://{parsed.netloc}"
+
+        normalized = normalize_url(url)
+        if normalized:
+            # Redirects and the start page count as visited too
+            depth = self.pending_urls.pop(normalized, None)
+            self.current_depth = depth if depth is not None else self.frontier.depth.get(normalized, 0)
+            self.frontier.mark_visited(normalized, self.current_depth)
+            self.seen_urls.add(normalized)
     
     def is_internal_link(self, url: str) -> bool:
         """Check if URL is internal to the current domain"""
@@ -28,52 +62,154 @@ class DecisionEngine:
         current_parsed = urlparse(self.base_domain)
         return parsed.netloc == current_parsed.netloc or parsed.netloc == ''
     
-    def analyze(self, html_content: str):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Extract meaningful elements
-        all_links = []
-        for a in soup.find_all('a', href=True):
-            href = a.get('href')
-            text = a.get_text(strip=True)
-            
+    @property
+    def uses_browser_extraction(self) -> bool:
+        """When True, feed analyze_elements() with AgentService.extract_elements()"""
+        return self.analysis_backend == "browser"
+
+    @property
+    def html_backend(self) -> str:
+        """Parser for serialized HTML; the browser backend has none of its own, so it falls back to bs4"""
+        return "bs4" if self.uses_browser_extraction else self.analysis_backend
+
+    def analyze(self, html_content: str, fingerprint: dict = None):
+        return self.analyze_elements(extract_elements(html_content, self.html_backend), fingerprint)
+
+    def analyze_elements(self, elements: dict, fingerprint: dict = None):
+        """Build the analysis dict from extracted title/links/buttons/inputs"""
+        self._record_fingerprint(fingerprint)
+        page = self._parse_elements(elements)
+        analysis = self._build_analysis(page, fingerprint)
+        self.cache.put(self.current_url, fingerprint, page)
+        return analysis
+
+    def cached_page(self, url: str, fingerprint: dict):
+        """Parsed page from the cache if `url` still has this fingerprint; skip fetching it if so"""
+        return self.cache.get(url, fingerprint)
+
+    def analyze_cached(self, page: dict, fingerprint: dict = None):
+        """Analysis for a page returned by cached_page(), against the current visited set"""
+        self._record_fingerprint(fingerprint)
+        return self._build_analysis(page, fingerprint)
+
+    def _record_fingerprint(self, fingerprint: dict = None):
+        normalized = normalize_url(self.current_url) if self.current_url else None
+        if fingerprint and normalized:
+            self.fingerprints[normalized] = {"hash": fingerprint["hash"], "simhash": fingerprint["simhash"]}
+            self.frontier.dirty.add(normalized)
+
+    def unchanged_since_last_crawl(self, url: str, fingerprint: dict = None) -> bool:
+        """True if a restored crawl saw exactly this DOM at this URL; its links are already known"""
+        if self.strategy != "frontier":
+            return False  # The random planner needs an analysis of the current page to move on
+        previous = self.previous_fingerprints.get(normalize_url(url))
+        return bool(fingerprint and previous and previous["hash"] == fingerprint["hash"])
+
+    def restore_state(self, entries, mode: str = "resume"):
+        """Load persisted URL entries (see export_state).
+
+        resume: visited pages stay visited and the saved frontier is queued again.
+        incremental: visited pages are queued for a revisit too; unchanged ones are
+        recognised by their fingerprint and skipped without analysis.
+        """
+        restored = 0
+        for entry in entries:
+            url, depth = entry["url"], entry.get("depth", 0)
+            self.seen_urls.add(url)
+            if entry.get("hash"):
+                self.previous_fingerprints[url] = {"hash": entry["hash"], "simhash": entry.get("simhash")}
+            if entry.get("visited") and mode == "resume":
+                self.frontier.mark_visited(url, depth)
+            else:
+                self.frontier.add(url, depth, entry.get("text", ""))
+            restored += 1
+        self.fingerprints.update(self.previous_fingerprints)
+        self.frontier.clear_dirty()  # Already persisted
+        return restored
+
+    def url_store_usage(self) -> dict:
+        """Memory held for visited and seen URLs (see UrlSet.memory_usage), and the queued URL count"""
+        return {
+            "visited": self.frontier.visited.memory_usage(),
+            "seen": self.seen_urls.memory_usage(),
+            "queued": len(self.frontier),
+        }
+
+    def export_state(self) -> list:
+        """URL entries changed since the last call: {url, visited, depth, text, hash, simhash}"""
+        frontier = self.frontier
+        entries = []
+        for url in frontier.dirty:
+            visited = url in frontier.visited and url not in self.pending_urls
+            entry = {"url": url, "visited": visited, "depth": frontier.depth.get(url, 0)}
+            if url in frontier.text:
+                entry["text"] = frontier.text[url]
+            entry.update(self.fingerprints.get(url, {}))
+            entries.append(entry)
+        frontier.clear_dirty()
+        return entries
+
+    def _parse_elements(self, elements: dict) -> dict:
+        """Absolute internal links plus title/buttons/inputs; independent of crawl state, so cacheable"""
+        links = []
+        for href, text in elements['links']:
             # Filter out navigation/footer links
             if text and len(text) > 2 and len(text) < 100:
-                # Convert relative to absolute
-                if href.startswith('/') and self.current_url:
-                    href = urljoin(self.current_url, href)
+                # Absolute, canonical form; drops mailto:, javascript: and the like
+                href = normalize_url(href, self.current_url)
                 
                 # Only include internal links
-                if self.is_internal_link(href):
-                    all_links.append({
-                        'url': href,
-                        'text': text,
-                        'visited': href in self.visited_urls
-                    })
-        
-        buttons = [b.get_text(strip=True) for b in soup.find_all('button')]
-        inputs = [i.get('name') or i.get('id') for i in soup.find_all('input')]
+                if href and self.is_internal_link(href):
+                    links.append((href, text))
         
         # Basic Heuristics
-        title = soup.title.string if soup.title else "No Title"
+        title = elements['title'] if elements['title'] is not None else "No Title"
+        return {"title": title, "links": links, "buttons": elements['buttons'], "inputs": elements['inputs']}
+
+    def _build_analysis(self, page: dict, fingerprint: dict = None):
+        # Same template under another URL: its links are most likely queued already, so demote them
+        near_duplicate_of = self.cache.similar(self.current_url, fingerprint)
+        meta = {"penalty": NEAR_DUPLICATE_PENALTY} if near_duplicate_of else None
+
+        # Only the links that make it into the analysis become dicts; the rest are just counted
+        links, unvisited_links = [], []
+        unvisited_count = new_links = 0
+        for href, text in page['links']:
+            visited = href in self.visited_urls
+            if self.seen_urls.add(href):
+                new_links += 1
+            if len(links) < 20:
+                links.append({'url': href, 'text': text, 'visited': visited})
+            if not visited:
+                unvisited_count += 1
+                if len(unvisited_links) < 10:
+                    unvisited_links.append({'url': href, 'text': text, 'visited': False})
+            if self.strategy == "frontier":
+                self.frontier.add(href, self.current_depth + 1, text, meta)
         
-        # Filter unvisited links
-        unvisited_links = [l for l in all_links if not l['visited']]
+        buttons = page['buttons']
+        inputs = page['inputs']
         
         analysis = {
-            "title": title,
-            "link_count": len(all_links),
-            "unvisited_link_count": len(unvisited_links),
+            "title": page['title'],
+            "link_count": len(page['links']),
+            "unvisited_link_count": unvisited_count,
+            "new_link_count": new_links,  # Not linked from any page analyzed before
             "button_count": len(buttons),
             "input_count": len(inputs),
-            "links": all_links[:20],  # Top 20
-            "unvisited_links": unvisited_links[:10],  # Top 10 unvisited
-            "buttons": buttons[:5]
+            "links": links,  # Top 20
+            "unvisited_links": unvisited_links,  # Top 10 unvisited
+            "buttons": buttons[:5],
+            "near_duplicate_of": near_duplicate_of
         }
         return analysis
 
-    def decide_next_action(self, analysis: dict):
+    def decide_next_action(self, analysis: Optional[dict]):
         """Intelligent decision making with state tracking"""
+        if self.strategy == "frontier" or analysis is None:
+            # Nothing analyzed this step (blank tab, failed navigation, page unchanged since the last crawl):
+            # for the random planner only the frontier, filled by a restored crawl state, has somewhere to go
+            return self._next_from_frontier()
         
         # Priority 1: Explore unvisited internal links
         if analysis['unvisited_link_count'] > 0:
@@ -104,3 +240,19 @@ class DecisionEngine:
             "type": "WAIT",
             "reason": "No more links to explore on this page"
         }
+
+    def _next_from_frontier(self):
+        """Jump to the best-scored unvisited URL discovered anywhere so far"""
+        best = self.frontier.pop()
+        if best is None:
+            return {
+                "type": "WAIT",
+                "reason": "Crawl frontier exhausted: every discovered page has been visited"
+            }
+        url, depth, text = best
+        self.pending_urls[url] = depth
+        return {
+            "type": "NAVIGATE",
+            "target": url,
+            "reason": f"Best unvisited page (depth {depth}, {len(self.frontier)} queued): {(text or url)[:50]}"
+        }
@@ -0,0 +1,90 @@
+import logging
+import os
+
+logger = logging.getLogger("DomExtractor")
+
+# bs4: BeautifulSoup over page.content() (original behaviour)
+# lxml: lxml.html over page.content(), much faster C parser
+# browser: single page.evaluate() call, no HTML serialization at all
+ANALYSIS_BACKENDS = ("bs4", "lxml", "browser")
+ANALYSIS_BACKEND = os.getenv("ANALYSIS_BACKEND", "bs4")
+
+# Mirrors extract_with_bs4: raw href attributes, text joined from stripped text nodes
+EXTRACT_ELEMENTS_JS = """
+() => {
+    const skip = new Set(["SCRIPT", "STYLE", "TEMPLATE"]);
+    const text = (el) => {
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        let out = "";
+        let node;
+        while ((node = walker.nextNode())) {
+            if (node.parentElement && skip.has(node.parentElement.tagName)) continue;
+            const t = node.nodeValue.trim();
+            if (t) out += t;
+        }
+        return out;
+    };
+    const title = document.querySelector("title");
+    return {
+        title: title ? title.textContent : null,
+        links: Array.from(document.querySelectorAll("a[href]"), (a) => [a.getAttribute("href"), text(a)]),
+        buttons: Array.from(document.querySelectorAll("button"), text),
+        inputs: Array.from(document.querySelectorAll("input"),
+            (i) => i.getAttribute("name") || i.getAttribute("id") || null),
+    };
+}
+"""
+
+
+def extract_with_bs4(html_content: str) -> dict:
+    from bs4 import BeautifulSoup  # Imported on first use (in the analysis workers by default)
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return {
+        # str(): a NavigableString keeps a reference to the whole tree (and pickles it)
+        "title": str(soup.title.string) if soup.title and soup.title.string is not None else None,
+        "links": [(a.get('href'), a.get_text(strip=True)) for a in soup.find_all('a', href=True)],
+        "buttons": [b.get_text(strip=True) for b in soup.find_all('button')],
+        "inputs": [i.get('name') or i.get('id') for i in soup.find_all('input')],
+    }
+
+
+def _lxml_text(el) -> str:
+    """Equivalent of BeautifulSoup's get_text(strip=True)"""
+    parts = []
+    for node in el.iter():
+        # Comments have a non-string tag; script/style bodies are not visible text
+        if isinstance(node.tag, str) and node.tag not in ("script", "style", "template") and node.text:
+            stripped = node.text.strip()
+            if stripped:
+                parts.append(stripped)
+        if node is not el and node.tail:
+            stripped = node.tail.strip()
+            if stripped:
+                parts.append(stripped)
+    return "".join(parts)
+
+
+def extract_with_lxml(html_content: str) -> dict:
+    try:
+        import lxml.html
+    except ImportError:  # lxml is optional; the "lxml" backend falls back to BeautifulSoup
+        logger.warning("lxml is not installed, falling back to BeautifulSoup")
+        return extract_with_bs4(html_content)
+    if not html_content or not html_content.strip():
+        return {"title": None, "links": [], "buttons": [], "inputs": []}
+
+    root = lxml.html.document_fromstring(html_content)
+    title = next(root.iter('title'), None)
+    return {
+        "title": title.text if title is not None and len(title) == 0 else None,
+        "links": [(a.get('href'), _lxml_text(a)) for a in root.iter('a') if a.get('href') is not None],
+        "buttons": [_lxml_text(b) for b in root.iter('button')],
+        "inputs": [i.get('name') or i.get('id') for i in root.iter('input')],
+    }
+
+
+def extract_elements(html_content: str, backend: str = "bs4") -> dict:
+    """Pull title, anchors, buttons and inputs out of serialized HTML"""
+    if backend == "lxml":
+        return extract_with_lxml(html_content)
+    return extract_with_bs4(html_content)
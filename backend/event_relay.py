@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Dict
+
+from database import db
+from job_queue import VIEWER_REPORT_TTL
+
+logger = logging.getLogger("EventRelay")
+
+EVENT_RELAY_MB = int(os.getenv("EVENT_RELAY_MB", "256"))  # Capped collection size; oldest events are overwritten
+EVENT_COLLECTION = "agent_events"
+# Events and frames a worker holds while MongoDB is slow; frames are dropped first when it is full
+EVENT_PUBLISH_BUFFER = int(os.getenv("EVENT_PUBLISH_BUFFER", "500"))
+EVENT_PUBLISH_BATCH = int(os.getenv("EVENT_PUBLISH_BATCH", "100"))
+
+
+async def ensure_event_collection():
+    """Tailable cursors need a capped collection; create it once, shared by the API and every worker"""
+    if EVENT_COLLECTION not in await db.db.list_collection_names():
+        try:
+            await db.db.create_collection(EVENT_COLLECTION, capped=True, size=EVENT_RELAY_MB * 2**20)
+        except Exception as e:
+            # Another process created it first
+            logger.debug(f"Could not create {EVENT_COLLECTION}: {e}")
+
+
+class EventPublisher:
+    """Worker side: the ConnectionManager interface run_agent_loop needs, backed by MongoDB.
+
+    broadcast()/broadcast_frame() only queue; a background task appends the
+    queue to the capped event collection the API tails, with insert_many,
+    so the agent loop and the screencast never wait on MongoDB. Each event
+    carries this publisher's id and a sequence number, which is what the
+    API resumes from. viewer_stats() answers from what the API instances
+    last reported in the job document (refreshed by the worker's heartbeat).
+    """
+
+    def __init__(self, max_size: int = EVENT_PUBLISH_BUFFER, batch_size: int = EVENT_PUBLISH_BATCH):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.publisher_id = uuid.uuid4().hex
+        self.seq = 0
+        self.buffer = deque()
+        self.viewers: Dict[str, dict] = {}
+        self.published = 0
+        self.failed = 0
+        self.dropped_events = 0
+        self.dropped_frames = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _enqueue(self, document: dict) -> bool:
+        if len(self.buffer) >= self.max_size:
+            if document["kind"] == "frame":
+                self.dropped_frames += 1
+                return False
+            # Make room for the event by dropping the oldest queued frame, a newer one follows anyway
+            frame = next((queued for queued in self.buffer if queued["kind"] == "frame"), None)
+            if frame is None:
+                self.dropped_events += 1
+                return False
+            self.buffer.remove(frame)
+            self.dropped_frames += 1
+        self.buffer.append(document)
+        self.start()
+        self._wakeup.set()
+        return True
+
+    async def broadcast(self, message: dict):
+        self._enqueue({"agent_id": message.get("agent_id"), "kind": "event", "message": message})
+
+    async def broadcast_frame(self, agent_id: str, jpeg: bytes):
+        self._enqueue({"agent_id": agent_id, "kind": "frame", "jpeg": jpeg})
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self.buffer:
+                batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                for document in batch:
+                    self.seq += 1
+                    document["publisher"], document["seq"] = self.publisher_id, self.seq
+                try:
+                    # Ordered, so this publisher's events land in sequence order
+                    await db.db[EVENT_COLLECTION].insert_many(batch, ordered=True)
+                    self.published += len(batch)
+                except Exception as e:
+                    # Live view only: the logs themselves are persisted separately
+                    self.failed += len(batch)
+                    logger.debug(f"Could not publish {len(batch)} events: {e}")
+                    break
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def viewer_stats(self, agent_id: str) -> dict:
+        return self.viewers.get(agent_id) or {"viewers": 0, "pressure": 0.0}
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "published": self.published,
+            "failed": self.failed,
+            "dropped_events": self.dropped_events,
+            "dropped_frames": self.dropped_frames,
+        }
+
+
+class EventRelay:
+    """API side: tails the event collection and fans events out to local WebSocket clients.
+
+    After a reconnect the cursor resumes, per publisher, after the last
+    sequence number relayed. A publisher inserts in sequence order, so
+    nothing depends on the workers' clocks or on ObjectId order across
+    machines. A publisher is forgotten once it has been quiet for
+    prune_interval and the capped collection no longer holds any of its
+    events (a restarted worker publishes under a new id), so the query
+    doesn't grow with every worker restart. Also reports, once a second,
+    how many local clients watch each running agent, so workers can stop
+    encoding video nobody sees.
+    """
+
+    def __init__(self, manager, queue, poll_interval: float = 0.1, viewer_interval: float = 1.0,
+                 viewer_refresh: float = VIEWER_REPORT_TTL / 3, prune_interval: float = 60.0):
+        self.manager = manager
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.viewer_interval = viewer_interval
+        self.viewer_refresh = viewer_refresh
+        self.prune_interval = prune_interval
+        self.instance_id = uuid.uuid4().hex[:12]  # Key of this API instance's viewer reports
+        self.relayed = 0
+        self._relayed_seq: Dict[str, int] = {}  # Publisher -> last sequence number relayed
+        self._last_seen: Dict[str, float] = {}  # Publisher -> monotonic time of its last event
+        self._pruned_at = time.monotonic()
+        self._started_id = None
+        self._reported: Dict[str, dict] = {}
+        self._refreshed = 0.0
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._report_viewers())]
+
+    def _resume_query(self) -> dict:
+        # Publishers not seen yet: only what they published since this relay started (the only clock involved)
+        query = {"publisher": {"$nin": list(self._relayed_seq)}, "_id": {"$gt": self._started_id}}
+        if not self._relayed_seq:
+            return query
+        return {"$or": [query] + [{"publisher": publisher, "seq": {"$gt": seq}}
+                                  for publisher, seq in self._relayed_seq.items()]}
+
+    async def _run(self):
+        from bson import ObjectId
+        from pymongo import CursorType
+        # Only what is published from now on; older events are already in the logs
+        self._started_id = ObjectId()
+        collection = db.db[EVENT_COLLECTION]
+        while True:
+            try:
+                cursor = collection.find(self._resume_query(), cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for document in cursor:
+                        await self._deliver(document)
+                        if self._prune_due():
+                            break
+                    if self._prune_due() and await self._prune_publishers():
+                        await cursor.close()  # Reopen with the shorter query; it resumes where this one stopped
+                        break
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event relay cursor failed, reopening: {e}")
+            # A tailable cursor dies on an empty collection; retry shortly
+            await asyncio.sleep(1)
+
+    def _prune_due(self) -> bool:
+        return time.monotonic() - self._pruned_at >= self.prune_interval
+
+    async def _prune_publishers(self) -> bool:
+        """Forget quiet publishers with no events left in the collection; True if any were dropped"""
+        self._pruned_at = time.monotonic()
+        collection = db.db[EVENT_COLLECTION]
+        dropped = False
+        for publisher, seen in list(self._last_seen.items()):
+            if self._pruned_at - seen < self.prune_interval:
+                continue
+            # While any of its events remain, the unseen-publisher clause would relay them again
+            if await collection.find_one({"publisher": publisher}, projection={"_id": 1}) is None:
+                del self._last_seen[publisher]
+                del self._relayed_seq[publisher]
+                dropped = True
+        return dropped
+
+    async def _report_viewers(self):
+        while True:
+            try:
+                current = {}
+                for agent_id in await self.queue.running_ids():
+                    stats = self.manager.viewer_stats(agent_id)
+                    # Coarse pressure so a steady audience doesn't mean a write every second
+                    current[agent_id] = {"viewers": stats["viewers"], "pressure": round(stats["pressure"], 1)}
+                # Changes right away, and everything now and then so workers know this instance is still up
+                now = time.monotonic()
+                if now - self._refreshed >= self.viewer_refresh:
+                    changed, self._refreshed = current, now
+                else:
+                    changed = {agent_id: stats for agent_id, stats in current.items()
+                               if self._reported.get(agent_id) != stats}
+                await self.queue.publish_viewers(changed, self.instance_id)
+                self._reported = current
+            except Exception as e:
+                logger.warning(f"Could not report viewers: {e}")
+            await asyncio.sleep(self.viewer_interval)
+
+    async def _deliver(self, document: dict):
+        self.relayed += 1
+        if document.get("publisher"):
+            self._relayed_seq[document["publisher"]] = document["seq"]
+            self._last_seen[document["publisher"]] = time.monotonic()
+        if document.get("kind") == "frame":
+            await self.manager.broadcast_frame(document["agent_id"], bytes(document["jpeg"]))
+        else:
+            await self.manager.broadcast(document["message"])
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
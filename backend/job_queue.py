@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import db
+from scheduler import AgentJob
+
+logger = logging.getLogger("JobQueue")
+
+# inline: the API process runs agents itself (scheduler.py); worker: /agent/start only enqueues
+# and separate `python worker.py` processes claim jobs from MongoDB
+EXECUTION_MODES = ("inline", "worker")
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "inline")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))  # A job whose worker misses this many seconds of heartbeats is reclaimed
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "5"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))  # Claims before a job that keeps losing its worker fails
+# Viewer counts an API instance reported more than this many seconds before a heartbeat are ignored (instance gone)
+VIEWER_REPORT_TTL = float(os.getenv("VIEWER_REPORT_TTL", "10"))
+
+
+def merge_viewers(state: dict) -> dict:
+    """Viewers of an agent across API instances, from the job document a heartbeat returns.
+
+    Reports are stamped with MongoDB's clock, as is the heartbeat, so stale
+    ones are recognised without comparing machine clocks.
+    """
+    now = state.get("heartbeat_at")
+    viewers, pressure = 0, 0.0
+    for report in (state.get("viewers") or {}).values():
+        if now and report.get("at") and (now - report["at"]).total_seconds() > VIEWER_REPORT_TTL:
+            continue
+        viewers += report.get("viewers", 0)
+        pressure = max(pressure, report.get("pressure", 0.0))
+    return {"viewers": viewers, "pressure": pressure}
+
+
+class JobQueue:
+    """Agent jobs in the `jobs` collection, claimed by workers under a renewable lease.
+
+    One document per agent: {id, url, autonomy_level, priority, seq, options,
+    status: queued | running | done | cancelled | failed, worker, lease_until,
+    attempts, stop_requested, viewers: {api instance: {viewers, pressure, at}}}. claim() is a single
+    find_one_and_update, so two workers never get the same job; a job whose
+    lease runs out (the worker died) is claimed again by someone else.
+    """
+
+    def __init__(self, lease_seconds: float = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _lease(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    async def enqueue(self, job: AgentJob) -> int:
+        """Store the job and return its position among queued jobs"""
+        seq = time.time_ns()  # FIFO within a priority, across API instances
+        await db.db.jobs.insert_one({
+            "id": job.agent_id,
+            "url": job.url,
+            "autonomy_level": job.autonomy_level,
+            "priority": job.priority,
+            "seq": seq,
+            "options": job.options,
+            "status": "queued",
+            "attempts": 0,
+            "stop_requested": False,
+            "created_at": datetime.utcnow(),
+        })
+        # Jobs claimed before this one: higher priority, or equal priority and queued earlier
+        return await db.db.jobs.count_documents({"status": "queued", "$or": [
+            {"priority": {"$lt": job.priority}},
+            {"priority": job.priority, "seq": {"$lte": seq}},
+        ]})
+
+    async def claim(self, worker_id: str) -> Optional[AgentJob]:
+        """Next queued job (or one whose worker stopped heartbeating), leased to this worker"""
+        from pymongo import ReturnDocument
+        now = datetime.utcnow()
+        document = await db.db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": self.max_attempts}},
+            ]},
+            {"$set": {"status": "running", "worker": worker_id, "lease_until": self._lease(), "claimed_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("priority", 1), ("seq", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            return None
+        if document["attempts"] > 1:
+            logger.warning(f"Reclaimed agent {document['id']} from a lost worker (attempt {document['attempts']})")
+        return AgentJob(agent_id=document["id"], url=document["url"], autonomy_level=document["autonomy_level"],
+                        priority=document["priority"], options=document.get("options") or {})
+
+    async def heartbeat(self, agent_id: str, worker_id: str) -> Optional[dict]:
+        """Extend the lease; returns {"stop_requested", "viewers", "heartbeat_at"}, or None if the job is no longer ours"""
+        from pymongo import ReturnDocument
+        return await db.db.jobs.find_one_and_update(
+            {"id": agent_id, "worker": worker_id, "status": "running"},
+            {"$set": {"lease_until": self._lease()}, "$currentDate": {"heartbeat_at": True}},
+            projection={"_id": 0, "stop_requested": 1, "viewers": 1, "heartbeat_at": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def finish(self, agent_id: str, worker_id: str, status: str = "done"):
+        await db.db.jobs.update_one({"id": agent_id, "worker": worker_id},
+                                    {"$set": {"status": status, "finished_at": datetime.utcnow()}})
+
+    async def fail_abandoned(self) -> list:
+        """Jobs that lost their worker max_attempts times; returns their ids so the agents can be marked FAILED"""
+        query = {"status": "running", "lease_until": {"$lt": datetime.utcnow()},
+                 "attempts": {"$gte": self.max_attempts}}
+        ids = [document["id"] async for document in db.db.jobs.find(query, {"_id": 0, "id": 1})]
+        if ids:
+            await db.db.jobs.update_many({"id": {"$in": ids}, "status": "running"},
+                                         {"$set": {"status": "failed", "finished_at": datetime.utcnow()}})
+        return ids
+
+    async def stop(self, agent_id: str) -> Optional[str]:
+        """Cancel a queued job or ask the running one to stop; returns the status it had, None if not found"""
+        result = await db.db.jobs.find_one_and_update(
+            {"id": agent_id, "status": "queued"}, {"$set": {"status": "cancelled"}})
+        if result is not None:
+            return "queued"
+        result = await db.db.jobs.find_one_and_update(
+            {"id": agent_id, "status": "running"}, {"$set": {"stop_requested": True}})
+        return "running" if result is not None else None
+
+    async def stop_all(self) -> list:
+        """Stop everything; returns the ids of jobs cancelled before they ran"""
+        cancelled = [d["id"] async for d in db.db.jobs.find({"status": "queued"}, {"_id": 0, "id": 1})]
+        if cancelled:
+            await db.db.jobs.update_many({"id": {"$in": cancelled}, "status": "queued"},
+                                         {"$set": {"status": "cancelled"}})
+        await db.db.jobs.update_many({"status": "running"}, {"$set": {"stop_requested": True}})
+        return cancelled
+
+    async def running_ids(self) -> list:
+        return [d["id"] async for d in db.db.jobs.find({"status": "running"}, {"_id": 0, "id": 1})]
+
+    async def publish_viewers(self, viewers: Dict[str, dict], instance_id: str):
+        """Tell workers who is watching their agents through this API instance (read back through heartbeat)"""
+        from pymongo import UpdateOne
+        if viewers:
+            # One sub-document per instance, so instances don't overwrite each other's counts
+            await db.db.jobs.bulk_write([
+                UpdateOne({"id": agent_id, "status": "running"},
+                          {"$set": {f"viewers.{instance_id}.viewers": stats["viewers"],
+                                    f"viewers.{instance_id}.pressure": stats["pressure"]},
+                           "$currentDate": {f"viewers.{instance_id}.at": True}})
+                for agent_id, stats in viewers.items()], ordered=False)
+
+    async def stats(self) -> dict:
+        counts = {status: await db.db.jobs.count_documents({"status": status}) for status in ("queued", "running")}
+        workers = await db.db.jobs.distinct("worker", {"status": "running"})
+        return {"mode": "worker", "queued": counts["queued"], "running": counts["running"], "workers_busy": len(workers)}
+
+
+job_queue = JobQueue()
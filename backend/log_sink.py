@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from typing import List
+
+from metrics import DB_WRITE_SECONDS
+from models import LogSchema
+from repository import log_repo
+
+logger = logging.getLogger("LogSink")
+
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "10000"))  # Entries held before new ones are dropped
+LOG_FLUSH_BATCH = int(os.getenv("LOG_FLUSH_BATCH", "500"))  # Flush as soon as this many are buffered
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))  # ...or at least this often (seconds)
+
+
+class LogSink:
+    """Buffers log entries in memory and writes them with insert_many in the background.
+
+    write() never awaits the database, so agent step latency is independent
+    of Mongo latency. If the buffer is full the entry is dropped and counted.
+    """
+
+    def __init__(self, max_size: int = LOG_BUFFER_SIZE, batch_size: int = LOG_FLUSH_BATCH,
+                 interval: float = LOG_FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.buffer: List[LogSchema] = []
+        self.flushed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def write(self, entry: LogSchema) -> bool:
+        if len(self.buffer) >= self.max_size:
+            self.dropped += 1
+            return False
+        self.buffer.append(entry)
+        # Standalone scripts never call start(); spin the flusher up on first use
+        self.start()
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self.buffer:
+                batch = self.buffer[:self.batch_size]
+                del self.buffer[:self.batch_size]
+                try:
+                    with DB_WRITE_SECONDS.time(collection="logs"):
+                        await log_repo.create_logs(batch)
+                    self.flushed += len(batch)
+                    self.flushes += 1
+                except Exception as e:
+                    self.failed_flushes += 1
+                    retry = self._unwritten(batch, e)
+                    self.flushed += len(batch) - len(retry)
+                    # Keep what fits for the next attempt, count the rest as dropped
+                    room = max(0, self.max_size - len(self.buffer))
+                    self.buffer[:0] = retry[:room]
+                    self.dropped += max(0, len(retry) - room)
+                    logger.warning(f"Log flush of {len(batch)} entries failed, {len(retry)} kept for a retry: {e}")
+                    break
+
+    @staticmethod
+    def _unwritten(batch: List[LogSchema], error: Exception) -> List[LogSchema]:
+        """Entries of a failed batch that aren't in the database"""
+        from pymongo.errors import BulkWriteError
+        if not isinstance(error, BulkWriteError):
+            return batch
+        # Unordered insert: everything but the listed documents was written, and a duplicate key is already there
+        failed = {write_error["index"] for write_error in error.details.get("writeErrors", [])
+                  if write_error.get("code") != 11000}
+        return [entry for index, entry in enumerate(batch) if index in failed]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+log_sink = LogSink()
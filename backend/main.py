@@ -1,200 +1,638 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
 import json
+import time
 from typing import List, Optional
 from datetime import datetime
 
-from agent_service import AgentService
+from artifact_store import artifact_store
+from budget import Budget
+from analysis_pool import analysis_pool
+from agent_service import AGENT_TABS, MAX_AGENT_TABS, AgentService
+from crawl_frontier import site_key
 from decision_engine import DecisionEngine
+from dom_extractor import ANALYSIS_BACKEND, ANALYSIS_BACKENDS
+from network_profiles import NETWORK_PROFILE, resolve_profile
+from pacing import PACING_MODE, PACING_MODES
 from database import db
-from repository import agent_repo, log_repo
-from models import AgentSchema, LogSchema
+from event_relay import EventRelay, ensure_event_collection
+from job_queue import EXECUTION_MODE, EXECUTION_MODES, job_queue
+from repository import agent_repo, log_repo, crawl_state_repo, decode_cursor
+from models import AgentSchema, LogSchema, split_event
+from scheduler import scheduler, AgentJob
+from connection_manager import manager
+from log_sink import log_sink
+from metrics import AGENT_STEPS, DB_WRITE_SECONDS, FIRST_PAGE_LOAD_SECONDS, LoopLagMonitor, StepTimer, registry
+from politeness import host_limiter
+from recorder import RECORD_SESSIONS, recorder
+from site_cache import SITE_CACHE, site_cache
+from startup import startup
+from page_cache import page_cache
+from stats_aggregator import stats_aggregator
 
 app = FastAPI(title="Agent OS Backend")
+event_relay = EventRelay(manager, job_queue)
+loop_monitor = LoopLagMonitor()
+setup_task = None  # setup_collections(), started with the app
+
+# fresh: start from the target URL only; resume: skip pages earlier agents visited on this site;
+# incremental: revisit them, but only re-analyze pages whose fingerprint changed
+CRAWL_STATE_MODES = ("fresh", "resume", "incremental")
+CRAWL_STATE_CHECKPOINT = 10  # Persist crawl state every this many analyzed pages
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+async def setup_collections():
+    """Indexes, and the event collection in worker mode; no-ops once they exist"""
+    await db.ensure_indexes()
+    if EXECUTION_MODE == "worker":
+        try:
+            await ensure_event_collection()
+        except Exception as e:
+            print(f"Could not set up the event collection: {e}")
+
 @app.on_event("startup")
 async def startup_db_client():
+    global setup_task
+    startup.begin()
     db.connect()
+    # In the background: with MongoDB unreachable this waits out the server selection timeout (~30 s),
+    # and the app, /metrics included, should be up meanwhile
+    setup_task = asyncio.create_task(setup_collections())
+    loop_monitor.start()
+    log_sink.start()
+    stats_aggregator.start()
+    artifact_store.start()
+    site_cache.start()
+    if EXECUTION_MODE not in EXECUTION_MODES:
+        raise ValueError(f"EXECUTION_MODE must be one of {EXECUTION_MODES}")
+    if EXECUTION_MODE == "worker":
+        # Agents run in worker.py processes; this process only queues them and relays their events
+        # (the relay retries until setup_collections() has created the event collection)
+        event_relay.start()
+    else:
+        scheduler.start(run_agent_job)
+        # In the background: requests are served while the browsers launch
+        startup.prewarm(scheduler.pool, analysis_pool)
+    startup.ready()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if setup_task:
+        setup_task.cancel()
+    await startup.close()
+    await scheduler.shutdown()
+    await event_relay.close()
+    await loop_monitor.close()
+    analysis_pool.close()
+    await log_sink.close()
+    await stats_aggregator.close()
+    await artifact_store.close()
+    await site_cache.close()
     db.close()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
-
-manager = ConnectionManager()
-active_agent = None
-running_tasks = set()  # Track background tasks to prevent garbage collection
-
 class AgentStartRequest(BaseModel):
     url: str
     autonomy_level: str = "passive"
+    priority: int = 0  # Lower runs first; equal priorities are FIFO
+    analysis_backend: Optional[str] = None  # bs4, lxml or browser; defaults to ANALYSIS_BACKEND
+    network_profile: Optional[str] = None  # e.g. "lean" or "block_media,block_third_party"; defaults to NETWORK_PROFILE
+    allow_domains: List[str] = []  # Always allowed, and the only extra domains under "allowlist"
+    tabs: Optional[int] = None  # Pages explored concurrently (frontier planner only); defaults to AGENT_TABS
+    pacing: Optional[str] = None  # fixed or adaptive; defaults to PACING_MODE
+    crawl_state: str = "fresh"  # fresh, resume or incremental, see CRAWL_STATE_MODES
+    record: Optional[bool] = None  # Keep the video for replay; defaults to RECORD_SESSIONS
+    site_cache: Optional[bool] = None  # Reuse cookies/localStorage and cached assets of the origin; defaults to SITE_CACHE
+    # Budget: the run ends at the first exhausted limit; unset fields use the AGENT_MAX_* defaults, 0 disables one
+    max_pages: Optional[int] = None
+    max_seconds: Optional[float] = None
+    max_bytes: Optional[int] = None  # Bytes downloaded by the browser
+    novelty_window: Optional[int] = None  # Stop when this many pages in a row found < novelty_min_new new URLs
+    novelty_min_new: Optional[int] = None
 
-async def run_agent_loop(url: str, agent_id: str, autonomy_level: str):
-    global active_agent
-    
+async def run_agent_job(job: AgentJob):
+    await run_agent_loop(job.url, job.agent_id, job.autonomy_level, **job.options)
+
+async def run_agent_loop(url: str, agent_id: str, autonomy_level: str, analysis_backend: Optional[str] = None,
+                         network_profile: Optional[str] = None, allow_domains: Optional[List[str]] = None,
+                         tabs: Optional[int] = None, pacing: Optional[str] = None, crawl_state: str = "fresh",
+                         record: Optional[bool] = None, site_cache: Optional[bool] = None,
+                         budget: Optional[dict] = None, fanout=None):
+    # fanout: where events and frames go; the local WebSocket manager, or the event relay in a worker
+    fanout = fanout or manager
     print(f"[DEBUG] Starting agent loop for {agent_id}")
     
-    # Update status to RUNNING
-    await agent_repo.update_status(agent_id, "RUNNING")
+    # Update status to RUNNING (buffered; flushed on the next stats tick)
+    stats_aggregator.set_status(agent_id, "RUNNING")
     print(f"[DEBUG] Status set to RUNNING")
     
     async def broadcast_event(event_type, data):
-        # Broadcast to UI
-        await manager.broadcast({
+        if event_type == "VIDEO_FRAME":
+            # Binary channel: raw JPEG, newest frame wins on slow sockets
+            await fanout.broadcast_frame(agent_id, data["jpeg"])
+            return
+        # Broadcast to UI: same shape as the stored log entry
+        detail, fields = split_event(data)
+        await fanout.broadcast({
             "type": event_type, 
             "message": data.get("message", ""), 
-            "detail": str(data),
+            "detail": detail or "",
+            "data": fields,
             "agent_id": agent_id
         })
 
-    service = AgentService(agent_id=agent_id, event_callback=broadcast_event)
-    active_agent = service
-    engine = DecisionEngine()
+    service = AgentService(
+        agent_id=agent_id,
+        event_callback=broadcast_event,
+        browser_pool=scheduler.pool,
+        viewer_probe=lambda: fanout.viewer_stats(agent_id),
+        network_profile=network_profile or NETWORK_PROFILE,
+        allow_domains=allow_domains,
+        pacing=pacing or PACING_MODE,
+        record=RECORD_SESSIONS if record is None else record,
+        use_site_cache=SITE_CACHE if site_cache is None else site_cache,
+    )
+    engine = DecisionEngine(analysis_backend=analysis_backend or ANALYSIS_BACKEND)
+    # Only the frontier can hand different pages to several tabs; the random planner follows one page
+    tab_count = min(tabs or AGENT_TABS, MAX_AGENT_TABS) if engine.strategy == "frontier" else 1
+    
+    # Shared by all tabs; network.bytes_allowed counts what the browser actually downloaded
+    budget = Budget(**{k: v for k, v in (budget or {}).items() if v is not None},
+                    bytes_probe=lambda: service.network.bytes_allowed)
     
     print(f"[DEBUG] Service and engine created")
+    final_status = "COMPLETED"
+    stop_reason = "stopped"  # Until the loop ends on its own, see budget.STOP_REASONS
+    busy_tabs = 0
+    pages_explored = 0
+    frontier_done = False
+    site = site_key(url)
+    next_checkpoint = CRAWL_STATE_CHECKPOINT
+
+    async def save_crawl_state():
+        """Write URLs whose state changed since the last save; kept dirty if the write fails"""
+        entries = engine.export_state()
+        if not entries or site is None or db.db is None:
+            return
+        try:
+            with DB_WRITE_SECONDS.time(collection="crawl_urls"):
+                await crawl_state_repo.save(site, entries)
+        except Exception as e:
+            print(f"Could not save crawl state for {site}: {e}")
+            engine.frontier.mark_dirty(entries)
+
+    async def explore(tab: int, page, timer: StepTimer):
+        """One tab's observe -> decide -> act loop; tabs share the engine's visited set and frontier"""
+        nonlocal busy_tabs, pages_explored, frontier_done, next_checkpoint
+        label = f"[tab {tab + 1}] " if tab_count > 1 else ""
+        analyzed_url = None
+        waited = None  # Seconds paused after this tab's previous action
+        # Phases since this tab's previous OBSERVATION: the action and wait that led here, then this page
+        while service.is_running and not frontier_done and not budget.exhausted():
+            # Extra tabs start blank, and a failed navigation leaves the last (already analyzed) page
+            loaded = page.url.startswith("http") and (engine.strategy != "frontier" or page.url != analyzed_url)
+            if loaded:
+                budget.take_step()
+            busy_tabs += 1
+            try:
+                analysis = None
+                unchanged = False
+                failed = False
+                if loaded:
+                    page_url = page.url
+                    with timer.phase("fingerprint"):
+                        fingerprint = await service.fingerprint(page) if engine.cache.max_entries else None
+                    # Seen with this exact DOM by an earlier crawl: its links are already known, so it costs no step
+                    unchanged = engine.unchanged_since_last_crawl(page_url, fingerprint)
+                    # Unchanged pages (same URL and DOM hash) reuse the earlier parse; no content fetch
+                    cached = None if unchanged else engine.cached_page(page_url, fingerprint)
+                    if unchanged:
+                        budget.refund_step()
+                    elif cached is None:
+                        with timer.phase("content"):
+                            if engine.uses_browser_extraction:
+                                elements = await service.extract_elements(page)
+                            else:
+                                content = await service.get_page_content(page)
+                        if not engine.uses_browser_extraction:
+                            # Parsed in the analysis pool, so other agents and streams keep running meanwhile
+                            with timer.phase("extract"):
+                                elements = await analysis_pool.extract(content, engine.html_backend)
+                            # Its parse killed an analysis worker; skip the page rather than try it again
+                            failed = elements is None
+                    # No awaits from here to decide_next_action: the engine's current page is shared by all tabs
+                    engine.set_current_url(page_url)
+                    analyzed_url = page_url
+                    if not unchanged and not failed:
+                        with timer.phase("analyze"):
+                            if cached is not None:
+                                analysis = engine.analyze_cached(cached, fingerprint)
+                            else:
+                                analysis = engine.analyze_elements(elements, fingerprint)
+                        pages_explored += 1
+                        budget.record_page(analysis["new_link_count"])
+                        AGENT_STEPS.inc()
+                        stats_aggregator.increment(agent_id, pages_explored=1)
+                with timer.phase("decide"):
+                    action = engine.decide_next_action(analysis)
+
+                if analysis:
+                    notes = (" Unchanged since last visit, reused cached analysis." if cached is not None else "") + (
+                        f" Near-duplicate of {analysis['near_duplicate_of']}, its links are deprioritized."
+                        if analysis["near_duplicate_of"] else "")
+                    await service._emit_event("OBSERVATION", {
+                        "message": f"{label}Page Analyzed",
+                        "detail": f"Found {analysis['link_count']} links ({analysis['unvisited_link_count']} unvisited), {analysis['button_count']} buttons.{notes}",
+                        "wait_seconds": round(waited, 3) if waited is not None else None,
+                        "timings_ms": timer.breakdown(),
+                    })
+                    timer = StepTimer()
+                elif unchanged:
+                    await service._emit_event("OBSERVATION", {
+                        "message": f"{label}Page unchanged since the last crawl, skipped",
+                        "detail": page_url
+                    })
+                elif failed:
+                    await service._emit_event("ERROR", {
+                        "message": f"{label}Page could not be analyzed (the analysis worker died), skipped",
+                        "detail": page_url
+                    })
+
+                # The random planner ends too when nothing was analyzed and nothing is queued (e.g. the start page failed)
+                if action["type"] == "WAIT" and (engine.strategy == "frontier" or analysis is None):
+                    if busy_tabs > 1:
+                        # Another tab is mid-page and may still discover links; don't spend a step idling
+                        busy_tabs -= 1
+                        try:
+                            await asyncio.sleep(0.5)
+                        finally:
+                            busy_tabs += 1
+                        continue
+                    frontier_done = True
+                
+                await service._emit_event("ANALYSIS", {
+                    "message": f"{label}Deciding next move: {action['type']}",
+                    "detail": action.get('reason', '')
+                })
+                if frontier_done or budget.exhausted():
+                    break  # No point navigating to a page that won't be analyzed
+                
+                # EXECUTE THE ACTION
+                with timer.phase("navigate" if action["type"] == "NAVIGATE" else "execute"):
+                    waited = await service.execute_action(action, page)
+                stats_aggregator.increment(agent_id, **service.network.drain_counters())
+                
+                # Wait between actions: 3s in fixed mode, until the page is usable in adaptive mode
+                settled = await service.pacer.settle(page)
+                timer.add("wait", settled)
+                waited += settled
+                stats_aggregator.increment(agent_id, wait_ms=int(waited * 1000))
+
+                if pages_explored >= next_checkpoint:
+                    next_checkpoint = pages_explored + CRAWL_STATE_CHECKPOINT
+                    with timer.phase("db_write"):
+                        await save_crawl_state()
+            finally:
+                busy_tabs -= 1
     
     try:
+        if crawl_state != "fresh" and site and db.db is not None:
+            restored = engine.restore_state([entry async for entry in crawl_state_repo.load(site)], crawl_state)
+            await service._emit_event("INFO", {"message": f"Restored crawl state for {site}: {restored} URLs ({crawl_state})"})
+
         print(f"[DEBUG] Starting browser...")
-        await service.start()
+        await service.start(target_url=url)
+        scheduler.attach(agent_id, service)
         print(f"[DEBUG] Browser started, navigating to {url}")
-        await service.navigate(url)
+        first_timer = StepTimer()
+        with first_timer.phase("navigate"):
+            await service.navigate(url)
+        first_load = first_timer.phases["navigate"]
+        FIRST_PAGE_LOAD_SECONDS.observe(first_load, cache=service.cache_state)
+        await service._emit_event("INFO", {
+            "message": f"First page loaded in {first_load:.2f}s (site cache {service.cache_state})",
+            "first_load_seconds": round(first_load, 3),
+            "site_cache": service.cache_state
+        })
         print(f"[DEBUG] Navigation complete")
         
         # Set initial URL in decision engine
         engine.set_current_url(url)
         
-        # Exploration Loop (20 steps for meaningful exploration)
-        print(f"[DEBUG] Starting exploration loop (20 iterations)")
-        for i in range(20):
-            print(f"[DEBUG] Iteration {i+1}/20")
-            if not service.is_running: 
-                print(f"[DEBUG] Service stopped running, breaking loop")
-                break
-            
-            # Update current URL in decision engine
-            current_url = service.page.url if service.page else url
-            engine.set_current_url(current_url)
-            
-            content = await service.get_page_content()
-            await agent_repo.increment_stats(agent_id, pages_explored=1)
-            
-            analysis = engine.analyze(content)
-            
-            await service._emit_event("OBSERVATION", {
-                "message": "Page Analyzed",
-                "detail": f"Found {analysis['link_count']} links ({analysis['unvisited_link_count']} unvisited), {analysis['button_count']} buttons."
-            })
-            
-            action = engine.decide_next_action(analysis)
-            
-            await service._emit_event("ANALYSIS", {
-                "message": f"Deciding next move: {action['type']}",
-                "detail": action.get('reason', '')
-            })
-            
-            # EXECUTE THE ACTION
-            await service.execute_action(action)
-            
-            await asyncio.sleep(3)  # Wait between actions 
+        pages = await service.open_tabs(tab_count)
+        print(f"[DEBUG] Starting exploration loop ({budget.describe()}, {len(pages)} tabs)")
+        started = time.monotonic()
+        workers = [asyncio.create_task(explore(tab, page, first_timer if tab == 0 else StepTimer()))
+                   for tab, page in enumerate(pages)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        elapsed = time.monotonic() - started
+        pacing_stats = service.pacer.stats()
+        stop_reason = "frontier_exhausted" if frontier_done else budget.stop_reason or "stopped"
+        await service._emit_event("INFO", {
+            "message": f"Explored {pages_explored} pages in {elapsed:.0f}s "
+                       f"({pages_explored * 60 / max(elapsed, 1e-6):.1f} pages/min, {len(pages)} tabs); "
+                       f"{pacing_stats['mode']} pacing waited {pacing_stats['wait_seconds']:.1f}s "
+                       f"(avg {pacing_stats['avg_wait_seconds']:.2f}s); stopped: {stop_reason}",
+            "pacing": pacing_stats,
+            "budget": budget.stats(),
+            "url_store": engine.url_store_usage()
+        })
             
     except Exception as e:
         import traceback
         error_detail = traceback.format_exc()
         print(f"AGENT ERROR: {error_detail}")  # Log to console
-        await agent_repo.update_status(agent_id, "FAILED")
+        final_status = "FAILED"
+        stop_reason = "error"
         await service._emit_event("ERROR", {"message": "Runtime Error", "detail": str(e)})
+        await service.capture_screenshot("Page at failure")
     finally:
         await service.stop()
-        await agent_repo.update_status(agent_id, "COMPLETED")
-        active_agent = None
+        await save_crawl_state()
+        stats_aggregator.increment(agent_id, **service.network.drain_counters())
+        # Terminal state: write status and all buffered counters right away
+        await stats_aggregator.finish(agent_id, final_status, stop_reason=stop_reason)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            await websocket.receive_text()
+            # Clients send subscribe/unsubscribe/set messages, see ConnectionManager
+            manager.handle_control(websocket, await websocket.receive_text())
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 @app.post("/agent/start")
 async def start_agent(request: AgentStartRequest):
-    global active_agent
-    if active_agent:
-        return {"status": "error", "message": "Agent already running"}
-    
+    if request.analysis_backend and request.analysis_backend not in ANALYSIS_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"analysis_backend must be one of {ANALYSIS_BACKENDS}")
+    if request.crawl_state not in CRAWL_STATE_MODES:
+        raise HTTPException(status_code=400, detail=f"crawl_state must be one of {CRAWL_STATE_MODES}")
+    if request.pacing and request.pacing not in PACING_MODES:
+        raise HTTPException(status_code=400, detail=f"pacing must be one of {PACING_MODES}")
+    if request.tabs is not None and not 1 <= request.tabs <= MAX_AGENT_TABS:
+        raise HTTPException(status_code=400, detail=f"tabs must be between 1 and {MAX_AGENT_TABS}")
+    budget = {"max_pages": request.max_pages, "max_seconds": request.max_seconds, "max_bytes": request.max_bytes,
+              "novelty_window": request.novelty_window, "novelty_min_new": request.novelty_min_new}
+    if any(value is not None and value < 0 for value in budget.values()):
+        raise HTTPException(status_code=400, detail="Budget limits must not be negative")
+    limits = Budget(**{k: v for k, v in budget.items() if v is not None})
+    if not (limits.max_pages or limits.max_seconds or limits.max_bytes or limits.recent_new is not None):
+        raise HTTPException(status_code=400, detail="At least one of max_pages, max_seconds, max_bytes "
+                                                    "or novelty_window must be set")
+    try:
+        resolve_profile(request.network_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Create Agent in DB
-    new_agent = AgentSchema(target_url=request.url, autonomy_level=request.autonomy_level)
+    new_agent = AgentSchema(target_url=request.url, autonomy_level=request.autonomy_level, status="QUEUED")
     await agent_repo.create_agent(new_agent)
     
-    # Use asyncio.create_task for long-running background execution
-    task = asyncio.create_task(run_agent_loop(request.url, new_agent.id, request.autonomy_level))
-    running_tasks.add(task)
-    task.add_done_callback(running_tasks.discard)  # Clean up when done
-    return {"status": "started", "agent_id": new_agent.id, "target": request.url}
+    # Workers pick the job up as soon as a concurrency slot is free
+    job = AgentJob(
+        agent_id=new_agent.id,
+        url=request.url,
+        autonomy_level=request.autonomy_level,
+        priority=request.priority,
+        options={
+            "analysis_backend": request.analysis_backend,
+            "network_profile": request.network_profile,
+            "allow_domains": request.allow_domains,
+            "tabs": request.tabs,
+            "pacing": request.pacing,
+            "crawl_state": request.crawl_state,
+            "record": request.record,
+            "site_cache": request.site_cache,
+            "budget": budget,
+        },
+    )
+    position = await job_queue.enqueue(job) if EXECUTION_MODE == "worker" else scheduler.submit(job)
+    return {"status": "queued", "agent_id": new_agent.id, "target": request.url, "queue_position": position}
+
+@app.post("/agent/{agent_id}/stop")
+async def stop_agent_by_id(agent_id: str):
+    if EXECUTION_MODE == "worker":
+        previous = await job_queue.stop(agent_id)
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Agent not running")
+        was_queued = previous == "queued"
+    else:
+        was_queued = scheduler.is_queued(agent_id)
+        if not scheduler.stop(agent_id):
+            raise HTTPException(status_code=404, detail="Agent not running")
+    if was_queued:
+        await agent_repo.update_status(agent_id, "COMPLETED", stop_reason="stopped")
+    return {"status": "stopping", "agent_id": agent_id}
 
 @app.post("/agent/stop")
 async def stop_agent():
-    global active_agent
-    if active_agent:
-        active_agent.is_running = False
+    # Legacy endpoint: stops every queued and running agent
+    cancelled = await job_queue.stop_all() if EXECUTION_MODE == "worker" else scheduler.stop_all()
+    for agent_id in cancelled:
+        await agent_repo.update_status(agent_id, "COMPLETED", stop_reason="stopped")
     return {"status": "stopping"}
 
+@app.get("/scheduler")
+async def get_scheduler_stats():
+    if EXECUTION_MODE == "worker":
+        return await job_queue.stats()
+    return scheduler.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache/stats")
+async def get_page_cache_stats():
+    return page_cache.stats()
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    artifact = await artifact_store.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    data, content_type = artifact
+    # Artifacts are write-once, so clients may cache them for good
+    return Response(data, media_type=content_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/recordings/{agent_id}")
+async def get_recording(agent_id: str):
+    info = await asyncio.to_thread(recorder.info, agent_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return info
+
+@app.get("/recordings/{agent_id}/frame")
+async def get_recording_frame(agent_id: str, t: float = 0.0):
+    """The frame on screen `t` seconds into the recording (for scrubbing)"""
+    reader = await asyncio.to_thread(recorder.reader, agent_id)
+    if reader is None or not len(reader):
+        raise HTTPException(status_code=404, detail="Recording not found")
+    frames = reader.frames(reader.position(int(t * 1000)))
+    ms, jpeg = await asyncio.to_thread(next, frames)
+    frames.close()
+    return Response(jpeg, media_type="image/jpeg", headers={"X-Frame-Time": f"{ms / 1000:.3f}"})
+
+@app.get("/recordings/{agent_id}/stream")
+async def stream_recording(agent_id: str, start: float = 0.0, speed: float = 1.0):
+    """Replay as MJPEG (multipart/x-mixed-replace, shows in an <img>) from `start` seconds, paced at `speed`.
+
+    speed=0 sends every frame as fast as the client reads them.
+    """
+    reader = await asyncio.to_thread(recorder.reader, agent_id)
+    if reader is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    first = reader.position(int(start * 1000))
+
+    async def parts():
+        frames = reader.frames(first)
+        origin, started = None, time.monotonic()
+        try:
+            while True:
+                frame = await asyncio.to_thread(next, frames, None)
+                if frame is None:
+                    return
+                ms, jpeg = frame
+                if origin is None:
+                    origin = ms
+                elif speed > 0:
+                    await asyncio.sleep(max(0.0, (ms - origin) / 1000 / speed - (time.monotonic() - started)))
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(jpeg)).encode()
+                       + b"\r\nX-Frame-Time: " + f"{ms / 1000:.3f}".encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+        finally:
+            frames.close()
+
+    return StreamingResponse(parts(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+def runtime_metrics():
+    """Live gauges (and counters kept elsewhere) read at scrape time"""
+    pool, ws, logs, cache = scheduler.stats(), manager.queue_stats(), log_sink.stats(), page_cache.stats()
+    artifacts, recordings, sites = artifact_store.stats(), recorder.stats(), site_cache.stats()
+    lag, boot = loop_monitor.stats(), startup.stats()
+    metrics = [
+        ("agents_queued", "gauge", "Agents waiting for a concurrency slot", pool["queued"]),
+        ("agents_running", "gauge", "Agents currently running", pool["running"]),
+        ("browsers_active", "gauge", "Pooled browser processes", pool["browsers"]),
+        ("browser_contexts_active", "gauge", "Open browser contexts in the pool", pool["contexts"]),
+        ("ws_clients", "gauge", "Connected WebSocket clients", ws["clients"]),
+        ("ws_queued_events", "gauge", "JSON events waiting in client queues", ws["queued_events"]),
+        ("ws_pending_frames", "gauge", "Video frames waiting in client queues", ws["pending_frames"]),
+        ("ws_clients_evicted_total", "counter", "Clients evicted for falling behind", ws["evicted"]),
+        ("log_buffer_entries", "gauge", "Log entries buffered for the next batch write", logs["buffered"]),
+        ("log_entries_dropped_total", "counter", "Log entries dropped on overflow", logs["dropped"]),
+        ("page_cache_entries", "gauge", "Parsed pages in the fingerprint cache", cache["entries"]),
+        ("page_cache_hits_total", "counter", "Page cache hits", cache["hits"]),
+        ("page_cache_misses_total", "counter", "Page cache misses", cache["misses"]),
+        ("artifacts_stored_total", "counter", "Binary payloads written to the artifact store", artifacts["stored"]),
+        ("artifact_bytes_stored_total", "counter", "Bytes written to the artifact store", artifacts["bytes_stored"]),
+        ("recordings_active", "gauge", "Agents whose video is being recorded", recordings["active"]),
+        ("recording_frames_queued", "gauge", "Frames waiting for the recording writers", recordings["queued_frames"]),
+        ("event_loop_lag_p99_seconds", "gauge", "p99 event loop lag over the last minute", lag["p99_ms"] / 1000),
+        ("analysis_pool_tasks_total", "counter", "Pages parsed in the analysis process pool",
+         analysis_pool.stats()["submitted"]),
+        ("event_relay_events_total", "counter", "Worker events and frames relayed to local WebSocket clients",
+         event_relay.relayed),
+        ("site_cache_hits_total", "counter", "Static responses served from the per-origin disk cache", sites["hits"]),
+        ("site_cache_misses_total", "counter", "Cacheable requests that went to the network", sites["misses"]),
+        ("host_limiter_wait_seconds_total", "counter", "Time page loads waited for per-host politeness",
+         host_limiter.stats()["wait_seconds"]),
+        ("browsers_prewarmed", "gauge", "Browsers launched ahead of the first agent (PREWARM_BROWSERS)",
+         boot["prewarmed_browsers"]),
+    ]
+    # Cold-start timings, once known
+    for name, help in (("ready_seconds", "Startup handler duration, until requests are served"),
+                       ("prewarm_seconds", "Background launch of the Playwright driver, browsers and analysis workers"),
+                       ("first_agent_frame_seconds", "First agent of this process: start to first video frame")):
+        if boot[name] is not None:
+            metrics.append((f"startup_{name}", "gauge", help, boot[name]))
+    return metrics
+
+registry.add_collector(runtime_metrics)
+
 # --- Data APIs ---
 
+def parse_fields(fields: Optional[str]):
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+def ndjson_response(documents, transform=None):
+    """Stream documents one JSON object per line, straight from the DB cursor"""
+    async def lines():
+        async for document in documents:
+            if transform:
+                document = transform(document)
+            yield json.dumps(document, default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o)) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/agents")
-async def get_agents():
-    return await agent_repo.get_all_agents()
+async def get_agents(response: Response, cursor: Optional[str] = None, limit: int = 100,
+                     fields: Optional[str] = None, format: str = "json"):
+    # Paginate with the X-Next-Cursor header; format=ndjson streams everything after the cursor
+    limit = max(1, min(limit, 1000))
+    try:
+        if format == "ndjson":
+            if cursor:
+                decode_cursor(cursor)  # Reject bad cursors before the stream starts
+            return ndjson_response(agent_repo.iter_agents(cursor, parse_fields(fields)), stats_aggregator.overlay)
+        agents, next_cursor = await agent_repo.list_agents(cursor, limit, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [stats_aggregator.overlay(a) for a in agents]
 
 @app.get("/agents/{agent_id}")
 async def get_agent(agent_id: str):
-    agent = await agent_repo.get_agent(agent_id)
+    agent = stats_aggregator.overlay(await agent_repo.get_agent(agent_id))
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return agent
 
+@app.get("/logs/stats")
+async def get_log_sink_stats():
+    return log_sink.stats()
+
 @app.get("/logs")
-async def get_logs(agent_id: Optional[str] = None, limit: int = 50):
-    return await log_repo.get_logs(agent_id, limit)
+async def get_logs(response: Response, agent_id: Optional[str] = None, limit: int = 50,
+                   cursor: Optional[str] = None, include_detail: bool = False,
+                   fields: Optional[str] = None, format: str = "json"):
+    limit = max(1, min(limit, 1000))
+    try:
+        if format == "ndjson":
+            if cursor:
+                decode_cursor(cursor)
+            return ndjson_response(log_repo.iter_logs(agent_id, cursor, include_detail, parse_fields(fields)))
+        logs, next_cursor = await log_repo.list_logs(agent_id, cursor, limit, include_detail, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
 
 @app.get("/dashboard/stats")
 async def get_stats():
-    agents = await agent_repo.get_all_agents()
-    total_agents = len(agents)
-    total_active = sum(1 for a in agents if a['status'] == 'RUNNING')
-    
-    # Aggregate pages explored
-    total_pages = sum(a.get('stats', {}).get('pages_explored', 0) for a in agents)
+    stats = await agent_repo.get_dashboard_stats()
+    # Add what running agents have buffered in memory but not flushed yet
+    for key, delta in stats_aggregator.pending_totals().items():
+        stats[key] = max(0, stats[key] + delta)
     
     return {
-        "active_agents": total_active,
-        "total_agents": total_agents,
-        "pages_explored": total_pages,
+        "active_agents": stats["active_agents"],
+        "total_agents": stats["total_agents"],
+        "pages_explored": stats["pages_explored"],
         "efficiency_score": 92 # Placeholder or calc
     }
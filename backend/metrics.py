@@ -0,0 +1,215 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Prometheus text exposition format (0.0.4), without the client library dependency
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.values: Dict[Tuple, list] = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", key, series[-2]
+            yield f"{self.name}_count", key, series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        self.collectors: List[Callable[[], list]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list]):
+        """collector() -> [(name, "gauge" | "counter", help, value), ...], read at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for collector in self.collectors:
+            for name, kind, help, value in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class StepTimer:
+    """Per-step phase timings: feeds the step histogram and the OBSERVATION breakdown"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        STEP_PHASE_SECONDS.observe(seconds, phase=name)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds per phase"""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task: the delay every coroutine is seeing.
+
+    Feeds EVENT_LOOP_LAG_SECONDS and keeps the last `window` samples for
+    percentiles in stats().
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+        }
+
+
+registry = Registry()
+
+STEP_PHASE_SECONDS = registry.histogram(
+    "agent_step_phase_seconds",
+    "Time per agent step phase (navigate, fingerprint, content, extract, analyze, decide, execute, wait, db_write)")
+AGENT_STEPS = registry.counter("agent_steps_total", "Pages analyzed by agents")
+DB_WRITE_SECONDS = registry.histogram("db_write_seconds", "Duration of MongoDB batch writes by collection")
+FRAME_CAPTURE_SECONDS = registry.histogram(
+    "video_frame_capture_seconds", "page.screenshot() duration in poll streaming mode",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+FIRST_PAGE_LOAD_SECONDS = registry.histogram(
+    "agent_first_page_load_seconds", "Load time of an agent's first page by site cache state (off, cold, warm)")
+FIRST_FRAME_SECONDS = registry.histogram(
+    "agent_first_frame_seconds", "Time from an agent starting (browser included) to its first video frame",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 20.0, 30.0))
+VIDEO_FRAMES = registry.counter("video_frames_total", "Captured video frames by result (sent, duplicate)")
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a task scheduled 100ms ahead",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+WS_MESSAGES_SENT = registry.counter("ws_messages_sent_total", "WebSocket messages written, by kind (event, frame)")
+WS_MESSAGES_DROPPED = registry.counter(
+    "ws_messages_dropped_total", "WebSocket messages never sent, by kind (frame: superseded by a newer one)")
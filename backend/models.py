@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime
 from uuid import uuid4
 
@@ -8,9 +8,10 @@ class AgentSchema(BaseModel):
     name: str = "New Agent"
     target_url: str
     autonomy_level: str
-    status: str = "IDLE" # IDLE, RUNNING, PAUSED, COMPLETED, FAILED
+    status: str = "IDLE" # IDLE, QUEUED, RUNNING, PAUSED, COMPLETED, FAILED
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_run: Optional[datetime] = None
+    stop_reason: Optional[str] = None # Why the last run ended: max_pages, max_seconds, max_bytes, novelty, frontier_exhausted, stopped, error
     stats: dict = {"pages_explored": 0, "issues_found": 0}
 
 class LogSchema(BaseModel):
@@ -19,5 +20,23 @@ class LogSchema(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     type: str # INFO, NAVIGATE, ACTION, ERROR, OBSERVATION
     message: str
-    detail: Optional[str] = None
+    detail: Optional[str] = None  # Human-readable detail line
+    data: Optional[dict] = None  # Structured event fields (stats, timings, artifact ids, ...)
     meta: Optional[str] = None
+
+def _json_safe(value: Any):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"  # Binary payloads belong in the artifact store
+    return str(value)
+
+def split_event(data: dict):
+    """(detail string or None, structured fields or None) from an event dict; message is stored separately"""
+    detail = data.get("detail")
+    fields = {k: _json_safe(v) for k, v in data.items() if k not in ("message", "detail")}
+    return (None if detail is None else str(detail)), (fields or None)
@@ -0,0 +1,180 @@
+import logging
+import os
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from site_cache import CACHE_HIT_HEADER
+
+logger = logging.getLogger("NetworkProfiles")
+
+# Comma-separated profile names, e.g. "block_media,block_fonts"
+NETWORK_PROFILE = os.getenv("NETWORK_PROFILE", "none")
+
+PROFILES = {
+    "none": {},
+    "block_media": {"block_types": {"image", "media"}},
+    "block_fonts": {"block_types": {"font"}},
+    "block_trackers": {"block_trackers": True},
+    "block_third_party": {"block_third_party": True},
+    # Only the target site and explicitly allowed domains
+    "allowlist": {"allowlist_only": True},
+    # Everything DecisionEngine doesn't need, but keep CSS so frames still look right
+    "lean": {"block_types": {"image", "media", "font"}, "block_trackers": True},
+}
+
+TRACKER_DOMAINS = {
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "amplitude.com", "fullstory.com", "newrelic.com", "nr-data.net",
+    "clarity.ms", "scorecardresearch.com", "quantserve.com", "adsrvr.org", "criteo.com",
+}
+
+# Fallback size estimates (bytes) for blocked requests until we've seen real ones
+DEFAULT_SIZES = {"image": 40_000, "media": 500_000, "font": 30_000, "script": 25_000,
+                 "stylesheet": 15_000, "xhr": 5_000, "fetch": 5_000}
+
+
+def resolve_profile(names: Optional[str]) -> dict:
+    rules = {"block_types": set(), "block_trackers": False, "block_third_party": False, "allowlist_only": False}
+    for name in (names or "none").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in PROFILES:
+            raise ValueError(f"Unknown network profile: {name}")
+        for key, value in PROFILES[name].items():
+            if key == "block_types":
+                rules["block_types"] |= value
+            else:
+                rules[key] = rules[key] or value
+    return rules
+
+
+def _site_of(host: str) -> str:
+    host = (host or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class NetworkInterceptor:
+    """Route handler on a BrowserContext that aborts requests the crawl doesn't need.
+
+    Counts allowed vs blocked requests and the bytes allowed ones actually
+    transferred, and estimates bytes saved from the average size of allowed
+    responses of the same resource type.
+    """
+
+    def __init__(self, profile: Optional[str] = NETWORK_PROFILE, allow_domains: Optional[Iterable[str]] = None):
+        self.profile = profile or "none"
+        self.rules = resolve_profile(self.profile)
+        self.allow_domains = {_site_of(d) for d in allow_domains or []}
+        self.first_party = None
+        self.requests_allowed = 0
+        self.requests_blocked = 0
+        self.bytes_allowed = 0
+        self.bytes_saved = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self._size_totals: Dict[str, list] = {}  # resource type -> [bytes, responses]
+        self._from_disk = set()  # Requests the site cache answered; finished but nothing downloaded
+        self._drained = {}
+
+    @property
+    def active(self) -> bool:
+        rules = self.rules
+        return bool(rules["block_types"] or rules["block_trackers"] or rules["block_third_party"]
+                    or rules["allowlist_only"])
+
+    def set_first_party(self, url: str):
+        if self.first_party is None:
+            self.first_party = _site_of(urlparse(url).hostname)
+
+    async def attach(self, context):
+        # Routing sends every request through Python, so only do it when something is blocked
+        if self.active:
+            await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+        context.on("requestfinished", self._on_request_finished)
+        context.on("requestfailed", self._from_disk.discard)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return False  # data:, blob: etc. never hit the network
+        host = _site_of(parsed.hostname)
+        first_party = self.first_party is None or _matches(host, [self.first_party])
+
+        if _matches(host, self.allow_domains):
+            return False
+        if self.rules["allowlist_only"] and not first_party:
+            return True
+        if resource_type == "document":
+            return False  # Never block navigations themselves
+        if resource_type in self.rules["block_types"]:
+            return True
+        if self.rules["block_trackers"] and _matches(host, TRACKER_DOMAINS):
+            return True
+        if self.rules["block_third_party"] and not first_party:
+            return True
+        return False
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.requests_blocked += 1
+            self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+            self.bytes_saved += self._estimate_size(request.resource_type)
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()  # On to the site cache route, if any, then the network
+
+    def _on_response(self, response):
+        # Aborted requests never produce a response, so everything here was allowed
+        self.requests_allowed += 1
+        if response.headers.get(CACHE_HIT_HEADER) == "hit":
+            self._from_disk.add(response.request)
+
+    async def _on_request_finished(self, request):
+        # Transfer sizes once the body is in: chunked and compressed responses mostly have no content-length
+        if request in self._from_disk:
+            self._from_disk.discard(request)
+            return
+        try:
+            sizes = await request.sizes()
+        except Exception as e:
+            logger.debug(f"No sizes for {request.url}: {e}")
+            return  # Page closed meanwhile
+        body = max(0, sizes.get("responseBodySize", 0))  # -1 when unknown
+        self.bytes_allowed += body + max(0, sizes.get("responseHeadersSize", 0))
+        if body:
+            totals = self._size_totals.setdefault(request.resource_type, [0, 0])
+            totals[0] += body
+            totals[1] += 1
+
+    def _estimate_size(self, resource_type: str) -> int:
+        total, count = self._size_totals.get(resource_type, (0, 0))
+        return total // count if count else DEFAULT_SIZES.get(resource_type, 10_000)
+
+    def stats(self) -> dict:
+        return {
+            "profile": self.profile,
+            "requests_allowed": self.requests_allowed,
+            "requests_blocked": self.requests_blocked,
+            "bytes_downloaded": self.bytes_allowed,
+            "bytes_saved_estimate": self.bytes_saved,
+            "blocked_by_type": dict(self.blocked_by_type),
+        }
+
+    def drain_counters(self) -> dict:
+        """Counter increments since the last call, for the stats aggregator"""
+        current = {
+            "requests_allowed": self.requests_allowed,
+            "requests_blocked": self.requests_blocked,
+            "bytes_downloaded": self.bytes_allowed,
+            "bytes_saved": self.bytes_saved,
+        }
+        deltas = {k: v - self._drained.get(k, 0) for k, v in current.items()}
+        self._drained = current
+        return {k: v for k, v in deltas.items() if v}
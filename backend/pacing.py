@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger("Pacing")
+
+# fixed: the original hard sleeps; adaptive: wait for PACING_SIGNAL, at most PACING_MAX_WAIT seconds
+PACING_MODES = ("fixed", "adaptive")
+PACING_MODE = os.getenv("PACING_MODE", "fixed")
+# mutation: DOM quiet for PACING_QUIET_MS; networkidle: no requests for 500ms; load: the load event
+PACING_SIGNALS = ("mutation", "networkidle", "load")
+PACING_SIGNAL = os.getenv("PACING_SIGNAL", "mutation")
+PACING_MAX_WAIT = float(os.getenv("PACING_MAX_WAIT", "5"))
+PACING_QUIET_MS = int(os.getenv("PACING_QUIET_MS", "300"))
+
+# Seconds slept in fixed mode after each kind of pause
+FIXED_DELAYS = {"step": 3.0, "click": 1.0, "wait": 2.0}
+
+# Resolves once the DOM has gone quietMs without a mutation (or after maxMs)
+QUIESCENCE_JS = """
+([quietMs, maxMs]) => new Promise(resolve => {
+  let observer = null, quietTimer = null, capTimer = null;
+  const done = () => {
+    if (observer) observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(capTimer);
+    resolve(true);
+  };
+  const arm = () => { clearTimeout(quietTimer); quietTimer = setTimeout(done, quietMs); };
+  const observe = () => {
+    observer = new MutationObserver(arm);
+    observer.observe(document.documentElement || document,
+                     {subtree: true, childList: true, attributes: true, characterData: true});
+    arm();
+  };
+  capTimer = setTimeout(done, maxMs);
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', observe, {once: true});
+  } else {
+    observe();
+  }
+})
+"""
+
+
+class Pacer:
+    """Decides how long to pause after an action before the page is observed again"""
+
+    def __init__(self, mode: str = PACING_MODE, signal: str = PACING_SIGNAL,
+                 max_wait: float = PACING_MAX_WAIT, quiet_ms: int = PACING_QUIET_MS):
+        if mode not in PACING_MODES:
+            raise ValueError(f"Unknown pacing mode: {mode}")
+        if signal not in PACING_SIGNALS:
+            raise ValueError(f"Unknown pacing signal: {signal}")
+        self.mode = mode
+        self.signal = signal
+        self.max_wait = max_wait
+        self.quiet_ms = quiet_ms
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0  # Adaptive waits that hit max_wait
+
+    async def settle(self, page, kind: str = "step") -> float:
+        """Pause until the page is usable (adaptive) or for the fixed delay; returns seconds waited"""
+        started = time.monotonic()
+        if self.mode == "fixed" or page is None:
+            await asyncio.sleep(FIXED_DELAYS.get(kind, FIXED_DELAYS["step"]))
+        else:
+            # Playwright is loaded once there is a page; its own max_wait timeout can fire before wait_for's
+            from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+            try:
+                await asyncio.wait_for(self._ready(page), timeout=self.max_wait)
+            except (asyncio.TimeoutError, PlaywrightTimeoutError):
+                self.timeouts += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Typically the page navigated mid-evaluate; it's loading a new document, so move on
+                logger.debug(f"Readiness wait interrupted: {e}")
+        waited = time.monotonic() - started
+        self.waits += 1
+        self.wait_seconds += waited
+        return waited
+
+    async def _ready(self, page):
+        timeout_ms = self.max_wait * 1000
+        if self.signal == "load":
+            await page.wait_for_load_state("load", timeout=timeout_ms)
+        elif self.signal == "networkidle":
+            await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+        else:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            await page.evaluate(QUIESCENCE_JS, [self.quiet_ms, int(timeout_ms)])
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "signal": self.signal if self.mode == "adaptive" else None,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "avg_wait_seconds": round(self.wait_seconds / self.waits, 3) if self.waits else 0.0,
+            "timeouts": self.timeouts,
+        }
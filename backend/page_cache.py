@@ -0,0 +1,177 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from crawl_frontier import normalize_url, site_key
+
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "2000"))
+# SimHash bits that may differ for two pages to count as near-duplicates
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "3"))
+SIMHASH_BANDS = 4  # 64 bits in 16-bit bands; distance <= 3 guarantees one band matches exactly
+# Pages with fewer words have no meaningful SimHash (an empty SPA shell or error page hashes to 0)
+NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "20"))
+
+# Computed in the page so only two short strings and a count cross the CDP connection, in one walk
+# of the DOM that neither serializes it nor reads innerText (which forces style and layout):
+# a 64-bit FNV-1a hash of the tag structure, the attributes the extractors read and every text
+# node, and a 64-bit SimHash of the words outside scripts and styles, with their count.
+FINGERPRINT_JS = """
+() => {
+  const fnv = (s, h) => {
+    for (let i = 0; i < s.length; i++) { h ^= s.charCodeAt(i); h = Math.imul(h, 16777619) >>> 0; }
+    return h >>> 0;
+  };
+  const hex = n => n.toString(16).padStart(8, '0');
+  const skip = new Set(['SCRIPT', 'STYLE', 'TEMPLATE', 'NOSCRIPT']);
+  const counts = new Array(64).fill(0);
+  let h1 = 2166136261, h2 = 3735928559, length = 0, tokens = 0;
+  const mix = s => { h1 = fnv(s, h1); h2 = fnv(s, h2); length += s.length; };
+  const root = document.documentElement;
+  const walker = root && document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT);
+  for (let node = root; node; node = walker.nextNode()) {
+    if (node.nodeType === 1) {
+      mix('<' + node.tagName);
+      for (const name of ['href', 'name', 'id']) {
+        const value = node.getAttribute(name);
+        if (value !== null) mix(' ' + name + '=' + value);
+      }
+      continue;
+    }
+    if (node.parentElement && skip.has(node.parentElement.tagName)) continue;
+    const text = node.nodeValue;
+    mix(text);
+    for (const token of text.toLowerCase().match(/[\\p{L}\\p{N}]+/gu) || []) {
+      tokens++;
+      const lo = fnv(token, 2166136261), hi = fnv(token, 3735928559);
+      for (let b = 0; b < 32; b++) {
+        counts[b] += (lo >>> b) & 1 ? 1 : -1;
+        counts[b + 32] += (hi >>> b) & 1 ? 1 : -1;
+      }
+    }
+  }
+  let lo = 0, hi = 0;
+  for (let b = 0; b < 32; b++) {
+    if (counts[b] > 0) lo |= 1 << b;
+    if (counts[b + 32] > 0) hi |= 1 << b;
+  }
+  return {
+    hash: hex(h1) + hex(h2) + ':' + length,
+    simhash: hex(hi >>> 0) + hex(lo >>> 0),
+    tokens,
+  };
+}
+"""
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PageCache:
+    """Bounded LRU of parsed pages keyed by (normalized URL, DOM hash).
+
+    A hit means the page has the same structure, text and link targets as
+    when it was analyzed, so the parsed title/links/buttons/inputs can be
+    reused without fetching the HTML or running the extractor. SimHashes of cached pages are indexed in
+    bands per site to find near-duplicates (the same template under another URL of the same site);
+    pages with fewer than ``min_tokens`` words are not compared.
+    """
+
+    def __init__(self, max_entries: int = PAGE_CACHE_SIZE, near_distance: int = NEAR_DUPLICATE_DISTANCE,
+                 min_tokens: int = NEAR_DUPLICATE_MIN_TOKENS):
+        self.max_entries = max_entries
+        self.near_distance = near_distance
+        self.min_tokens = min_tokens
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._bands: Dict[Tuple[str, int, int], Set[Tuple[str, str]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.near_duplicates = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(url: str, fingerprint: dict) -> Tuple[str, str]:
+        return normalize_url(url) or url, fingerprint["hash"]
+
+    @staticmethod
+    def _band_keys(url: str, simhash: int):
+        width = 64 // SIMHASH_BANDS
+        site = site_key(url) or ""
+        return [(site, band, (simhash >> (band * width)) & ((1 << width) - 1)) for band in range(SIMHASH_BANDS)]
+
+    def _comparable(self, fingerprint: dict) -> bool:
+        return fingerprint.get("tokens", 0) >= self.min_tokens
+
+    def get(self, url: str, fingerprint: Optional[dict]) -> Optional[dict]:
+        """Parsed page for an unchanged URL, or None"""
+        if not fingerprint:
+            return None
+        key = self._key(url, fingerprint)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["parsed"]
+
+    def put(self, url: str, fingerprint: Optional[dict], parsed: dict):
+        if not fingerprint or self.max_entries <= 0:
+            return
+        key = self._key(url, fingerprint)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        simhash = int(fingerprint["simhash"], 16) if self._comparable(fingerprint) else None
+        self._entries[key] = {"parsed": parsed, "simhash": simhash}
+        if simhash is not None:
+            for band_key in self._band_keys(key[0], simhash):
+                self._bands.setdefault(band_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        key, entry = self._entries.popitem(last=False)
+        self.evictions += 1
+        if entry["simhash"] is None:
+            return
+        for band_key in self._band_keys(key[0], entry["simhash"]):
+            members = self._bands.get(band_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._bands[band_key]
+
+    def similar(self, url: str, fingerprint: Optional[dict]) -> Optional[str]:
+        """URL of another cached page of the same site with (nearly) the same content, if any"""
+        if not fingerprint or not self._comparable(fingerprint):
+            return None
+        own_url = normalize_url(url) or url
+        simhash = int(fingerprint["simhash"], 16)
+        for band_key in self._band_keys(own_url, simhash):
+            for other_url, other_hash in self._bands.get(band_key, ()):
+                if other_url == own_url:
+                    continue
+                entry = self._entries[(other_url, other_hash)]
+                if other_hash == fingerprint["hash"] or hamming(simhash, entry["simhash"]) <= self.near_distance:
+                    self.near_duplicates += 1
+                    return other_url
+        return None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "near_duplicates": self.near_duplicates,
+        }
+
+
+page_cache = PageCache()
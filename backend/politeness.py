@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from urllib.parse import urlparse
+
+# Shared by every tab of every agent, so several agents on one site add up
+HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", "4"))
+HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", "0.25"))
+
+
+class HostLimiter:
+    """Per-host cap on concurrent page loads plus a minimum gap between load starts"""
+
+    def __init__(self, max_concurrent: int = HOST_MAX_CONCURRENCY, min_interval: float = HOST_MIN_INTERVAL):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_interval = min_interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self._users: Dict[str, int] = {}  # host -> loads waiting or in flight
+        self.acquired = 0
+        self.wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = (urlparse(url).hostname or "").lower()
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_concurrent))
+        self._users[host] = self._users.get(host, 0) + 1
+        requested = time.monotonic()
+        try:
+            async with semaphore:
+                now = time.monotonic()
+                start_at = max(now, self._next_start.get(host, 0.0))
+                self._next_start[host] = start_at + self.min_interval
+                if start_at > now:
+                    await asyncio.sleep(start_at - now)
+                self.acquired += 1
+                self.wait_seconds += time.monotonic() - requested
+                yield
+        finally:
+            self._users[host] -= 1
+            if not self._users[host]:
+                # Forget idle hosts so the dicts don't grow with every site ever visited;
+                # the interval is kept only if a load started less than min_interval ago
+                del self._users[host]
+                self._semaphores.pop(host, None)
+                if time.monotonic() >= self._next_start.get(host, 0.0):
+                    self._next_start.pop(host, None)
+
+    def stats(self) -> dict:
+        return {
+            "hosts": len(self._semaphores),
+            "max_concurrent_per_host": self.max_concurrent,
+            "min_interval": self.min_interval,
+            "loads": self.acquired,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+host_limiter = HostLimiter()
@@ -0,0 +1,299 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("Recorder")
+
+RECORD_SESSIONS = os.getenv("RECORD_SESSIONS", "0") == "1"  # Default for agents started without `record`
+RECORDING_DIR = os.getenv("RECORDING_DIR", "recordings")
+RECORDING_FPS = float(os.getenv("RECORDING_FPS", "2"))  # Frames kept per second of recording
+RECORDING_SEGMENT_MB = int(os.getenv("RECORDING_SEGMENT_MB", "64"))  # Start a new segment file past this size
+RECORDING_BUFFER = 64  # Frames queued for the writer before new ones are dropped
+
+# Layout of <RECORDING_DIR>/<agent_id>/:
+#   seg-00000.mjpeg, ...  JPEG frames back to back (a valid MJPEG stream), append-only
+#   index.bin             one INDEX_ENTRY per frame: ms since start, segment, offset, length
+#   meta.json             started_at, frames, duration_ms, duplicates, throttled, dropped; rewritten on close
+INDEX_ENTRY = struct.Struct("<QHQI")
+RECORDING_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _segment_name(segment: int) -> str:
+    return f"seg-{segment:05d}.mjpeg"
+
+
+class Recording:
+    """One agent's frames, written by a background task so capture never waits on the disk.
+
+    write() only timestamps, throttles to RECORDING_FPS, deduplicates by
+    content hash and queues; the writer appends queued frames and their
+    index entries in one thread hop per batch. A throttled frame is held
+    back, not discarded: the screencast only sends frames on repaint, so
+    the last one of a burst is often what stays on screen. The writer
+    records it once the interval is over, unless a newer frame replaced it.
+
+    Opening a directory that already holds a recording (an agent whose job
+    was reclaimed by another worker) continues it: new frames go after the
+    existing ones in the same timeline, and meta.json keeps the totals.
+    """
+
+    def __init__(self, directory: str, fps: float = RECORDING_FPS, segment_bytes: int = RECORDING_SEGMENT_MB * 2**20):
+        self.directory = directory
+        self.min_interval = 1 / fps if fps > 0 else 0.0
+        self.segment_bytes = segment_bytes
+        self.started = time.monotonic()
+        self.started_at = datetime.utcnow()
+        self.buffer: List[Tuple[int, bytes]] = []
+        self.frames = 0
+        self.duplicates = 0
+        self.throttled = 0  # Held back by the fps limit and then replaced by a newer frame
+        self.dropped = 0
+        self.pending: Optional[Tuple[int, bytes]] = None  # Latest throttled frame
+        self.last_ms = None
+        self.last_digest = None
+        self.segment = 0
+        self.offset = 0
+        os.makedirs(directory, exist_ok=True)
+        self._resume()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def _resume(self):
+        """Continue the segment, offset, time base and counters of an earlier run into this directory"""
+        index_path = os.path.join(self.directory, "index.bin")
+        if not os.path.exists(index_path):
+            return
+        size = os.path.getsize(index_path)
+        usable = size - size % INDEX_ENTRY.size
+        with open(index_path, "r+b") as f:
+            f.truncate(usable)  # Drop a half-written trailing entry so new ones stay aligned
+            if not usable:
+                return
+            f.seek(usable - INDEX_ENTRY.size)
+            last_ms, self.segment, _, _ = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+        segment_path = os.path.join(self.directory, _segment_name(self.segment))
+        self.offset = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+        meta = {}
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass  # The earlier run died before close()
+        self.frames = usable // INDEX_ENTRY.size
+        for counter in ("duplicates", "throttled", "dropped"):
+            setattr(self, counter, int(meta.get(counter, 0)))
+        # Wall time since the first run, so the gap between runs shows; at least one interval past the last frame
+        elapsed_ms = 0
+        if "started_at" in meta:
+            self.started_at = datetime.fromisoformat(meta["started_at"])
+            elapsed_ms = (datetime.utcnow() - self.started_at).total_seconds() * 1000
+        base_ms = max(elapsed_ms, last_ms + max(self.min_interval * 1000, 1))
+        self.started -= base_ms / 1000
+        self.last_ms = last_ms
+        if "started_at" not in meta:
+            self.started_at = datetime.utcnow() - timedelta(milliseconds=base_ms)
+
+    def write(self, jpeg: bytes) -> bool:
+        if self._closed:
+            return False
+        now_ms = int((time.monotonic() - self.started) * 1000)
+        if self.last_ms is not None and now_ms - self.last_ms < self.min_interval * 1000:
+            if self.pending is None:
+                self._wakeup.set()  # Let the writer schedule the trailing edge
+            else:
+                self.throttled += 1
+            self.pending = (now_ms, jpeg)
+            return False
+        if self.pending is not None:
+            self.throttled += 1
+            self.pending = None
+        return self._queue(now_ms, jpeg)
+
+    def _queue(self, now_ms: int, jpeg: bytes) -> bool:
+        digest = hashlib.blake2b(jpeg, digest_size=16).digest()
+        if digest == self.last_digest:
+            self.duplicates += 1
+            return False
+        if len(self.buffer) >= RECORDING_BUFFER:
+            self.dropped += 1
+            return False
+        self.last_ms, self.last_digest = now_ms, digest
+        self.buffer.append((now_ms, jpeg))
+        self._wakeup.set()
+        return True
+
+    def _append(self, batch: List[Tuple[int, bytes]]):
+        index = []
+        segment_file = open(os.path.join(self.directory, _segment_name(self.segment)), "ab")
+        try:
+            for ms, jpeg in batch:
+                if self.offset and self.offset + len(jpeg) > self.segment_bytes:
+                    segment_file.close()
+                    self.segment, self.offset = self.segment + 1, 0
+                    segment_file = open(os.path.join(self.directory, _segment_name(self.segment)), "ab")
+                segment_file.write(jpeg)
+                index.append(INDEX_ENTRY.pack(ms, self.segment, self.offset, len(jpeg)))
+                self.offset += len(jpeg)
+        finally:
+            segment_file.close()
+        # Index after data: a reader never sees an entry whose bytes aren't on disk yet
+        with open(os.path.join(self.directory, "index.bin"), "ab") as f:
+            f.write(b"".join(index))
+
+    def _write_meta(self):
+        meta = {
+            "started_at": self.started_at.isoformat(),
+            "frames": self.frames,
+            "duration_ms": self.last_ms or 0,
+            "duplicates": self.duplicates,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "segments": self.segment + 1 if self.frames else 0,
+        }
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    async def _flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        try:
+            await asyncio.to_thread(self._append, batch)
+            self.frames += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Recording write of {len(batch)} frames failed: {e}")
+
+    def _trailing_delay(self) -> Optional[float]:
+        """Seconds until the held-back frame is due, None if there is none"""
+        if self.pending is None:
+            return None
+        due = (self.last_ms + self.min_interval * 1000) / 1000
+        return max(0.0, due - (time.monotonic() - self.started))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._trailing_delay())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self.pending is not None and (self._closed or self._trailing_delay() == 0):
+                (ms, jpeg), self.pending = self.pending, None
+                self._queue(ms, jpeg)
+            await self._flush()
+            if self._closed:
+                return
+
+    async def close(self):
+        if self._closed:
+            return
+        # Let the writer drain what is queued; cancelling it mid-write would leave the thread running
+        self._closed = True
+        self._wakeup.set()
+        await self._task
+        try:
+            await asyncio.to_thread(self._write_meta)
+        except Exception as e:
+            logger.warning(f"Could not write recording metadata: {e}")
+
+
+class RecordingReader:
+    """Random access to a (possibly still growing) recording"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "index.bin"), "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size  # Ignore a half-written trailing entry
+        self.entries = [INDEX_ENTRY.unpack_from(data, i) for i in range(0, usable, INDEX_ENTRY.size)]
+        self.times = [entry[0] for entry in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.times[-1] if self.times else 0
+
+    def position(self, ms: int) -> int:
+        """Index of the frame on screen at `ms`: the last one at or before it"""
+        return max(0, bisect.bisect_right(self.times, ms) - 1)
+
+    def frames(self, start: int = 0):
+        """(ms, jpeg) from frame index `start` on, reading each segment file once"""
+        handles = {}
+        try:
+            for ms, segment, offset, length in self.entries[start:]:
+                handle = handles.get(segment)
+                if handle is None:
+                    handle = handles[segment] = open(os.path.join(self.directory, _segment_name(segment)), "rb")
+                handle.seek(offset)
+                yield ms, handle.read(length)
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+
+class Recorder:
+    def __init__(self, root: str = RECORDING_DIR):
+        self.root = root
+        self.active = {}
+
+    def directory(self, agent_id: str) -> Optional[str]:
+        """Recording directory for an agent id, None for ids that aren't safe path components"""
+        if not RECORDING_ID.match(agent_id or ""):
+            return None
+        return os.path.join(self.root, agent_id)
+
+    def open(self, agent_id: str) -> Recording:
+        directory = self.directory(agent_id)
+        if directory is None:
+            raise ValueError(f"Invalid agent id for a recording: {agent_id!r}")
+        recording = Recording(directory)
+        self.active[agent_id] = recording
+        return recording
+
+    async def close(self, agent_id: str):
+        recording = self.active.pop(agent_id, None)
+        if recording:
+            await recording.close()
+
+    def reader(self, agent_id: str) -> Optional[RecordingReader]:
+        directory = self.directory(agent_id)
+        if directory is None or not os.path.exists(os.path.join(directory, "index.bin")):
+            return None
+        return RecordingReader(directory)
+
+    def info(self, agent_id: str) -> Optional[dict]:
+        reader = self.reader(agent_id)
+        if reader is None:
+            return None
+        meta = {}
+        try:
+            with open(os.path.join(reader.directory, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass  # Still recording, or the agent died before close()
+        return {**meta, "frames": len(reader), "duration_ms": reader.duration_ms,
+                "recording": agent_id in self.active}
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.active),
+            "queued_frames": sum(len(r.buffer) for r in self.active.values()),
+            "throttled": sum(r.throttled for r in self.active.values()),
+            "dropped": sum(r.dropped for r in self.active.values()),
+        }
+
+
+recorder = Recorder()
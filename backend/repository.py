@@ -1,11 +1,70 @@
+import base64
+import json
+import os
+import time
+from typing import Optional
+
 from database import db
 from models import AgentSchema, LogSchema
 from datetime import datetime
 
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "5"))
+
+def encode_cursor(sort_value: datetime, doc_id: str) -> str:
+    """Opaque keyset cursor: the (sort key, id) of the last document returned"""
+    raw = json.dumps({"t": sort_value.isoformat(), "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(raw["t"]), raw["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def keyset_query(query: dict, sort_field: str, cursor: str = None) -> dict:
+    """Documents strictly after the cursor in (sort_field desc, id desc) order"""
+    if not cursor:
+        return query
+    sort_value, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "id": {"$lt": doc_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+def projection_for(fields=None, exclude=None, required=("id",)):
+    """Mongo projection from a list of wanted fields, or fields to leave out"""
+    if fields:
+        projection = {field: 1 for field in list(fields) + list(required)}
+    else:
+        projection = {field: 0 for field in exclude or []}
+    projection["_id"] = 0
+    return projection
+
+async def fetch_page(collection, query: dict, sort_field: str, limit: int, projection: dict):
+    """One keyset page; returns (documents, next cursor or None)"""
+    cursor = collection.find(query, projection).sort([(sort_field, -1), ("id", -1)]).limit(limit + 1)
+    documents = [document async for document in cursor]
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last[sort_field], last["id"])
+    return documents, next_cursor
+
 class AgentRepository:
+    def __init__(self):
+        self._stats_cache = None
+        self._stats_cached_at = 0.0
+
+    def invalidate_stats_cache(self):
+        self._stats_cache = None
+
     async def create_agent(self, agent: AgentSchema):
         agent_dict = agent.dict()
         await db.db.agents.insert_one(agent_dict)
+        self.invalidate_stats_cache()
         return agent
 
     async def get_all_agents(self):
@@ -18,6 +77,18 @@ class AgentRepository:
             agents.append(document)
         return agents
 
+    async def list_agents(self, cursor: str = None, limit: int = 100, fields=None):
+        """Newest first, keyset-paginated on (created_at, id)"""
+        projection = projection_for(fields, required=("id", "created_at"))
+        return await fetch_page(db.db.agents, keyset_query({}, "created_at", cursor), "created_at", limit, projection)
+
+    async def iter_agents(self, cursor: str = None, fields=None):
+        """Stream every agent after the cursor without building a list"""
+        projection = projection_for(fields, required=("id", "created_at"))
+        query = keyset_query({}, "created_at", cursor)
+        async for document in db.db.agents.find(query, projection).sort([("created_at", -1), ("id", -1)]):
+            yield document
+
     async def get_agent(self, agent_id: str):
         document = await db.db.agents.find_one({"id": agent_id})
         if document:
@@ -26,11 +97,45 @@ class AgentRepository:
                 del document["_id"]
         return document
 
-    async def update_status(self, agent_id: str, status: str):
-        await db.db.agents.update_one(
-            {"id": agent_id},
-            {"$set": {"status": status, "last_run": datetime.utcnow()}}
-        )
+    async def update_status(self, agent_id: str, status: str, stop_reason: Optional[str] = None):
+        fields = {"status": status, "last_run": datetime.utcnow()}
+        if stop_reason:
+            fields["stop_reason"] = stop_reason
+        await db.db.agents.update_one({"id": agent_id}, {"$set": fields})
+        self.invalidate_stats_cache()
+
+    async def get_dashboard_stats(self):
+        """Agent counts and page totals computed by MongoDB, cached for DASHBOARD_CACHE_TTL seconds"""
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cached_at < DASHBOARD_CACHE_TTL:
+            return dict(self._stats_cache)
+
+        pipeline = [
+            {"$project": {"_id": 0, "status": 1, "stats.pages_explored": 1}},
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "pages_explored": {"$sum": "$stats.pages_explored"},
+            }},
+        ]
+        from pymongo.errors import OperationFailure
+        try:
+            # Covered by the status_pages index: no agent documents are fetched
+            cursor = db.db.agents.aggregate(pipeline, hint="status_pages")
+            groups = [g async for g in cursor]
+        except OperationFailure:
+            # Index not built (yet); same result from a collection scan
+            groups = [g async for g in db.db.agents.aggregate(pipeline)]
+
+        by_status = {g["_id"]: g for g in groups}
+        stats = {
+            "total_agents": sum(g["count"] for g in groups),
+            "active_agents": by_status.get("RUNNING", {}).get("count", 0),
+            "pages_explored": sum(g["pages_explored"] for g in groups),
+        }
+        self._stats_cache = stats
+        self._stats_cached_at = now
+        return dict(stats)
 
     async def increment_stats(self, agent_id: str, pages_explored: int = 0, issues_found: int = 0):
         await db.db.agents.update_one(
@@ -38,12 +143,25 @@ class AgentRepository:
             {"$inc": {"stats.pages_explored": pages_explored, "stats.issues_found": issues_found}}
         )
 
+    async def apply_updates(self, updates: dict):
+        """Write {agent_id: update document} in a single unordered bulk_write"""
+        from pymongo import UpdateOne
+        ops = [UpdateOne({"id": agent_id}, update) for agent_id, update in updates.items()]
+        if ops:
+            await db.db.agents.bulk_write(ops, ordered=False)
+            # The cached totals don't include what was pending until now
+            self.invalidate_stats_cache()
+
 class LogRepository:
     async def create_log(self, log: LogSchema):
         log_dict = log.dict()
         await db.db.logs.insert_one(log_dict)
         return log
 
+    async def create_logs(self, logs: list):
+        # Unordered so one bad document doesn't abort the rest of the batch
+        await db.db.logs.insert_many([log.dict() for log in logs], ordered=False)
+
     async def get_logs(self, agent_id: str = None, limit: int = 100):
         query = {}
         if agent_id:
@@ -58,5 +176,47 @@ class LogRepository:
             logs.append(document)
         return logs
 
+    async def list_logs(self, agent_id: str = None, cursor: str = None, limit: int = 50,
+                        include_detail: bool = False, fields=None):
+        """Newest first, keyset-paginated on (timestamp, id); detail/data are left in the DB unless asked for"""
+        query = {"agent_id": agent_id} if agent_id else {}
+        exclude = [] if include_detail else ["detail", "data"]
+        projection = projection_for(fields, exclude=exclude, required=("id", "timestamp"))
+        return await fetch_page(db.db.logs, keyset_query(query, "timestamp", cursor), "timestamp", limit, projection)
+
+    async def iter_logs(self, agent_id: str = None, cursor: str = None, include_detail: bool = False, fields=None):
+        query = keyset_query({"agent_id": agent_id} if agent_id else {}, "timestamp", cursor)
+        exclude = [] if include_detail else ["detail", "data"]
+        projection = projection_for(fields, exclude=exclude, required=("id", "timestamp"))
+        async for document in db.db.logs.find(query, projection).sort([("timestamp", -1), ("id", -1)]):
+            yield document
+
+class CrawlStateRepository:
+    """Per-site crawl state, one document per URL: {site, url, visited, depth, text, hash, simhash}"""
+
+    async def load(self, site: str):
+        async for document in db.db.crawl_urls.find({"site": site}, {"_id": 0, "site": 0}):
+            yield document
+
+    async def save(self, site: str, entries: list):
+        from pymongo import UpdateOne
+        now = datetime.utcnow()
+        ops = []
+        for entry in entries:
+            fields = {k: v for k, v in entry.items() if k not in ("url", "visited", "depth")}
+            update = {"$set": {**fields, "updated_at": now}, "$min": {"depth": entry.get("depth", 0)}}
+            if entry.get("visited"):
+                update["$set"]["visited"] = True
+            else:
+                # Another agent may have visited it meanwhile; queued never overwrites visited
+                update["$setOnInsert"] = {"visited": False}
+            ops.append(UpdateOne({"site": site, "url": entry["url"]}, update, upsert=True))
+        if ops:
+            await db.db.crawl_urls.bulk_write(ops, ordered=False)
+
+    async def clear(self, site: str):
+        await db.db.crawl_urls.delete_many({"site": site})
+
 agent_repo = AgentRepository()
 log_repo = LogRepository()
+crawl_state_repo = CrawlStateRepository()
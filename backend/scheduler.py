@@ -0,0 +1,218 @@
+import asyncio
+import itertools
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger("Scheduler")
+
+MAX_CONCURRENT_AGENTS = int(os.getenv("MAX_CONCURRENT_AGENTS", "4"))
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1") != "0"
+
+
+class BrowserPool:
+    """Keeps a set of warm Chromium browsers and hands out isolated contexts"""
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, headless: bool = BROWSER_HEADLESS):
+        self.size = max(1, size)
+        self.headless = headless
+        self.playwright = None
+        self.browsers = []
+        self.context_counts: Dict[int, int] = {}  # id(browser) -> open contexts
+        self._launching = 0
+        self._prewarm_launch = None  # Pre-warm launch in flight, if any
+        self._lock = asyncio.Lock()
+
+    async def _ensure_driver(self):
+        if self.playwright is None:
+            # Imported here: Playwright is only needed once a browser is actually wanted
+            from playwright.async_api import async_playwright
+            self.playwright = await async_playwright().start()
+
+    async def _launch(self):
+        self._launching += 1
+        try:
+            browser = await self.playwright.chromium.launch(headless=self.headless)
+        finally:
+            self._launching -= 1
+        self.context_counts[id(browser)] = 0
+        self.browsers.append(browser)
+        logger.info(f"Launched pooled browser ({len(self.browsers)}/{self.size})")
+        return browser
+
+    async def _pick_browser(self):
+        """Least-loaded connected browser, launching new ones up to the pool size"""
+        await self._ensure_driver()
+
+        # Drop browsers that crashed or were closed underneath us
+        for browser in [b for b in self.browsers if not b.is_connected()]:
+            self.browsers.remove(browser)
+            self.context_counts.pop(id(browser), None)
+
+        idle = [b for b in self.browsers if self.context_counts[id(b)] == 0]
+        if not idle and self._prewarm_launch is not None:
+            # Take the browser the pre-warm is launching rather than starting another one
+            await asyncio.wait([self._prewarm_launch])
+            idle = [b for b in self.browsers if self.context_counts[id(b)] == 0]
+        if not idle and len(self.browsers) + self._launching < self.size:
+            return await self._launch()
+        return min(self.browsers, key=lambda b: self.context_counts[id(b)])
+
+    async def new_context(self, **context_options):
+        async with self._lock:
+            browser = await self._pick_browser()
+            self.context_counts[id(browser)] += 1
+        try:
+            return await browser.new_context(**context_options)
+        except Exception:
+            self.context_counts[id(browser)] -= 1
+            raise
+
+    async def release(self, context):
+        browser = context.browser
+        try:
+            await context.close()
+        finally:
+            if browser is not None and id(browser) in self.context_counts:
+                self.context_counts[id(browser)] -= 1
+
+    async def prewarm(self, count: int) -> int:
+        """Start the driver and launch up to `count` idle browsers ahead of the first agent"""
+        target = min(count, self.size)
+        async with self._lock:
+            await self._ensure_driver()
+        # Launches happen outside the lock, so agents get browsers that are already up right away;
+        # one that finds none idle waits for the launch in flight (see _pick_browser)
+        while len(self.browsers) + self._launching < target:
+            self._prewarm_launch = asyncio.ensure_future(self._launch())
+            try:
+                await self._prewarm_launch
+            finally:
+                self._prewarm_launch = None
+        return len(self.browsers)
+
+    def stats(self) -> dict:
+        return {
+            "browsers": len(self.browsers),
+            "contexts": sum(self.context_counts.values()),
+            "pool_size": self.size,
+        }
+
+    async def close(self):
+        for browser in self.browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"Error closing pooled browser: {e}")
+        self.browsers = []
+        self.context_counts = {}
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+
+class AgentJob:
+    def __init__(self, agent_id: str, url: str, autonomy_level: str, priority: int = 0, options: Optional[dict] = None):
+        self.agent_id = agent_id
+        self.url = url
+        self.autonomy_level = autonomy_level
+        self.priority = priority
+        self.options = options or {}
+        self.cancelled = False
+        self.seq = 0  # set by AgentScheduler.submit
+
+
+class AgentScheduler:
+    """Priority queue of agent jobs drained by a fixed number of worker tasks.
+
+    Lower ``priority`` values run first; jobs with equal priority run FIFO.
+    """
+
+    def __init__(self, pool: BrowserPool, max_concurrent: int = MAX_CONCURRENT_AGENTS):
+        self.pool = pool
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.queued: Dict[str, AgentJob] = {}
+        self.jobs: Dict[str, AgentJob] = {}  # dequeued jobs, running or starting
+        self.active: Dict[str, object] = {}  # agent_id -> AgentService
+        self.runner: Optional[Callable[[AgentJob], Awaitable[None]]] = None
+        self.workers = []
+        self._seq = itertools.count()
+
+    def start(self, runner: Callable[[AgentJob], Awaitable[None]]):
+        self.runner = runner
+        for i in range(self.max_concurrent):
+            self.workers.append(asyncio.create_task(self._worker(i)))
+
+    async def shutdown(self):
+        self.stop_all()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        await self.pool.close()
+
+    def submit(self, job: AgentJob) -> int:
+        """Queue a job and return its position in the queue"""
+        job.seq = next(self._seq)
+        self.queued[job.agent_id] = job
+        self.queue.put_nowait((job.priority, job.seq, job))
+        # Jobs that run before this one, in the queue's own priority/FIFO order
+        return 1 + sum((queued.priority, queued.seq) < (job.priority, job.seq) for queued in self.queued.values())
+
+    def attach(self, agent_id: str, service):
+        """Called by the runner once the agent's browser is up, so it can be stopped"""
+        self.active[agent_id] = service
+        job = self.jobs.get(agent_id)
+        if job and job.cancelled:
+            # Stop arrived between dequeue and browser start
+            service.is_running = False
+
+    def stop(self, agent_id: str) -> bool:
+        job = self.queued.pop(agent_id, None) or self.jobs.get(agent_id)
+        if not job:
+            return False
+        job.cancelled = True
+        service = self.active.get(agent_id)
+        if service:
+            service.is_running = False
+        return True
+
+    def stop_all(self) -> list:
+        """Stop everything; returns the ids of jobs cancelled before they ran"""
+        cancelled = list(self.queued)
+        for agent_id in cancelled + list(self.jobs):
+            self.stop(agent_id)
+        return cancelled
+
+    def is_queued(self, agent_id: str) -> bool:
+        return agent_id in self.queued
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self.queued),
+            "running": len(self.jobs),
+            "max_concurrent": self.max_concurrent,
+            **self.pool.stats(),
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                if job.cancelled:
+                    continue
+                self.queued.pop(job.agent_id, None)
+                self.jobs[job.agent_id] = job
+                await self.runner(job)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed running agent {job.agent_id}: {e}")
+            finally:
+                self.jobs.pop(job.agent_id, None)
+                self.active.pop(job.agent_id, None)
+                self.queue.task_done()
+
+
+browser_pool = BrowserPool()
+scheduler = AgentScheduler(browser_pool)
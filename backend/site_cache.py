@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger("SiteCache")
+
+SITE_CACHE = os.getenv("SITE_CACHE", "0") == "1"  # Default for agents started without `site_cache`
+SITE_CACHE_DIR = os.getenv("SITE_CACHE_DIR", "site_cache")
+SITE_CACHE_MAX_AGE_HOURS = float(os.getenv("SITE_CACHE_MAX_AGE_HOURS", "24"))
+SITE_CACHE_MAX_MB = int(os.getenv("SITE_CACHE_MAX_MB", "512"))
+SITE_CACHE_MAX_ENTRY_MB = 5
+SITE_CACHE_PRUNE_INTERVAL = 3600
+
+# Versioned static assets are what makes a warm start cheap; documents and XHR stay live
+CACHEABLE_TYPES = {"stylesheet", "script", "image", "font"}
+# Hop-by-hop or rewritten on the way back; Playwright recomputes what it needs
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+# Added to responses served from disk, so byte counters can tell them from downloads
+CACHE_HIT_HEADER = "x-site-cache"
+
+
+def origin_of(url: str) -> Optional[str]:
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.hostname.lower()}:{port}"
+
+
+def _replace(path: str, *chunks: bytes):
+    """Write a file through a temp file of its own, so concurrent writers (agents of one process write
+    from threads) never share one: the last writer wins and readers never see half a file"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _origin_dir(origin: str) -> str:
+    """Readable but path-safe directory name for an origin"""
+    scheme, rest = origin.split("://", 1)
+    digest = hashlib.sha1(origin.encode()).hexdigest()[:8]
+    return f"{scheme}_{rest.replace(':', '_')}-{digest}"
+
+
+class SiteCache:
+    """Per-origin warm-start data shared by every agent crawling the same site.
+
+    Two things are kept under <root>/<origin>/: the Playwright storage state
+    (cookies and localStorage, so consent banners and sessions carry over)
+    and a disk cache of static responses, served through a context route so
+    it works with pooled, otherwise isolated contexts. Entries older than
+    max_age are ignored and pruned; the oldest go first when the cache
+    exceeds max_bytes.
+    """
+
+    def __init__(self, root: str = SITE_CACHE_DIR, max_age_hours: float = SITE_CACHE_MAX_AGE_HOURS,
+                 max_mb: int = SITE_CACHE_MAX_MB):
+        self.root = root
+        self.max_age = max_age_hours * 3600
+        self.max_bytes = max_mb * 2**20
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._task = None
+
+    def _path(self, origin: str, *parts: str) -> str:
+        return os.path.join(self.root, _origin_dir(origin), *parts)
+
+    def _fresh(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.max_age
+        except OSError:
+            return False
+
+    def storage_state(self, origin: str) -> Optional[str]:
+        """Path of a fresh storage state for the origin, to pass to new_context(storage_state=...)"""
+        path = self._path(origin, "storage_state.json")
+        return path if self._fresh(path) else None
+
+    async def load_storage_state(self, origin: str) -> Optional[dict]:
+        """The origin's fresh storage state, None if there is none; an unreadable file is deleted"""
+        path = self.storage_state(origin)
+        if path is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._read_json, path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable storage state for {origin}: {e}")
+            self.discard_storage_state(origin)
+            return None
+
+    def discard_storage_state(self, origin: str):
+        try:
+            os.remove(self._path(origin, "storage_state.json"))
+        except OSError:
+            pass
+
+    def is_warm(self, origin: str) -> bool:
+        return self.storage_state(origin) is not None or self._fresh(self._path(origin, "http"))
+
+    async def save_storage_state(self, context, origin: str):
+        state = await context.storage_state()
+        await asyncio.to_thread(self._write_json, self._path(origin, "storage_state.json"), state)
+
+    @staticmethod
+    def _read_json(path: str) -> dict:
+        with open(path) as f:
+            value = json.load(f)
+        if not isinstance(value, dict):
+            raise ValueError(f"expected an object, got {type(value).__name__}")
+        return value
+
+    @staticmethod
+    def _write_json(path: str, value):
+        _replace(path, json.dumps(value).encode())
+
+    async def attach(self, context, origin: str):
+        """Serve cacheable GETs from disk; register before other routes so those run first and fall back here"""
+        directory = self._path(origin, "http")
+
+        async def handle(route):
+            request = route.request
+            if request.method != "GET" or request.resource_type not in CACHEABLE_TYPES:
+                await route.fallback()
+                return
+            path = os.path.join(directory, hashlib.sha1(request.url.encode()).hexdigest())
+            cached = await asyncio.to_thread(self._read_entry, path)
+            if cached is not None:
+                self.hits += 1
+                meta, body = cached
+                await route.fulfill(status=meta["status"], headers={**meta["headers"], CACHE_HIT_HEADER: "hit"}, body=body)
+                return
+
+            self.misses += 1
+            try:
+                response = await route.fetch()
+                body = await response.body()
+            except Exception:
+                await route.fallback()
+                return
+            cache_control = response.headers.get("cache-control", "").lower()
+            if (response.status == 200 and "no-store" not in cache_control and "private" not in cache_control
+                    and len(body) <= SITE_CACHE_MAX_ENTRY_MB * 2**20):
+                headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+                try:
+                    await asyncio.to_thread(self._write_entry, path, {"status": 200, "headers": headers}, body)
+                    self.stored += 1
+                except OSError as e:
+                    logger.debug(f"Could not cache {request.url}: {e}")
+            await route.fulfill(response=response, body=body)
+
+        await context.route("**/*", handle)
+
+    def _read_entry(self, path: str):
+        if not self._fresh(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    @staticmethod
+    def _write_entry(path: str, meta: dict, body: bytes):
+        # One file per response: a JSON header line, then the body
+        _replace(path, json.dumps(meta).encode() + b"\n", body)
+
+    def prune(self) -> int:
+        """Drop expired files, then the oldest until under max_bytes; returns how many were removed"""
+        if not os.path.isdir(self.root):
+            return 0
+        now, removed, files = time.time(), 0, []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime >= self.max_age:
+                    removed += self._remove(path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        self.evicted += removed
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.prune)
+                if removed:
+                    logger.info(f"Evicted {removed} site cache files")
+            except Exception as e:
+                logger.warning(f"Site cache pruning failed: {e}")
+            await asyncio.sleep(SITE_CACHE_PRUNE_INTERVAL)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stored": self.stored,
+            "evicted": self.evicted,
+        }
+
+
+site_cache = SiteCache()
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger("Startup")
+
+# Idle browsers launched (with the Playwright driver and the analysis workers) in the background at
+# startup, so the first agent doesn't pay for them; 0 launches everything on demand
+PREWARM_BROWSERS = int(os.getenv("PREWARM_BROWSERS", "0"))
+
+
+class StartupTracker:
+    """Cold-start timings of this process, and the background pre-warm of browsers and analysis workers.
+
+    The pre-warm runs as a task, so the app starts serving right away; an
+    agent started meanwhile takes a browser that is already up, or waits
+    for the pre-warm launch in flight instead of launching one of its own.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ready_seconds = None  # Startup handler, until the app serves requests
+        self.prewarm_seconds = None
+        self.prewarmed_browsers = 0
+        self.first_agent_frame_seconds = None  # First agent of this process: its start to its first video frame
+        self._task = None
+
+    def begin(self):
+        self.started = time.monotonic()
+
+    def ready(self):
+        self.ready_seconds = time.monotonic() - self.started
+        logger.info(f"Ready in {self.ready_seconds:.2f}s")
+
+    def prewarm(self, browser_pool, analysis_pool, browsers: int = PREWARM_BROWSERS):
+        if browsers > 0 and self._task is None:
+            self._task = asyncio.create_task(self._prewarm(browser_pool, analysis_pool, browsers))
+
+    async def _prewarm(self, browser_pool, analysis_pool, browsers: int):
+        started = time.monotonic()
+        warmed, launched = await asyncio.gather(analysis_pool.warm(), browser_pool.prewarm(browsers),
+                                                return_exceptions=True)
+        if isinstance(warmed, Exception):
+            logger.warning(f"Could not start the analysis workers ahead of time: {warmed}")
+        if isinstance(launched, Exception):
+            logger.warning(f"Could not pre-launch browsers: {launched}")
+        else:
+            self.prewarmed_browsers = launched
+        self.prewarm_seconds = time.monotonic() - started
+        logger.info(f"Pre-warmed {self.prewarmed_browsers} browsers in {self.prewarm_seconds:.2f}s")
+
+    def record_first_frame(self, seconds: float):
+        if self.first_agent_frame_seconds is None:
+            self.first_agent_frame_seconds = seconds
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "ready_seconds": self.ready_seconds,
+            "prewarm_seconds": self.prewarm_seconds,
+            "prewarmed_browsers": self.prewarmed_browsers,
+            "first_agent_frame_seconds": self.first_agent_frame_seconds,
+        }
+
+
+startup = StartupTracker()
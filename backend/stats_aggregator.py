@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from metrics import DB_WRITE_SECONDS
+from repository import agent_repo
+
+logger = logging.getLogger("StatsAggregator")
+
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "2.0"))
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+
+
+class StatsAggregator:
+    """Accumulates per-agent counters and status changes in memory.
+
+    Pending changes are written with a single bulk_write every
+    STATS_FLUSH_INTERVAL seconds, and immediately when an agent reaches a
+    terminal status. Reads overlay the pending values on the stored
+    document so the API always shows live numbers.
+    """
+
+    def __init__(self, interval: float = STATS_FLUSH_INTERVAL):
+        self.interval = interval
+        self.counters: Dict[str, Dict[str, int]] = {}  # agent_id -> unflushed increments
+        self.statuses: Dict[str, dict] = {}  # agent_id -> unflushed {"status", "last_run"}
+        self.status_before: Dict[str, str] = {}  # agent_id -> status in the DB when its unflushed changes began
+        self.stored_status: Dict[str, str] = {}  # agent_id -> status last written, for agents not yet terminal
+        self.live_status: Dict[str, str] = {}  # agent_id -> status, for agents not yet terminal
+        self.bulk_writes = 0
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def increment(self, agent_id: str, **counters: int):
+        pending = self.counters.setdefault(agent_id, {})
+        for name, value in counters.items():
+            pending[name] = pending.get(name, 0) + value
+
+    def set_status(self, agent_id: str, status: str, **fields):
+        """fields: extra top-level agent fields written with the status, e.g. stop_reason"""
+        # Agents are created QUEUED; only the first and last status of a burst of changes matter
+        self.status_before.setdefault(agent_id, self.stored_status.get(agent_id, "QUEUED"))
+        self.statuses[agent_id] = {"status": status, "last_run": datetime.utcnow(), **fields}
+        if status in TERMINAL_STATUSES:
+            self.live_status.pop(agent_id, None)
+        else:
+            self.live_status[agent_id] = status
+
+    async def finish(self, agent_id: str, status: str, **fields):
+        """Record a terminal status and write everything pending for the agent now"""
+        self.set_status(agent_id, status, **fields)
+        await self.flush([agent_id])
+
+    async def flush(self, agent_ids: Optional[list] = None):
+        async with self._flush_lock:
+            ids = (set(self.counters) | set(self.statuses)) if agent_ids is None else set(agent_ids)
+            updates = {}
+            taken = {}
+            for agent_id in ids:
+                counters = self.counters.pop(agent_id, None)
+                status = self.statuses.pop(agent_id, None)
+                before = self.status_before.pop(agent_id, None)
+                update = {}
+                if counters:
+                    update["$inc"] = {f"stats.{name}": value for name, value in counters.items()}
+                if status:
+                    update["$set"] = status
+                if update:
+                    updates[agent_id] = update
+                    taken[agent_id] = (counters, status, before)
+            if not updates:
+                return
+
+            try:
+                with DB_WRITE_SECONDS.time(collection="agents"):
+                    await agent_repo.apply_updates(updates)
+                self.bulk_writes += 1
+                for agent_id, (_, status, _) in taken.items():
+                    if not status:
+                        continue
+                    if status["status"] in TERMINAL_STATUSES:
+                        self.stored_status.pop(agent_id, None)
+                    else:
+                        self.stored_status[agent_id] = status["status"]
+            except Exception as e:
+                logger.warning(f"Stats flush for {len(updates)} agents failed: {e}")
+                # Merge back so nothing is lost; newer statuses win over the failed ones
+                for agent_id, (counters, status, before) in taken.items():
+                    if counters:
+                        self.increment(agent_id, **counters)
+                    if status and agent_id not in self.statuses:
+                        self.statuses[agent_id] = status
+                    if before is not None:
+                        # The DB still holds what it held before the failed write
+                        self.status_before[agent_id] = before
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def overlay(self, agent: Optional[dict]) -> Optional[dict]:
+        """Apply unflushed counters and status to an agent document from the database"""
+        if not agent:
+            return agent
+        agent_id = agent.get("id")
+        status = self.statuses.get(agent_id)
+        if status:
+            agent.update(status)
+        counters = self.counters.get(agent_id)
+        if counters:
+            stats = dict(agent.get("stats") or {})
+            for name, value in counters.items():
+                stats[name] = stats.get(name, 0) + value
+            agent["stats"] = stats
+        return agent
+
+    def pending_totals(self) -> dict:
+        """Unflushed changes to dashboard totals: extra running agents and pages"""
+        running = 0
+        for agent_id, status in self.statuses.items():
+            # The DB still reads the status from before the unflushed changes; QUEUED -> RUNNING -> COMPLETED nets 0
+            running += (status["status"] == "RUNNING") - (self.status_before.get(agent_id, "QUEUED") == "RUNNING")
+        return {
+            "active_agents": running,
+            "pages_explored": sum(c.get("pages_explored", 0) for c in self.counters.values()),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "agents_pending": len(set(self.counters) | set(self.statuses)),
+            "live_agents": len(self.live_status),
+            "bulk_writes": self.bulk_writes,
+        }
+
+
+stats_aggregator = StatsAggregator()
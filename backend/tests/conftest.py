@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Modules are imported the way the app and the benchmarks import them: from the backend directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """database.db pointed at the in-memory MongoDB stand-in the benchmarks use"""
+    import database
+    from benchmarks.memory_mongo import MemoryDatabase
+    memory = MemoryDatabase()
+    monkeypatch.setattr(database.db, "db", memory)
+    return memory
@@ -0,0 +1,55 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import analysis_pool as pool_module
+from analysis_pool import AnalysisPool
+
+
+class FakeExecutor(Executor):
+    """Holds submitted parses until the test completes or breaks them"""
+    created = []
+
+    def __init__(self, **options):
+        self.futures = []
+        self.shut_down = False
+        FakeExecutor.created.append(self)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, **kwargs):
+        self.shut_down = True
+
+
+def test_a_broken_pool_fails_its_pages_and_is_replaced_once(monkeypatch):
+    FakeExecutor.created = []
+    monkeypatch.setattr(pool_module, "ProcessPoolExecutor", FakeExecutor)
+    inline = []
+    monkeypatch.setattr(pool_module, "extract_elements", lambda *args: inline.append(args))
+    pool = AnalysisPool(workers=2)
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.extract("<html>huge</html>"))
+        second = asyncio.ensure_future(pool.extract("<html>other</html>"))
+        await asyncio.sleep(0)
+        broken = FakeExecutor.created[0]
+        broken.futures[0].set_exception(BrokenProcessPool())
+        results = [await first]
+        # A page submitted after the first failure goes to a fresh pool
+        third = asyncio.ensure_future(pool.extract("<html>next</html>"))
+        await asyncio.sleep(0)
+        broken.futures[1].set_exception(BrokenProcessPool())
+        results.append(await second)
+        FakeExecutor.created[1].futures[0].set_result({"title": "next"})
+        results.append(await third)
+        return broken, results
+
+    broken, results = asyncio.run(scenario())
+    assert results == [None, None, {"title": "next"}]
+    assert inline == []  # Never parsed in this process
+    assert broken.shut_down
+    assert len(FakeExecutor.created) == 2 and pool._executor is FakeExecutor.created[1]
+    assert pool.stats()["restarts"] == 1 and pool.stats()["failed"] == 2
@@ -0,0 +1,58 @@
+import budget as budget_module
+from budget import Budget
+
+
+def test_max_pages_counts_reserved_steps():
+    budget = Budget(max_pages=2, max_seconds=0, max_bytes=0, novelty_window=0)
+    budget.take_step()
+    assert budget.exhausted() is None
+    budget.take_step()
+    assert budget.exhausted() == "max_pages"
+    budget.refund_step()
+    assert budget.exhausted() is None
+
+
+def test_zero_disables_a_limit():
+    budget = Budget(max_pages=0, max_seconds=0, max_bytes=0, novelty_window=0)
+    for _ in range(1000):
+        budget.take_step()
+    assert budget.exhausted() is None
+    assert budget.describe() == "no page limit"
+
+
+def test_max_seconds(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(budget_module.time, "monotonic", lambda: now[0])
+    budget = Budget(max_pages=0, max_seconds=30, max_bytes=0, novelty_window=0)
+    now[0] += 29
+    assert budget.exhausted() is None
+    now[0] += 1
+    assert budget.exhausted() == "max_seconds"
+
+
+def test_max_bytes_reads_the_probe():
+    downloaded = [0]
+    budget = Budget(max_pages=0, max_seconds=0, max_bytes=1000, novelty_window=0,
+                    bytes_probe=lambda: downloaded[0])
+    downloaded[0] = 999
+    assert budget.exhausted() is None
+    downloaded[0] = 1000
+    assert budget.exhausted() == "max_bytes"
+    assert budget.stats()["bytes"] == 1000
+
+
+def test_novelty_window():
+    budget = Budget(max_pages=0, max_seconds=0, max_bytes=0, novelty_window=3, novelty_min_new=2)
+    for new_urls in (5, 0, 0):
+        budget.record_page(new_urls)
+        assert budget.exhausted() is None  # The window still holds the page with 5 new URLs
+    budget.record_page(1)
+    assert budget.exhausted() == "novelty"
+    assert budget.stop_reason == "novelty"
+
+
+def test_first_exhausted_limit_wins():
+    budget = Budget(max_pages=1, max_seconds=0, max_bytes=10, novelty_window=0, bytes_probe=lambda: 50)
+    budget.take_step()
+    assert budget.exhausted() == "max_pages"
+    assert budget.describe() == "1 pages, 10 bytes"
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from event_relay import EVENT_COLLECTION, EventRelay
+
+
+class Manager:
+    def __init__(self):
+        self.messages = []
+
+    async def broadcast(self, message):
+        self.messages.append(message)
+
+
+def event(publisher: str, seq: int) -> dict:
+    return {"publisher": publisher, "seq": seq, "kind": "event", "message": f"{publisher}:{seq}"}
+
+
+def test_only_quiet_publishers_without_events_left_are_forgotten(memory_db):
+    relay = EventRelay(Manager(), queue=None, prune_interval=60)
+
+    async def scenario():
+        for publisher in ("restarted", "quiet", "busy"):
+            await relay._deliver(event(publisher, 1))
+        # "quiet" still has an event in the capped collection, "restarted" has been overwritten
+        await memory_db[EVENT_COLLECTION].insert_one(event("quiet", 1))
+        long_ago = time.monotonic() - 120
+        relay._last_seen["restarted"] = relay._last_seen["quiet"] = long_ago
+        return await relay._prune_publishers()
+
+    assert asyncio.run(scenario())
+    assert set(relay._relayed_seq) == {"quiet", "busy"}
+    clauses = relay._resume_query()["$or"]
+    assert len(clauses) == 3
+    assert clauses[0]["publisher"] == {"$nin": ["quiet", "busy"]}
+
+
+def test_nothing_to_prune(memory_db):
+    relay = EventRelay(Manager(), queue=None, prune_interval=60)
+    assert not asyncio.run(relay._prune_publishers())
+    assert not relay._prune_due()
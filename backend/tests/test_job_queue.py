@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from job_queue import JobQueue, merge_viewers
+from scheduler import AgentJob
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def job(agent_id: str, priority: int = 0) -> AgentJob:
+    return AgentJob(agent_id=agent_id, url=f"https://example.com/{agent_id}", autonomy_level="passive",
+                    priority=priority, options={"tabs": 1})
+
+
+def expire_lease(memory_db, agent_id: str):
+    for document in memory_db.jobs.documents:
+        if document["id"] == agent_id:
+            document["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+
+
+def test_claim_order_is_priority_then_fifo(memory_db):
+    queue = JobQueue()
+
+    async def scenario():
+        positions = [await queue.enqueue(job("low", priority=5)), await queue.enqueue(job("first")),
+                     await queue.enqueue(job("second"))]
+        return positions, [(await queue.claim("w")).agent_id for _ in range(3)], await queue.claim("w")
+
+    positions, order, empty = run(scenario())
+    assert positions == [1, 1, 2]
+    assert order == ["first", "second", "low"]
+    assert empty is None
+
+
+def test_a_leased_job_is_not_claimed_twice(memory_db):
+    queue = JobQueue(lease_seconds=30)
+
+    async def scenario():
+        await queue.enqueue(job("a"))
+        return await queue.claim("w1"), await queue.claim("w2")
+
+    claimed, second = run(scenario())
+    assert claimed.agent_id == "a" and claimed.options == {"tabs": 1}
+    assert second is None
+
+
+def test_an_expired_lease_is_reclaimed_and_the_old_worker_loses_it(memory_db):
+    queue = JobQueue(lease_seconds=30, max_attempts=3)
+
+    async def scenario():
+        await queue.enqueue(job("a"))
+        await queue.claim("w1")
+        expire_lease(memory_db, "a")
+        reclaimed = await queue.claim("w2")
+        return reclaimed, await queue.heartbeat("a", "w1"), await queue.heartbeat("a", "w2")
+
+    reclaimed, old, new = run(scenario())
+    assert reclaimed.agent_id == "a"
+    assert memory_db.jobs.documents[0]["attempts"] == 2
+    assert old is None  # w1 must stop the agent
+    assert new is not None and new["stop_requested"] is False
+
+
+def test_a_job_that_keeps_losing_its_worker_fails(memory_db):
+    queue = JobQueue(lease_seconds=30, max_attempts=2)
+
+    async def scenario():
+        await queue.enqueue(job("a"))
+        for worker in ("w1", "w2"):
+            assert await queue.claim(worker) is not None
+            expire_lease(memory_db, "a")
+        return await queue.claim("w3"), await queue.fail_abandoned()
+
+    claimed, failed = run(scenario())
+    assert claimed is None
+    assert failed == ["a"]
+    assert memory_db.jobs.documents[0]["status"] == "failed"
+
+
+def test_stop_cancels_queued_jobs_and_flags_running_ones(memory_db):
+    queue = JobQueue()
+
+    async def scenario():
+        await queue.enqueue(job("queued"))
+        await queue.enqueue(job("running", priority=-1))
+        await queue.claim("w")
+        return (await queue.stop("queued"), await queue.stop("running"), await queue.stop("missing"),
+                await queue.heartbeat("running", "w"))
+
+    queued, running, missing, state = run(scenario())
+    assert (queued, running, missing) == ("queued", "running", None)
+    assert state["stop_requested"] is True
+
+
+def test_viewer_reports_of_several_api_instances_are_merged(memory_db):
+    queue = JobQueue()
+
+    async def scenario():
+        await queue.enqueue(job("a"))
+        await queue.claim("w")
+        await queue.publish_viewers({"a": {"viewers": 2, "pressure": 0.3}}, "api1")
+        await queue.publish_viewers({"a": {"viewers": 1, "pressure": 0.7}}, "api2")
+        return await queue.heartbeat("a", "w")
+
+    state = run(scenario())
+    assert merge_viewers(state) == {"viewers": 3, "pressure": 0.7}
+    # An instance that stopped reporting drops out
+    state["viewers"]["api2"]["at"] -= timedelta(minutes=5)
+    assert merge_viewers(state) == {"viewers": 2, "pressure": 0.3}
@@ -0,0 +1,65 @@
+from page_cache import PageCache, hamming
+
+PARSED = {"title": "T", "links": [], "buttons": [], "inputs": []}
+
+
+def fingerprint(simhash: int, digest: str = "h", tokens: int = 100) -> dict:
+    return {"hash": digest, "simhash": f"{simhash:016x}", "tokens": tokens}
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(2**64 - 1, 0) == 64
+
+
+def test_hit_needs_the_same_url_and_hash():
+    cache = PageCache(max_entries=10, near_distance=3)
+    cache.put("https://a.com/x", fingerprint(1, "h1"), PARSED)
+    assert cache.get("https://a.com/x", fingerprint(1, "h1")) == PARSED
+    assert cache.get("https://a.com/x", fingerprint(1, "h2")) is None
+    assert cache.get("https://a.com/y", fingerprint(1, "h1")) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_near_duplicate_within_the_distance():
+    base = 0x0123456789ABCDEF
+    cache = PageCache(max_entries=10, near_distance=3)
+    cache.put("https://a.com/product/1", fingerprint(base, "h1"), PARSED)
+    # Three bits apart, spread over different bands
+    near = base ^ (1 << 0) ^ (1 << 20) ^ (1 << 40)
+    assert cache.similar("https://a.com/product/2", fingerprint(near, "h2")) == "https://a.com/product/1"
+    # Four bits apart is past NEAR_DUPLICATE_DISTANCE
+    far = near ^ (1 << 60)
+    assert cache.similar("https://a.com/product/3", fingerprint(far, "h3")) is None
+
+
+def test_a_page_is_not_its_own_near_duplicate():
+    cache = PageCache(max_entries=10, near_distance=3)
+    cache.put("https://a.com/x", fingerprint(42, "h1"), PARSED)
+    assert cache.similar("https://a.com/x", fingerprint(42, "h2")) is None
+
+
+def test_eviction_removes_the_page_from_the_bands():
+    cache = PageCache(max_entries=1, near_distance=3)
+    cache.put("https://a.com/1", fingerprint(7, "h1"), PARSED)
+    cache.put("https://a.com/2", fingerprint(2**63, "h2"), PARSED)
+    assert cache.stats()["evictions"] == 1
+    assert cache.similar("https://a.com/3", fingerprint(7, "h3")) is None
+
+
+def test_near_duplicates_are_limited_to_the_same_site():
+    cache = PageCache(max_entries=10, near_distance=3)
+    cache.put("https://a.com/product/1", fingerprint(99, "h1"), PARSED)
+    assert cache.similar("https://b.com/product/1", fingerprint(99, "h2")) is None
+    assert cache.similar("http://a.com:8080/product/2", fingerprint(99, "h3")) is None
+    assert cache.similar("https://a.com/product/2", fingerprint(99, "h4")) == "https://a.com/product/1"
+
+
+def test_pages_with_too_few_words_are_not_compared():
+    cache = PageCache(max_entries=10, near_distance=3, min_tokens=20)
+    # Empty SPA shells all hash to 0
+    cache.put("https://a.com/app/1", fingerprint(0, "shell1", tokens=0), PARSED)
+    assert cache.similar("https://a.com/app/2", fingerprint(0, "shell2", tokens=0)) is None
+    assert cache.similar("https://a.com/app/3", fingerprint(0, "page", tokens=50)) is None
+    # Still cached for exact hits
+    assert cache.get("https://a.com/app/1", fingerprint(0, "shell1", tokens=0)) == PARSED
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import os
+
+from recorder import INDEX_ENTRY, Recording, RecordingReader
+
+
+async def record(directory: str, frames: list):
+    recording = Recording(directory, fps=0)
+    for jpeg in frames:
+        recording.write(jpeg)
+        await asyncio.sleep(0.01)
+    await recording.close()
+
+
+def test_frames_are_indexed_in_order(tmp_path):
+    asyncio.run(record(str(tmp_path), [b"a" * 10, b"b" * 12, b"b" * 12]))
+    reader = RecordingReader(str(tmp_path))
+    assert [jpeg for _, jpeg in reader.frames()] == [b"a" * 10, b"b" * 12]
+    with open(tmp_path / "meta.json") as f:
+        assert json.load(f)["duplicates"] == 1
+
+
+def test_reopening_continues_the_recording(tmp_path):
+    asyncio.run(record(str(tmp_path), [b"a" * 10, b"b" * 12]))
+    with open(tmp_path / "meta.json") as f:
+        first = json.load(f)
+    asyncio.run(record(str(tmp_path), [b"c" * 10, b"d" * 12]))
+    reader = RecordingReader(str(tmp_path))
+    assert [(segment, offset, length) for _, segment, offset, length in reader.entries] == \
+        [(0, 0, 10), (0, 10, 12), (0, 22, 10), (0, 32, 12)]
+    assert [jpeg for _, jpeg in reader.frames()] == [b"a" * 10, b"b" * 12, b"c" * 10, b"d" * 12]
+    assert reader.times == sorted(reader.times) and reader.times[2] > reader.times[1]
+    with open(tmp_path / "meta.json") as f:
+        meta = json.load(f)
+    assert meta["frames"] == 4 and meta["started_at"] == first["started_at"]
+    assert meta["duration_ms"] == reader.duration_ms
+
+
+def test_reopening_after_a_crash_drops_a_half_written_entry(tmp_path):
+    asyncio.run(record(str(tmp_path), [b"a" * 10]))
+    os.remove(tmp_path / "meta.json")
+    with open(tmp_path / "index.bin", "ab") as f:
+        f.write(b"\x00" * (INDEX_ENTRY.size // 2))
+    asyncio.run(record(str(tmp_path), [b"b" * 12]))
+    reader = RecordingReader(str(tmp_path))
+    assert [jpeg for _, jpeg in reader.frames()] == [b"a" * 10, b"b" * 12]
+    assert reader.times[1] > reader.times[0]
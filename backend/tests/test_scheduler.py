@@ -0,0 +1,16 @@
+from scheduler import AgentJob, AgentScheduler
+
+
+def test_queue_position_follows_priority():
+    scheduler = AgentScheduler(pool=None, max_concurrent=1)
+    assert scheduler.submit(AgentJob("a", "https://a.com", "passive")) == 1
+    assert scheduler.submit(AgentJob("b", "https://b.com", "passive")) == 2
+    assert scheduler.submit(AgentJob("urgent", "https://c.com", "passive", priority=-1)) == 1
+    assert scheduler.submit(AgentJob("later", "https://d.com", "passive", priority=5)) == 4
+
+
+def test_cancelled_jobs_no_longer_count():
+    scheduler = AgentScheduler(pool=None, max_concurrent=1)
+    scheduler.submit(AgentJob("a", "https://a.com", "passive"))
+    scheduler.stop("a")
+    assert scheduler.submit(AgentJob("b", "https://b.com", "passive")) == 1
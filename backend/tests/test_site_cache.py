@@ -0,0 +1,48 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from site_cache import SiteCache
+
+ORIGIN = "https://shop.example.com:443"
+
+
+class Context:
+    def __init__(self, state: dict):
+        self.state = state
+
+    async def storage_state(self):
+        return self.state
+
+
+def state(n: int) -> dict:
+    return {"cookies": [{"name": f"c{i}", "value": "x" * 1000} for i in range(n)], "origins": []}
+
+
+def test_concurrent_saves_never_interleave(tmp_path):
+    cache = SiteCache(root=str(tmp_path))
+    path = cache._path(ORIGIN, "storage_state.json")
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda n: cache._write_json(path, state(n)), [50, 200] * 20))
+    with open(path) as f:
+        assert len(json.load(f)["cookies"]) in (50, 200)
+    assert os.listdir(os.path.dirname(path)) == ["storage_state.json"]
+
+
+def test_state_round_trip(tmp_path):
+    cache = SiteCache(root=str(tmp_path))
+    asyncio.run(cache.save_storage_state(Context(state(2)), ORIGIN))
+    assert cache.is_warm(ORIGIN)
+    assert asyncio.run(cache.load_storage_state(ORIGIN)) == state(2)
+
+
+def test_an_unreadable_state_is_deleted(tmp_path):
+    cache = SiteCache(root=str(tmp_path))
+    path = cache._path(ORIGIN, "storage_state.json")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write('{"cookies": [{"name": "c0", "val')
+    assert asyncio.run(cache.load_storage_state(ORIGIN)) is None
+    assert not os.path.exists(path)
+    assert not cache.is_warm(ORIGIN)
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+import stats_aggregator as stats_module
+from stats_aggregator import StatsAggregator
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+
+    async def apply_updates(updates):
+        written.append(updates)
+    monkeypatch.setattr(stats_module.agent_repo, "apply_updates", apply_updates)
+    return written
+
+
+def test_unflushed_run_from_queued_to_completed_nets_out(writes):
+    aggregator = StatsAggregator()
+    aggregator.set_status("a", "RUNNING")
+    assert aggregator.pending_totals()["active_agents"] == 1
+    aggregator.set_status("a", "COMPLETED")
+    assert aggregator.pending_totals()["active_agents"] == 0
+
+
+def test_completion_of_a_flushed_running_agent(writes):
+    aggregator = StatsAggregator()
+    aggregator.set_status("a", "RUNNING")
+    asyncio.run(aggregator.flush())
+    assert aggregator.pending_totals()["active_agents"] == 0
+    aggregator.set_status("a", "COMPLETED")
+    assert aggregator.pending_totals()["active_agents"] == -1
+    asyncio.run(aggregator.flush())
+    assert aggregator.pending_totals()["active_agents"] == 0
+    assert writes[-1]["a"]["$set"]["status"] == "COMPLETED"
+
+
+def test_counters_are_coalesced_into_one_update(writes):
+    aggregator = StatsAggregator()
+    for _ in range(3):
+        aggregator.increment("a", pages_explored=1, wait_ms=10)
+    assert aggregator.pending_totals()["pages_explored"] == 3
+    asyncio.run(aggregator.flush())
+    assert writes == [{"a": {"$inc": {"stats.pages_explored": 3, "stats.wait_ms": 30}}}]
+    assert aggregator.pending_totals()["pages_explored"] == 0
+
+
+def test_a_failed_flush_keeps_the_pending_changes(monkeypatch):
+    async def fail(updates):
+        raise RuntimeError("mongo down")
+    monkeypatch.setattr(stats_module.agent_repo, "apply_updates", fail)
+    aggregator = StatsAggregator()
+    aggregator.set_status("a", "RUNNING")
+    aggregator.increment("a", pages_explored=2)
+    asyncio.run(aggregator.flush())
+    assert aggregator.pending_totals() == {"active_agents": 1, "pages_explored": 2}
@@ -0,0 +1,73 @@
+import os
+
+from url_store import BloomFilter, UrlSet, url_id
+
+
+def url(i: int) -> str:
+    return f"https://shop.example.com/product-{i}?ref=listing"
+
+
+def test_add_and_contains():
+    urls = UrlSet(buffer_size=8, spill_dir=None)
+    assert urls.add(url(1))
+    assert not urls.add(url(1))
+    assert url(1) in urls
+    assert url(2) not in urls
+    assert len(urls) == 1
+
+
+def test_segments_merge_and_keep_every_url():
+    urls = UrlSet(buffer_size=4, spill_dir=None)
+    for i in range(1000):
+        urls.add(url(i))
+    # Segments of similar size are merged, so there are only O(log n) of them
+    assert len(urls.segments) <= 10
+    assert all(url(i) in urls for i in range(1000))
+    assert not any(url(i) in urls for i in range(1000, 1200))
+    assert not any(urls.add(url(i)) for i in range(1000))
+    assert len(urls) == 1000
+
+
+def test_segments_are_sorted():
+    urls = UrlSet(buffer_size=16, spill_dir=None)
+    for i in range(500):
+        urls.add(url(i))
+    urls.flush()
+    for segment in urls.segments:
+        ids = list(segment.ids)
+        assert ids == sorted(ids)
+
+
+def test_spilled_segments_are_searched_through_the_bloom_filter(tmp_path):
+    urls = UrlSet(buffer_size=64, spill_dir=str(tmp_path), spill_mb=0.001)
+    for i in range(5000):
+        urls.add(url(i))
+    assert urls.spilled, "segments above spill_mb should be memory-mapped"
+    assert all(url(i) in urls for i in range(0, 5000, 7))
+    misses = sum(url(i) in urls for i in range(5000, 10000))
+    assert misses == 0
+    usage = urls.memory_usage()
+    assert usage["spilled_bytes"] > 0
+    assert usage["bloom_false_positive_rate"] < 0.05
+    # Spill files are unlinked as soon as they are mapped
+    assert os.listdir(tmp_path) == []
+    urls.close()
+    assert len(urls) == 0
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [url_id(url(i)) for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(url_id(url(i)) in bloom for i in range(1000, 11000))
+    assert false_positives < 300  # ~1% expected
+
+
+def test_memory_usage_is_about_eight_bytes_per_url():
+    urls = UrlSet(buffer_size=1024, spill_dir=None)
+    for i in range(50_000):
+        urls.add(url(i))
+    urls.flush()
+    assert urls.memory_usage()["bytes_per_url"] < 10
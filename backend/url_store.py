@@ -0,0 +1,234 @@
+import hashlib
+import heapq
+import logging
+import math
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+logger = logging.getLogger("UrlStore")
+
+# Recent ids kept in a plain set before being sorted into a compact segment
+URL_STORE_BUFFER = int(os.getenv("URL_STORE_BUFFER", "16384"))
+# False positive rate of the Bloom filter in front of spilled segments; positives are confirmed on disk
+URL_STORE_BLOOM_ERROR = float(os.getenv("URL_STORE_BLOOM_ERROR", "0.01"))
+# Segments bigger than URL_STORE_SPILL_MB go to memory-mapped files here; empty keeps everything in memory
+URL_STORE_SPILL_DIR = os.getenv("URL_STORE_SPILL_DIR", "")
+URL_STORE_SPILL_MB = float(os.getenv("URL_STORE_SPILL_MB", "64"))
+
+ID_BYTES = 8
+
+
+def url_id(url: str) -> int:
+    """64-bit id of a (normalized) URL; odds of any collision are ~n^2/2^65 (3e-8 at a million URLs)"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8", "surrogatepass"), digest_size=ID_BYTES).digest(), "little")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit ids (double hashing on the id's two halves)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key: int):
+        bits, size, low, high = self.bits, self.size, key & 0xFFFFFFFF, (key >> 32) | 1
+        for i in range(self.hashes):
+            position = (low + i * high) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        bits, size, low, high = self.bits, self.size, key & 0xFFFFFFFF, (key >> 32) | 1
+        for i in range(self.hashes):
+            position = (low + i * high) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False  # Most misses stop after one or two probes
+        return True
+
+
+class _Segment:
+    """Sorted, immutable run of ids: an array in memory or a memory-mapped file"""
+
+    __slots__ = ("ids", "_mmap")
+
+    def __init__(self, ids, mapped=None):
+        self.ids = ids
+        self._mmap = mapped
+
+    @property
+    def spilled(self) -> bool:
+        return self._mmap is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key: int) -> bool:
+        ids = self.ids
+        i = bisect_left(ids, key)
+        return i < len(ids) and ids[i] == key
+
+    def close(self):
+        if self._mmap is not None:
+            self.ids.release()
+            self._mmap.close()
+            self._mmap = None
+
+
+class UrlSet:
+    """Set of URLs kept as 64-bit ids: ~8 bytes per URL instead of ~150 for a set of strings.
+
+    New ids go to a small set; every URL_STORE_BUFFER of them are sorted
+    into an array segment, and segments of similar size are merged (so
+    there are O(log n) of them, each searched by bisection). With a spill
+    directory, merged segments above URL_STORE_SPILL_MB live in
+    memory-mapped files (unlinked right away, so nothing is left behind)
+    that the OS pages in and out; a scalable Bloom filter over every id
+    then keeps most misses from touching them. In memory a bisection costs
+    about as much as the filter's probes, so there is no filter there.
+    URLs can't be listed back, only tested.
+    """
+
+    def __init__(self, buffer_size: int = URL_STORE_BUFFER, error_rate: float = URL_STORE_BLOOM_ERROR,
+                 spill_dir: Optional[str] = URL_STORE_SPILL_DIR, spill_mb: float = URL_STORE_SPILL_MB):
+        self.buffer_size = max(1, buffer_size)
+        self.error_rate = error_rate
+        self.spill_dir = spill_dir or None
+        self.spill_bytes = int(spill_mb * 1024 * 1024)
+        self.buffer = set()
+        self.segments = []  # Oldest (largest) first
+        self.resident, self.spilled = [], []  # The same segments by location, newest first
+        self.blooms = [BloomFilter(self.buffer_size, error_rate)] if self.spill_dir else []
+        self.count = 0
+        self.bloom_checks = 0
+        self.bloom_positives = 0
+        self.bloom_false_positives = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, url: str) -> bool:
+        return self.contains_id(url_id(url))
+
+    def add(self, url: str) -> bool:
+        """Add a URL; False if it was already there"""
+        return self.add_id(url_id(url))
+
+    def update(self, urls):
+        for url in urls:
+            self.add(url)
+
+    def contains_id(self, key: int) -> bool:
+        if key in self.buffer:
+            return True
+        for segment in self.resident:
+            if key in segment:
+                return True
+        if not self.spilled:
+            return False
+        self.bloom_checks += 1
+        for bloom in self.blooms:
+            if key in bloom:
+                break
+        else:
+            return False
+        self.bloom_positives += 1
+        for segment in self.spilled:
+            if key in segment:
+                return True
+        self.bloom_false_positives += 1
+        return False
+
+    def add_id(self, key: int) -> bool:
+        if self.contains_id(key):
+            return False
+        self.buffer.add(key)
+        if self.blooms:
+            bloom = self.blooms[-1]
+            if bloom.count >= bloom.capacity:
+                # Scalable Bloom filter: each stage twice as big and twice as strict, total error stays < 2x
+                bloom = BloomFilter(bloom.capacity * 2, self.error_rate / 2 ** len(self.blooms))
+                self.blooms.append(bloom)
+            bloom.add(key)
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Sort the buffered ids into a segment and merge segments of similar size"""
+        if not self.buffer:
+            return
+        self.segments.append(_Segment(array("Q", sorted(self.buffer))))
+        self.buffer = set()
+        while len(self.segments) > 1 and len(self.segments[-2]) <= 2 * len(self.segments[-1]):
+            newer = self.segments.pop()
+            older = self.segments.pop()
+            self.segments.append(self._merge(older, newer))
+        self.resident = [segment for segment in reversed(self.segments) if not segment.spilled]
+        self.spilled = [segment for segment in reversed(self.segments) if segment.spilled]
+
+    def _merge(self, older: _Segment, newer: _Segment) -> _Segment:
+        # Streamed: the runs are never copied into lists, so a merge needs ~2x the ids' bytes, not ~5x
+        if self.spill_dir and (len(older) + len(newer)) * ID_BYTES > self.spill_bytes:
+            try:
+                merged = self._spill(heapq.merge(older.ids, newer.ids))
+            except OSError as e:
+                logger.warning(f"Could not spill URL ids to {self.spill_dir}, keeping them in memory: {e}")
+                merged = _Segment(array("Q", heapq.merge(older.ids, newer.ids)))
+        else:
+            merged = _Segment(array("Q", heapq.merge(older.ids, newer.ids)))
+        older.close()
+        newer.close()
+        return merged
+
+    def _spill(self, ids) -> _Segment:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="urls-", suffix=".ids", dir=self.spill_dir)
+        try:
+            with os.fdopen(fd, "w+b") as f:
+                chunk = array("Q")
+                for key in ids:
+                    chunk.append(key)
+                    if len(chunk) >= self.buffer_size:
+                        chunk.tofile(f)
+                        chunk = array("Q")
+                chunk.tofile(f)
+                f.flush()
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            os.unlink(path)  # The mapping keeps the data until close()
+        return _Segment(memoryview(mapped).cast("Q"), mapped)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments, self.resident, self.spilled = [], [], []
+        self.buffer = set()
+        self.count = 0
+
+    def memory_usage(self) -> dict:
+        # ids above 2**60 take 36 bytes as Python ints; set slots are ~2-4 pointers per entry
+        buffer_bytes = sys.getsizeof(self.buffer) + 36 * len(self.buffer)
+        segment_bytes = sum(len(s) * ID_BYTES for s in self.segments if not s.spilled)
+        spilled_bytes = sum(len(s) * ID_BYTES for s in self.segments if s.spilled)
+        bloom_bytes = sum(len(b.bits) for b in self.blooms)
+        negatives = self.bloom_checks - (self.bloom_positives - self.bloom_false_positives)
+        resident = buffer_bytes + segment_bytes + bloom_bytes
+        return {
+            "urls": self.count,
+            "segments": len(self.segments),
+            "buffer_bytes": buffer_bytes,
+            "segment_bytes": segment_bytes,
+            "spilled_bytes": spilled_bytes,
+            "bloom_bytes": bloom_bytes,
+            "bytes_per_url": round(resident / self.count, 2) if self.count else 0.0,
+            "bloom_false_positive_rate": round(self.bloom_false_positives / negatives, 4) if negatives else 0.0,
+        }
@@ -0,0 +1,164 @@
+"""Agent worker: claims jobs from the MongoDB queue and runs them in local browsers.
+
+Start the API with EXECUTION_MODE=worker, then any number of these on any
+machine that can reach the same MongoDB:
+
+    python worker.py                 # one worker, MAX_CONCURRENT_AGENTS agents at a time
+    python worker.py --processes 4   # four worker processes on this machine
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+from artifact_store import artifact_store
+from database import db
+from event_relay import EventPublisher, ensure_event_collection
+from job_queue import JOB_HEARTBEAT_INTERVAL, job_queue, merge_viewers
+from log_sink import log_sink
+from analysis_pool import analysis_pool
+from main import loop_monitor, run_agent_loop
+from repository import agent_repo
+from scheduler import AgentJob, scheduler
+from site_cache import site_cache
+from startup import startup
+from stats_aggregator import stats_aggregator
+
+logger = logging.getLogger("Worker")
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # Seconds between claims when the queue is empty
+
+
+class Worker:
+    def __init__(self, worker_id: str, queue=job_queue, runner=run_agent_loop):
+        self.worker_id = worker_id
+        self.queue = queue
+        self.runner = runner
+        self.publisher = EventPublisher()
+        self.claimed = 0
+        self._stopping = asyncio.Event()
+
+    def has_capacity(self) -> bool:
+        return len(scheduler.jobs) + len(scheduler.queued) < scheduler.max_concurrent
+
+    async def run(self):
+        scheduler.start(self._run_job)
+        self.publisher.start()
+        logger.info(f"Worker {self.worker_id} ready ({scheduler.max_concurrent} concurrent agents)")
+        while not self._stopping.is_set():
+            job = None
+            if self.has_capacity():
+                try:
+                    job = await self.queue.claim(self.worker_id)
+                    for agent_id in await self.queue.fail_abandoned():
+                        await agent_repo.update_status(agent_id, "FAILED", stop_reason="error")
+                except Exception as e:
+                    logger.warning(f"Could not claim a job: {e}")
+            if job:
+                self.claimed += 1
+                scheduler.submit(job)
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        await scheduler.shutdown()
+        await self.publisher.close()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _run_job(self, job: AgentJob):
+        heartbeat = asyncio.create_task(self._heartbeat(job.agent_id))
+        status = "done"
+        try:
+            await self.runner(job.url, job.agent_id, job.autonomy_level, fanout=self.publisher, **job.options)
+        except asyncio.CancelledError:
+            status = "cancelled"  # Worker shutting down
+            raise
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Agent {job.agent_id} failed: {e}")
+        finally:
+            heartbeat.cancel()
+            self.publisher.viewers.pop(job.agent_id, None)
+            try:
+                await self.queue.finish(job.agent_id, self.worker_id, status)
+            except Exception as e:
+                # The lease will lapse and the job will be retried elsewhere
+                logger.warning(f"Could not mark job {job.agent_id} {status}: {e}")
+
+    async def _heartbeat(self, agent_id: str):
+        while True:
+            try:
+                state = await self.queue.heartbeat(agent_id, self.worker_id)
+                if state is None:
+                    # Lease lost (we were too slow) and the job was handed to another worker
+                    logger.warning(f"Lost the lease on agent {agent_id}, stopping it here")
+                    scheduler.stop(agent_id)
+                    return
+                if state.get("stop_requested"):
+                    scheduler.stop(agent_id)
+                self.publisher.viewers[agent_id] = merge_viewers(state)
+            except Exception as e:
+                logger.warning(f"Heartbeat for agent {agent_id} failed: {e}")
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+
+
+async def serve(worker_id: str):
+    startup.begin()
+    db.connect()
+    await db.ensure_indexes()
+    await ensure_event_collection()
+    loop_monitor.start()
+    log_sink.start()
+    stats_aggregator.start()
+    artifact_store.start()
+    site_cache.start()
+
+    worker = Worker(worker_id)
+    startup.prewarm(scheduler.pool, analysis_pool)
+    startup.ready()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await startup.close()
+        await loop_monitor.close()
+        analysis_pool.close()
+        await log_sink.close()
+        await stats_aggregator.close()
+        await artifact_store.close()
+        await site_cache.close()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--id", help="Worker id (default: <hostname>-<pid>)")
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        children = [subprocess.Popen([sys.executable, os.path.abspath(__file__)]) for _ in range(args.processes)]
+        try:
+            for child in children:
+                child.wait()
+        except KeyboardInterrupt:
+            for child in children:
+                child.send_signal(signal.SIGINT)
+            for child in children:
+                child.wait()
+        return
+
+    asyncio.run(serve(args.id or f"{socket.gethostname()}-{os.getpid()}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ export default function AgentLivePage() {
     const ws = useRef<WebSocket | null>(null);
     const frameCountRef = useRef(0);
     const lastFpsUpdate = useRef(Date.now());
+    const frameUrlRef = useRef<string | null>(null);
 
     // Initial Fetch
     useEffect(() => {
@@ -40,7 +41,7 @@ export default function AgentLivePage() {
             .catch(err => console.error("Failed to fetch agent", err));
 
         // Fetch recent logs
-        fetch(`http://localhost:8000/logs?agent_id=${id}&limit=20`)
+        fetch(`http://localhost:8000/logs?agent_id=${id}&limit=20&include_detail=true`)
             .then(res => res.json())
             .then(data => {
                 // Convert backend logs to UI logs
@@ -60,20 +61,26 @@ export default function AgentLivePage() {
 
     useEffect(() => {
         ws.current = new WebSocket("ws://localhost:8000/ws");
+        ws.current.binaryType = "arraybuffer";
 
         ws.current.onopen = () => {
             console.log("Connected to WS");
+            // Only this agent's logs and video instead of every agent's traffic
+            ws.current?.send(JSON.stringify({ action: "set", agent_ids: [id], events: ["*", "video"] }));
         };
 
         ws.current.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-
-            // Filter by agent_id if present
-            if (data.agent_id && data.agent_id !== id) return;
-
-            // Handle video frames
-            if (data.type === "VIDEO_FRAME") {
-                setScreenshot(`data:image/jpeg;base64,${data.message}`);
+            // Video frames arrive as binary: [1 byte id length][agent_id][JPEG bytes]
+            if (event.data instanceof ArrayBuffer) {
+                const bytes = new Uint8Array(event.data);
+                const idLength = bytes[0];
+                const frameAgentId = new TextDecoder().decode(bytes.subarray(1, 1 + idLength));
+                if (frameAgentId !== id) return;
+
+                const url = URL.createObjectURL(new Blob([bytes.subarray(1 + idLength)], { type: "image/jpeg" }));
+                if (frameUrlRef.current) URL.revokeObjectURL(frameUrlRef.current);
+                frameUrlRef.current = url;
+                setScreenshot(url);
 
                 // Update FPS counter
                 frameCountRef.current += 1;
@@ -86,9 +93,17 @@ export default function AgentLivePage() {
                 return;
             }
 
-            // Legacy screenshot support
+            const data = JSON.parse(event.data);
+            if (data.type === "SUBSCRIBED" || data.type === "SUBSCRIPTION_ERROR") return;
+
+            // Filter by agent_id if present
+            if (data.agent_id && data.agent_id !== id) return;
+
+            // Screenshots are served from the artifact store; older backends sent base64 in the message
             if (data.type === "SCREENSHOT") {
-                setScreenshot(`data:image/png;base64,${data.message}`);
+                setScreenshot(data.data?.image_artifact_id
+                    ? `http://localhost:8000/artifacts/${data.data.image_artifact_id}`
+                    : `data:image/png;base64,${data.message}`);
                 return;
             }
 
@@ -103,17 +118,18 @@ export default function AgentLivePage() {
             setLogs(prev => [...prev, newLog]);
 
             if (data.type === "NAVIGATE") {
-                setCurrentUrl(data.detail || data.message);
+                setCurrentUrl(data.data?.url || data.detail || data.message);
             }
         };
 
         return () => {
             if (ws.current) ws.current.close();
+            if (frameUrlRef.current) URL.revokeObjectURL(frameUrlRef.current);
         };
     }, [id]);
 
     const handleStop = async () => {
-        await fetch("http://localhost:8000/agent/stop", { method: "POST" });
+        await fetch(`http://localhost:8000/agent/${id}/stop`, { method: "POST" });
         setStatus("COMPLETED");
     };
 
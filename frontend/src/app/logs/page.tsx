@@ -17,7 +17,7 @@ export default function LogsPage() {
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        fetch("http://localhost:8000/logs?limit=50")
+        fetch("http://localhost:8000/logs?limit=50&include_detail=true")
             .then(res => res.json())
             .then(data => {
                 setLogs(data);
@@ -2,7 +2,7 @@ import Link from "next/link";
 import { Play, Pause, RotateCw, AlertTriangle, CheckCircle2, Monitor } from "lucide-react";
 import { cn } from "@/lib/utils";
 
-export type AgentStatus = "RUNNING" | "PAUSED" | "COMPLETED" | "FAILED" | "IDLE";
+export type AgentStatus = "QUEUED" | "RUNNING" | "PAUSED" | "COMPLETED" | "FAILED" | "IDLE";
 
 interface AgentCardProps {
     id: string;
@@ -26,6 +26,7 @@ export function AgentCard({ id, name, status, target, lastRun, issues }: AgentCa
                             <h3 className="font-semibold text-foreground">{name}</h3>
                             <span className={cn(
                                 "px-2 py-0.5 rounded-full text-[10px] uppercase font-bold tracking-wide",
+                                status === "QUEUED" && "bg-yellow-500/10 text-yellow-400",
                                 status === "RUNNING" && "bg-blue-500/10 text-blue-400",
                                 status === "PAUSED" && "bg-orange-500/10 text-orange-400",
                                 status === "COMPLETED" && "bg-green-500/10 text-green-400",